@@ -0,0 +1,387 @@
+"""
+End-to-end collection benchmark against a simulated WinRM endpoint.
+
+Runs the real per-host pipeline (pipeline.run_collection, the same code
+`soclog --config ...` uses) with winrm.Session replaced by
+simulated_winrm.SimulatedSession, and reports:
+
+  - throughput: events/s, MB/s written, MB/s over the (simulated) wire
+  - per-stage latency: Sysmon, Security, processes, manifest, ZIP finish
+  - peak memory: process peak RSS (and traced Python heap with --tracemalloc)
+
+Each run also reads back every host's event artefacts and checks that
+every RecordId was written exactly once, so a faster run cannot come
+from dropped or duplicated events; the exit status is 1 if not.
+
+Results are printed and, with --output, saved as JSON; --compare OLD.json
+prints the change against an earlier result.
+
+Examples (from the SOClog directory):
+
+    python benchmarks/bench_collect.py
+    python benchmarks/bench_collect.py --events 100000 --latency-ms 20 --output base.json
+    python benchmarks/bench_collect.py --format ndjson --gzip --compare base.json
+    python benchmarks/bench_collect.py --span-hours 70 --hours 72 --slice-hours 24
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Counter, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from simulated_winrm import STATS, EndpointConfig, install  # noqa: E402
+
+from soclog import __version__, pipeline  # noqa: E402
+from soclog.archive import ArtifactSink  # noqa: E402
+from soclog.artifacts import FORMATS, iter_events  # noqa: E402
+from soclog.collectors import DEFAULT_PAGE_SIZE, EVENT_DATA_MODES  # noqa: E402
+from soclog.config import HostConfig  # noqa: E402
+from soclog.defaults import DEFAULT_SLICE_HOURS  # noqa: E402
+from soclog.progress import ProgressReporter  # noqa: E402
+from soclog.scheduler import DEFAULT_MAX_SHELLS  # noqa: E402
+from soclog.verify import open_member, read_manifest  # noqa: E402
+
+
+class StageTimer:
+    """Collects wall times per stage from the wrapped pipeline functions."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for stage, values in sorted(self.samples.items()):
+            ordered = sorted(values)
+            out[stage] = {
+                "count": len(values),
+                "mean_s": round(statistics.fmean(values), 4),
+                "p50_s": round(ordered[len(ordered) // 2], 4),
+                "p95_s": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+                "max_s": round(ordered[-1], 4),
+            }
+        return out
+
+
+def instrument(timer: StageTimer) -> None:
+    """Wrap the pipeline's stage functions so each call is timed."""
+    open_event_pages = pipeline.open_event_pages
+    collect_processes = pipeline.collect_processes
+    build_manifest = pipeline.build_manifest_from_records
+    sink_close = ArtifactSink.close
+
+    def timed_open_event_pages(client, log_name, **kwargs):
+        # The stage lasts from the probe until the last page is written.
+        stage = "sysmon" if "Sysmon" in log_name else "security"
+        started = time.perf_counter()
+        status, pages = open_event_pages(client, log_name, **kwargs)
+
+        def timed_pages():
+            try:
+                yield from pages
+            finally:
+                timer.add(stage, time.perf_counter() - started)
+
+        return status, timed_pages()
+
+    def timed_collect_processes(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return collect_processes(*args, **kwargs)
+        finally:
+            timer.add("processes", time.perf_counter() - started)
+
+    def timed_build_manifest(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return build_manifest(*args, **kwargs)
+        finally:
+            timer.add("manifest", time.perf_counter() - started)
+
+    def timed_sink_close(self):
+        started = time.perf_counter()
+        try:
+            return sink_close(self)
+        finally:
+            timer.add("zip_finish", time.perf_counter() - started)
+
+    pipeline.open_event_pages = timed_open_event_pages
+    pipeline.collect_processes = timed_collect_processes
+    pipeline.build_manifest_from_records = timed_build_manifest
+    ArtifactSink.close = timed_sink_close
+
+
+def _tree_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def check_record_ids(collection: Path, expected: Dict[str, int]) -> List[str]:
+    """
+    Problems with the RecordIds written for one host: every log in expected
+    must hold RecordIds 1..N exactly once.
+    """
+    names = [r.get("relative_path") or r.get("file_name") or "" for r in read_manifest(collection)["files"]]
+    problems = []
+    for stem, size in expected.items():
+        members = [n for n in names if Path(n).name.startswith(stem + ".")]
+        # A columnar copy holds the same events as the row artefact.
+        members = [n for n in members if not n.endswith(".columnar")] or members
+        seen: Counter[int] = Counter()
+        for name in members[:1]:
+            with open_member(collection, name) as source:
+                seen.update(int(e["RecordId"]) for e in iter_events(source, name))
+        duplicates = sum(1 for count in seen.values() if count > 1)
+        missing = sum(1 for rid in range(1, size + 1) if rid not in seen)
+        extra = sum(1 for rid in seen if not 1 <= rid <= size)
+        if duplicates or missing or extra:
+            problems.append(
+                f"{collection.name} {stem}: {duplicates} duplicated, "
+                f"{missing} missing, {extra} unexpected RecordId(s)"
+            )
+    return problems
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark SOClog collection against a simulated WinRM endpoint."
+    )
+    sim = parser.add_argument_group("simulated endpoint")
+    sim.add_argument("--events", type=int, default=20000, help="Events per log (default: 20000).")
+    sim.add_argument("--sysmon-events", type=int, help="Override --events for Sysmon.")
+    sim.add_argument("--security-events", type=int, help="Override --events for Security.")
+    sim.add_argument("--no-sysmon", action="store_true", help="Simulate a host without Sysmon.")
+    sim.add_argument("--processes", type=int, default=150, help="Running processes (default: 150).")
+    sim.add_argument("--message-bytes", type=int, default=600, help="Message size (default: 600).")
+    sim.add_argument("--latency-ms", type=float, default=5.0, help="WinRM round trip (default: 5).")
+    sim.add_argument(
+        "--render-rate", type=float, default=0.0, metavar="EVENTS_PER_S",
+        help="Endpoint Get-WinEvent render rate (default: 0 = instant).",
+    )
+    sim.add_argument(
+        "--bandwidth", type=float, default=0.0, metavar="MB_S",
+        help="Wire bandwidth in MB/s (default: 0 = unlimited).",
+    )
+    sim.add_argument(
+        "--span-hours", type=float, default=23.0,
+        help="Hours between the oldest and newest event of a log (default: 23).",
+    )
+
+    run = parser.add_argument_group("collection")
+    run.add_argument("--hosts", type=int, default=1, help="Simulated hosts (default: 1).")
+    run.add_argument("--parallel", type=int, default=1, help="Hosts collected at once.")
+    run.add_argument("--max-shells", type=int, default=DEFAULT_MAX_SHELLS)
+    run.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    run.add_argument("--format", dest="output_format", choices=FORMATS, default="json")
+    run.add_argument("--gzip", action="store_true")
+    run.add_argument("--wire", choices=("plain", "gzip"), default="plain")
+    run.add_argument("--event-data", choices=EVENT_DATA_MODES, default="message")
+    run.add_argument("--no-loose", action="store_true")
+    run.add_argument("--hours", type=int, default=24, help="Collection window (default: 24).")
+    run.add_argument("--slice-hours", type=float, default=DEFAULT_SLICE_HOURS)
+
+    out = parser.add_argument_group("benchmark")
+    out.add_argument("--repeat", type=int, default=3, help="Runs; the median is reported (default: 3).")
+    out.add_argument("--tracemalloc", action="store_true", help="Also trace Python heap peak (slower).")
+    out.add_argument("--output", metavar="FILE", help="Save results as JSON.")
+    out.add_argument("--compare", metavar="FILE", help="Compare against an earlier results file.")
+    out.add_argument("--keep", action="store_true", help="Keep the collected output directory.")
+    out.add_argument("--verbose", action="store_true", help="Show SOClog progress output.")
+    return parser.parse_args(argv)
+
+
+def run_once(args: argparse.Namespace, output_dir: Path, timer: StageTimer) -> Dict:
+    STATS.reset()
+    timer.samples.clear()
+    jobs = [
+        (HostConfig(name=f"bench-{i:02d}", host=f"bench-{i:02d}.sim", username="bench"), "bench")
+        for i in range(1, args.hosts + 1)
+    ]
+    options = pipeline.CollectOptions(
+        output_dir=str(output_dir),
+        max_shells=args.max_shells,
+        page_size=args.page_size,
+        output_format=args.output_format,
+        compress=args.gzip,
+        gzip_wire=args.wire == "gzip",
+        event_data=args.event_data,
+        keep_loose=not args.no_loose,
+        hours=args.hours,
+        slice_hours=args.slice_hours,
+    )
+    parallel = min(args.parallel, args.hosts)
+    stream = sys.stdout if args.verbose else open(os.devnull, "w")
+    try:
+        reporter = ProgressReporter(prefix_host=parallel > 1, stream=stream)
+        started = time.perf_counter()
+        results = pipeline.run_collection(jobs, options, reporter, parallel=parallel)
+        wall = time.perf_counter() - started
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    written = _tree_size(output_dir)
+    mb = 1024 * 1024
+    expected = {"security_events": args.security_events}
+    if not args.no_sysmon:
+        expected["sysmon_events"] = args.sysmon_events
+    problems = []
+    for r in results:
+        if r.zip_path is None:
+            problems.append(f"{r.name}: no ZIP written")
+        else:
+            problems.extend(check_record_ids(r.zip_path, expected))
+    return {
+        "wall_s": round(wall, 4),
+        "events": STATS.events_served,
+        "events_per_s": round(STATS.events_served / wall, 1),
+        "bytes_written": written,
+        "mb_written_per_s": round(written / mb / wall, 2),
+        "wire_bytes": STATS.wire_bytes,
+        "wire_mb_per_s": round(STATS.wire_bytes / mb / wall, 2),
+        "commands": STATS.commands,
+        "shells_opened": STATS.shells_opened,
+        "host_status": {r.name: r.status for r in results},
+        "record_id_problems": problems,
+        "stages": timer.summary(),
+    }
+
+
+SUMMARY_KEYS = ("wall_s", "events_per_s", "mb_written_per_s", "wire_mb_per_s", "bytes_written")
+
+
+def summarise(runs: List[Dict]) -> Dict:
+    summary = {key: statistics.median(r[key] for r in runs) for key in SUMMARY_KEYS}
+    stages = {}
+    for stage in runs[-1]["stages"]:
+        stages[stage] = statistics.median(
+            r["stages"][stage]["mean_s"] for r in runs if stage in r["stages"]
+        )
+    summary["stage_mean_s"] = stages
+    return summary
+
+
+def print_report(result: Dict) -> None:
+    s = result["summary"]
+    print(f"SOClog {result['soclog_version']} collect benchmark ({len(result['runs'])} runs, median)")
+    print(f"  wall time        {s['wall_s']:.3f} s")
+    print(f"  events/s         {s['events_per_s']:,.0f}")
+    print(f"  written          {s['bytes_written'] / 1024 / 1024:.1f} MB ({s['mb_written_per_s']:.1f} MB/s)")
+    print(f"  wire             {s['wire_mb_per_s']:.1f} MB/s")
+    for stage, seconds in s["stage_mean_s"].items():
+        print(f"  stage {stage:<10} {seconds:.3f} s")
+    print(f"  peak RSS         {result['peak_rss_mb']} MB")
+    if result.get("peak_traced_mb") is not None:
+        print(f"  peak traced heap {result['peak_traced_mb']} MB")
+    problems = [p for r in result["runs"] for p in r["record_id_problems"]]
+    if problems:
+        print(f"  RECORDIDS NOT WRITTEN EXACTLY ONCE ({len(problems)} problem(s)):")
+        for problem in problems[:10]:
+            print(f"    {problem}")
+    else:
+        print("  record ids       each written exactly once")
+
+
+def print_comparison(old: Dict, new: Dict) -> None:
+    print(f"Compared with {old.get('soclog_version')} ({old.get('timestamp_utc')}):")
+    rows = [(key, old["summary"].get(key), new["summary"].get(key)) for key in SUMMARY_KEYS]
+    rows.append(("peak_rss_mb", old.get("peak_rss_mb"), new.get("peak_rss_mb")))
+    for stage, value in new["summary"]["stage_mean_s"].items():
+        rows.append((f"stage {stage}", old["summary"].get("stage_mean_s", {}).get(stage), value))
+    for key, before, after in rows:
+        if not before or after is None or max(before, after) < 0.001:
+            continue
+        change = (after - before) / before * 100
+        print(f"  {key:<18} {before:>14,.3f} -> {after:>14,.3f}  ({change:+.1f}%)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.sysmon_events is None:
+        args.sysmon_events = args.events
+    if args.security_events is None:
+        args.security_events = args.events
+    config = EndpointConfig(
+        sysmon_events=args.sysmon_events,
+        security_events=args.security_events,
+        processes=args.processes,
+        message_bytes=args.message_bytes,
+        has_sysmon=not args.no_sysmon,
+        latency_ms=args.latency_ms,
+        server_events_per_s=args.render_rate,
+        bandwidth_mb_s=args.bandwidth,
+        span_hours=args.span_hours,
+    )
+    install(config)
+    timer = StageTimer()
+    instrument(timer)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    runs = []
+    base = Path(tempfile.mkdtemp(prefix="soclog-bench-"))
+    try:
+        for i in range(max(1, args.repeat)):
+            runs.append(run_once(args, base / f"run{i}", timer))
+    finally:
+        if args.keep:
+            print(f"Output kept in {base}")
+        else:
+            shutil.rmtree(base, ignore_errors=True)
+
+    result = {
+        "benchmark": "collect",
+        "soclog_version": __version__,
+        "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "endpoint": config.as_dict(),
+        "options": {
+            k: v for k, v in vars(args).items()
+            if k not in ("output", "compare", "keep", "verbose")
+        },
+        "runs": runs,
+        "summary": summarise(runs),
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_traced_mb": (
+            round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+            if args.tracemalloc else None
+        ),
+    }
+    print_report(result)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(json.load(f), result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results saved to {args.output}")
+    return 1 if any(r["record_id_problems"] for r in runs) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
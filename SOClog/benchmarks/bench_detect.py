@@ -0,0 +1,256 @@
+"""
+Detection benchmark: 'soclog detect' over generated collections.
+
+Writes --hosts run directories with --events Sysmon and Security events
+each (message or structured event data, NDJSON or JSON), then runs the
+rules (default: examples/rules, optionally multiplied with --rule-copies
+to simulate a large rule set) with 1 worker and with --workers workers,
+and reports events per minute and alerts found. About 1 in 1000 events
+is built to trigger a rule, so the alert count is also a correctness
+check: it must be the same for every worker count.
+
+Examples (from the SOClog directory):
+
+    python benchmarks/bench_detect.py
+    python benchmarks/bench_detect.py --hosts 8 --events 250000 --workers 8
+    python benchmarks/bench_detect.py --event-data structured --rule-copies 50 --output base.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from soclog import __version__  # noqa: E402
+from soclog.detect import load_rules, scan_collections  # noqa: E402
+
+IMAGES = [
+    "C:\\Windows\\System32\\svchost.exe",
+    "C:\\Windows\\explorer.exe",
+    "C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe",
+    "C:\\Windows\\System32\\cmd.exe",
+    "C:\\Windows\\System32\\WindowsPowerShell\\v1.0\\powershell.exe",
+]
+
+# Events that should raise an alert with examples/rules.
+TRIGGERS = [
+    ("sysmon", 1, {
+        "Image": "C:\\Users\\bob\\mimi.exe",
+        "CommandLine": "mimi.exe privilege::debug sekurlsa::logonpasswords",
+        "ParentImage": "C:\\Windows\\explorer.exe",
+    }),
+    ("sysmon", 1, {
+        "Image": "C:\\Windows\\System32\\cmd.exe",
+        "CommandLine": "cmd.exe /c whoami",
+        "ParentImage": "C:\\Program Files\\Microsoft Office\\root\\Office16\\WINWORD.EXE",
+    }),
+    ("sysmon", 22, {"Image": IMAGES[2], "QueryName": "abc.ngrok.io"}),
+    ("security", 4625, {"TargetUserName": "admin", "LogonType": "3", "IpAddress": "10.9.9.9"}),
+]
+
+
+def _event(event_id: int, record_id: int, when: datetime, data: Dict, mode: str) -> Dict:
+    event = {
+        "TimeCreated": when.isoformat(),
+        "RecordId": record_id,
+        "Id": event_id,
+        "LevelDisplayName": "Information",
+        "ProviderName": "Microsoft-Windows-Sysmon",
+        "MachineName": "bench.lab.local",
+    }
+    if mode in ("message", "both"):
+        event["Message"] = "Event\n" + "\n".join(f"{k}: {v}" for k, v in data.items())
+    if mode in ("structured", "both"):
+        event["EventData"] = data
+    return event
+
+
+def _background(rng: random.Random, channel: str) -> tuple:
+    if channel == "security":
+        event_id = rng.choice((4624, 4624, 4624, 4634, 4672, 4625))
+        return event_id, {
+            "TargetUserName": rng.choice(("alice", "bob", "svc_backup", "SYSTEM")),
+            "LogonType": rng.choice(("2", "5", "11")),  # never 3/10: no alert
+            "IpAddress": f"10.0.{rng.randrange(256)}.{rng.randrange(256)}",
+        }
+    event_id = rng.choice((1, 1, 3, 3, 3, 7, 10, 11, 13, 22))
+    image = rng.choice(IMAGES)
+    data = {"Image": image, "ProcessId": str(rng.randrange(100, 9000))}
+    if event_id == 1:
+        data["CommandLine"] = f"\"{image}\" --type=renderer --id={rng.randrange(10 ** 6)}"
+        data["ParentImage"] = rng.choice(IMAGES)
+    elif event_id == 3:
+        data["DestinationIp"] = f"93.184.{rng.randrange(256)}.{rng.randrange(256)}"
+    elif event_id == 10:
+        data["SourceImage"] = "C:\\Windows\\System32\\svchost.exe"
+        data["TargetImage"] = "C:\\Windows\\System32\\lsass.exe"
+    elif event_id == 22:
+        data["QueryName"] = rng.choice(("www.microsoft.com", "update.googleapis.com"))
+    return event_id, data
+
+
+def write_run(run_dir: Path, host: str, events: int, mode: str, fmt: str, seed: int) -> int:
+    """Write one run directory; return the number of triggering events."""
+    rng = random.Random(seed)
+    run_dir.mkdir(parents=True)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    triggers = 0
+    files = []
+    for channel, stem in (("sysmon", "sysmon_events"), ("security", "security_events")):
+        name = f"{stem}.{fmt}"
+        with open(run_dir / name, "w", encoding="utf-8") as f:
+            if fmt == "json":
+                f.write("[")
+            for i in range(events // 2):
+                if i % 1000 == 999:
+                    trigger = rng.choice([t for t in TRIGGERS if t[0] == channel])
+                    event_id, data = trigger[1], dict(trigger[2])
+                    triggers += 1
+                else:
+                    event_id, data = _background(rng, channel)
+                event = _event(event_id, i + 1, start + timedelta(seconds=i), data, mode)
+                if fmt == "json":
+                    f.write(("," if i else "") + json.dumps(event))
+                else:
+                    f.write(json.dumps(event) + "\n")
+            if fmt == "json":
+                f.write("]")
+        files.append({"relative_path": name, "file_name": name})
+    with open(run_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump({"host": host, "generated_at_utc": start.isoformat(), "files": files}, f)
+    return triggers
+
+
+def copy_rules(rules_dir: Path, copies: int, target: Path) -> Path:
+    """Make copies of every rule with distinct ids (a larger rule set)."""
+    target.mkdir()
+    for path in sorted(rules_dir.glob("*.yml")):
+        text = path.read_text(encoding="utf-8")
+        for n in range(copies):
+            (target / f"{path.stem}_{n}.yml").write_text(
+                text.replace("title: ", f"title: R{n} ", 1), encoding="utf-8"
+            )
+    return target
+
+
+def run_scan(runs: Path, rules: Path, workers: int) -> Dict:
+    started = time.perf_counter()
+    results = scan_collections([str(runs)], [str(rules)], workers=workers, write=False)
+    elapsed = time.perf_counter() - started
+    events = sum(r.events for r in results)
+    return {
+        "workers": workers,
+        "seconds": elapsed,
+        "events": events,
+        "alerts": sum(len(r.alerts) for r in results),
+        "events_per_minute": events / elapsed * 60 if elapsed else 0.0,
+        "problems": [p for r in results for p in r.problems],
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark 'soclog detect'.")
+    parser.add_argument("--hosts", type=int, default=4, help="Run directories (default: 4).")
+    parser.add_argument(
+        "--events", type=int, default=100000, help="Events per host, half Sysmon (default: 100000)."
+    )
+    parser.add_argument(
+        "--event-data", choices=("message", "structured", "both"), default="message"
+    )
+    parser.add_argument("--format", choices=("ndjson", "json"), default="ndjson")
+    parser.add_argument(
+        "--rules", default=str(ROOT / "examples" / "rules"), help="Rule directory."
+    )
+    parser.add_argument(
+        "--rule-copies", type=int, default=1, help="Copies of every rule (default: 1)."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Parallel run (default: CPUs)."
+    )
+    parser.add_argument("--output", metavar="FILE", help="Save results as JSON.")
+    parser.add_argument("--compare", metavar="FILE", help="Compare against an earlier results file.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    tmp = Path(tempfile.mkdtemp(prefix="soclog-bench-detect-"))
+    try:
+        runs = tmp / "runs"
+        expected = 0
+        for h in range(args.hosts):
+            expected += write_run(
+                runs / f"host{h:03d}" / "20260101_000000",
+                f"host{h:03d}", args.events, args.event_data, args.format, seed=h,
+            )
+        rules = Path(args.rules)
+        if args.rule_copies > 1:
+            rules = copy_rules(rules, args.rule_copies, tmp / "rules")
+        rule_count = len(load_rules([str(rules)]))
+
+        scans = [run_scan(runs, rules, 1)]
+        if args.workers > 1:
+            scans.append(run_scan(runs, rules, args.workers))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    result = {
+        "benchmark": "detect",
+        "time_utc": datetime.now(timezone.utc).isoformat(),
+        "soclog_version": __version__,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "hosts": args.hosts,
+        "events_per_host": args.events,
+        "event_data": args.event_data,
+        "format": args.format,
+        "rules": rule_count,
+        "triggering_events": expected,
+        "scans": scans,
+    }
+
+    print(f"soclog {__version__} on Python {result['python']}, {result['cpus']} CPU(s)")
+    print(
+        f"  {args.hosts} host(s) x {args.events} events ({args.event_data}, {args.format}), "
+        f"{rule_count} rule(s), {expected} triggering event(s)"
+    )
+    print(f"\n  {'WORKERS':>7}  {'SECONDS':>8}  {'EVENTS/MIN':>12}  {'ALERTS':>7}")
+    for s in scans:
+        print(
+            f"  {s['workers']:>7}  {s['seconds']:>8.2f}  "
+            f"{s['events_per_minute'] / 1e6:>10.2f}M  {s['alerts']:>7}"
+        )
+        for problem in s["problems"]:
+            print(f"    problem: {problem}")
+    consistent = len({s["alerts"] for s in scans}) == 1
+    if not consistent:
+        print("\n  ALERT COUNTS DIFFER BETWEEN WORKER COUNTS")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        print("\n  change against earlier run:")
+        for before, after in zip(old.get("scans", []), scans):
+            if before["workers"] == after["workers"] and before["events_per_minute"]:
+                delta = (after["events_per_minute"] - before["events_per_minute"])
+                delta = delta / before["events_per_minute"] * 100
+                print(f"  {after['workers']:>7} worker(s)  events/min {delta:+.0f}%")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0 if consistent else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+IOC matching benchmark: feed loading, memory and lookup rate.
+
+Writes a generated feed (--hashes SHA-256 hashes, --ips IPv4 addresses,
+--cidrs ranges and --domains domains), loads it with
+soclog.ioc.load_indicators() and reports the load time, the memory held
+by the compiled indicators (tracemalloc, in a second load) and lookups
+per second for hashes, IPs and domains. --lookups values are checked
+per kind, about 1 in 100 of them taken from the feed, so the hit count
+is also a correctness check.
+
+Examples (from the SOClog directory):
+
+    python benchmarks/bench_ioc.py
+    python benchmarks/bench_ioc.py --hashes 1000000 --ips 200000 --output base.json
+    python benchmarks/bench_ioc.py --compare base.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from soclog import __version__  # noqa: E402
+from soclog.ioc import load_indicators  # noqa: E402
+
+
+def _ip(rng: random.Random) -> str:
+    return ".".join(str(rng.randrange(256)) for _ in range(4))
+
+
+def write_feed(path: Path, args: argparse.Namespace, rng: random.Random) -> Dict[str, List[str]]:
+    """Write the feed; return the indicators of each kind for the lookups."""
+    feed = {
+        "hash": [f"{rng.getrandbits(256):064x}" for _ in range(args.hashes)],
+        "ip": [_ip(rng) for _ in range(args.ips)],
+        "domain": [f"d{rng.getrandbits(40):x}.example{i % 50}.com" for i in range(args.domains)],
+    }
+    cidrs = [f"{rng.randrange(1, 224)}.{rng.randrange(256)}.0.0/24" for _ in range(args.cidrs)]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# generated IOC feed\n")
+        for values in (feed["hash"], feed["ip"], cidrs, feed["domain"]):
+            f.write("\n".join(values) + "\n")
+    return feed
+
+
+def probes(kind: str, known: List[str], count: int, rng: random.Random) -> List[str]:
+    """count lookup values, 1 in 100 from the feed (a subdomain for domains)."""
+    values = []
+    for i in range(count):
+        if known and i % 100 == 99:
+            value = rng.choice(known)
+            values.append(f"www.{value}" if kind == "domain" else value.upper())
+        elif kind == "hash":
+            values.append(f"{rng.getrandbits(256):064x}")
+        elif kind == "ip":
+            values.append(_ip(rng))
+        else:
+            values.append(f"host{i}.benign{i % 997}.net")
+    return values
+
+
+def run_lookups(match: Callable[[str], Optional[str]], values: List[str]) -> Dict:
+    started = time.perf_counter()
+    hits = sum(1 for v in values if match(v) is not None)
+    elapsed = time.perf_counter() - started
+    return {
+        "lookups": len(values),
+        "hits": hits,
+        "seconds": elapsed,
+        "per_second": len(values) / elapsed if elapsed else 0.0,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark soclog IOC matching.")
+    parser.add_argument("--hashes", type=int, default=300000, help="SHA-256 hashes (default: 300000).")
+    parser.add_argument("--ips", type=int, default=100000, help="IPv4 addresses (default: 100000).")
+    parser.add_argument("--cidrs", type=int, default=2000, help="CIDR ranges (default: 2000).")
+    parser.add_argument("--domains", type=int, default=100000, help="Domains (default: 100000).")
+    parser.add_argument(
+        "--lookups", type=int, default=200000, help="Lookups per kind (default: 200000)."
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", metavar="FILE", help="Save results as JSON.")
+    parser.add_argument("--compare", metavar="FILE", help="Compare against an earlier results file.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    tmp = Path(tempfile.mkdtemp(prefix="soclog-bench-ioc-"))
+    try:
+        feed_path = tmp / "feed.txt"
+        feed = write_feed(feed_path, args, rng)
+        started = time.perf_counter()
+        indicators = load_indicators([str(feed_path)])
+        load_seconds = time.perf_counter() - started
+        # Separate load for memory: tracing slows allocation several-fold.
+        del indicators
+        tracemalloc.start()
+        indicators = load_indicators([str(feed_path)])
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    matchers = {
+        "hash": indicators.match_hash,
+        "ip": indicators.match_ip,
+        "domain": indicators.match_domain,
+    }
+    lookups = {
+        kind: run_lookups(match, probes(kind, feed[kind], args.lookups, rng))
+        for kind, match in matchers.items()
+    }
+    expected = args.lookups // 100
+    result = {
+        "benchmark": "ioc",
+        "time_utc": datetime.now(timezone.utc).isoformat(),
+        "soclog_version": __version__,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "indicators": len(indicators),
+        "load_seconds": load_seconds,
+        "memory_bytes": memory,
+        "lookups": lookups,
+    }
+
+    print(f"soclog {__version__} on Python {result['python']}")
+    print(
+        f"  {len(indicators)} indicator(s) loaded in {load_seconds:.2f}s, "
+        f"{memory / 1e6:.1f} MB"
+    )
+    print(f"\n  {'KIND':>6}  {'LOOKUPS/S':>11}  {'HITS':>6}")
+    for kind, s in lookups.items():
+        print(f"  {kind:>6}  {s['per_second'] / 1e3:>10.0f}k  {s['hits']:>6}")
+    # Random probes can land in a generated CIDR range, never below the planted hits.
+    consistent = all(s["hits"] >= expected for s in lookups.values())
+    if not consistent:
+        print(f"\n  FEWER HITS THAN THE {expected} PLANTED PER KIND")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        print("\n  change against earlier run:")
+        if old.get("load_seconds"):
+            delta = (load_seconds - old["load_seconds"]) / old["load_seconds"] * 100
+            print(f"  {'load':>6}  time {delta:+.0f}%")
+        for kind, s in lookups.items():
+            before = old.get("lookups", {}).get(kind, {}).get("per_second")
+            if before:
+                print(f"  {kind:>6}  lookups/s {(s['per_second'] - before) / before * 100:+.0f}%")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0 if consistent else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
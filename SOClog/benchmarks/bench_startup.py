@@ -0,0 +1,259 @@
+"""
+Startup-time benchmark for the soclog CLI.
+
+Measures, in fresh interpreter processes:
+
+  - wall time of `soclog --version`, `--help` and the subcommands'
+    --help, against a bare `python -c pass` baseline
+  - which heavy modules (pywinrm and its dependencies, yaml, sqlite3,
+    ...) `soclog --help` imports; it should import none of them
+
+and in this process, for a generated inventory of --hosts hosts:
+
+  - load_hosts_from_yaml() without the inventory cache, with a cold
+    cache (parse and write) and with a warm cache
+
+Results are printed and, with --output, saved as JSON; --compare OLD.json
+prints the change against an earlier result. --max-ms makes the run fail
+(exit 1) when `soclog --version` is slower than that, or when --help
+imports a heavy module, so it can guard CI.
+
+Examples (from the SOClog directory):
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --hosts 20000 --output base.json
+    python benchmarks/bench_startup.py --compare base.json --max-ms 250
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from soclog import __version__  # noqa: E402
+from soclog.config import load_hosts_from_yaml  # noqa: E402
+
+# Modules `soclog --help` / `--version` must not load.
+HEAVY_MODULES = (
+    "winrm",
+    "requests",
+    "spnego",
+    "cryptography",
+    "yaml",
+    "sqlite3",
+    "xml.sax",
+    "soclog.pipeline",
+    "soclog.index",
+)
+
+COMMANDS = {
+    "python -c pass": [sys.executable, "-c", "pass"],
+    "soclog --version": [sys.executable, "-m", "soclog.cli", "--version"],
+    "soclog --help": [sys.executable, "-m", "soclog.cli", "--help"],
+    "soclog verify --help": [sys.executable, "-m", "soclog.cli", "verify", "--help"],
+    "soclog query --help": [sys.executable, "-m", "soclog.cli", "query", "--help"],
+    "soclog daemon --help": [sys.executable, "-m", "soclog.cli", "daemon", "--help"],
+}
+
+_IMPORT_PROBE = """
+import json, sys
+sys.argv = ["soclog", "--help"]
+import soclog.cli
+try:
+    soclog.cli.main()
+except SystemExit:
+    pass
+heavy = {heavy!r}
+loaded = sorted(m for m in heavy if m in sys.modules)
+sys.stdout.write("\\n" + json.dumps(loaded))
+"""
+
+
+def _run(cmd: List[str]) -> float:
+    started = time.perf_counter()
+    subprocess.run(
+        cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False
+    )
+    return time.perf_counter() - started
+
+
+def time_commands(repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for label, cmd in COMMANDS.items():
+        _run(cmd)  # warm the page cache and __pycache__
+        samples = [_run(cmd) for _ in range(repeat)]
+        results[label] = {
+            "median_ms": statistics.median(samples) * 1000,
+            "min_ms": min(samples) * 1000,
+        }
+    return results
+
+
+def heavy_imports() -> List[str]:
+    probe = _IMPORT_PROBE.format(heavy=HEAVY_MODULES)
+    out = subprocess.run(
+        [sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=False
+    )
+    try:
+        return json.loads(out.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        raise SystemExit(f"Import probe failed:\n{out.stderr}")
+
+
+def write_inventory(path: Path, hosts: int) -> None:
+    lines = [
+        "groups:",
+        "  workstations:",
+        "    interval: 1h",
+        "profiles:",
+        "  quiet:",
+        "    security:",
+        "      exclude_ids: [4624, 4634, 5156, 5158]",
+        "    sysmon:",
+        "      include_ids: [1, 3, \"11-13\", 22]",
+        "hosts:",
+    ]
+    for i in range(hosts):
+        lines += [
+            f"  - name: ws{i:05d}",
+            f"    host: 10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+            "    username: LAB\\\\dfir",
+            "    password_env: SOCLOG_PASS",
+            "    group: workstations",
+            "    profile: quiet",
+        ]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def time_inventory(hosts: int, repeat: int) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory(prefix="soclog-bench-") as tmp:
+        inventory = Path(tmp) / "hosts.yaml"
+        cache_dir = Path(tmp) / "cache"
+        write_inventory(inventory, hosts)
+
+        def best(fn) -> float:
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                fn()
+                samples.append(time.perf_counter() - started)
+            return statistics.median(samples) * 1000
+
+        def cold() -> None:
+            for f in cache_dir.glob("*.json"):
+                f.unlink()
+            load_hosts_from_yaml(str(inventory), cache_dir=cache_dir)
+
+        uncached = best(lambda: load_hosts_from_yaml(str(inventory)))
+        cold_ms = best(cold)
+        warm_ms = best(lambda: load_hosts_from_yaml(str(inventory), cache_dir=cache_dir))
+        same = load_hosts_from_yaml(str(inventory)) == load_hosts_from_yaml(
+            str(inventory), cache_dir=cache_dir
+        )
+    return {
+        "hosts": hosts,
+        "yaml_ms": uncached,
+        "cold_cache_ms": cold_ms,
+        "warm_cache_ms": warm_ms,
+        "cache_matches_yaml": same,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Measure soclog CLI startup time and inventory loading."
+    )
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per command (default: 10).")
+    parser.add_argument(
+        "--hosts", type=int, default=5000, help="Hosts in the generated inventory (default: 5000)."
+    )
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        help="Fail if `soclog --version` takes longer (median), or --help loads heavy modules.",
+    )
+    parser.add_argument("--output", metavar="FILE", help="Save results as JSON.")
+    parser.add_argument("--compare", metavar="FILE", help="Compare against an earlier results file.")
+    return parser.parse_args(argv)
+
+
+def print_report(result: Dict) -> None:
+    print(f"soclog {result['soclog_version']} on Python {result['python']}")
+    print(f"\n  {'COMMAND':24}  {'MEDIAN':>9}  {'MIN':>9}")
+    for label, t in result["commands"].items():
+        print(f"  {label:24}  {t['median_ms']:>7.1f}ms  {t['min_ms']:>7.1f}ms")
+    heavy = result["heavy_imports"]
+    print(f"\n  heavy modules loaded by --help: {', '.join(heavy) if heavy else 'none'}")
+    inv = result["inventory"]
+    print(
+        f"\n  inventory of {inv['hosts']} hosts: YAML {inv['yaml_ms']:.1f}ms, "
+        f"cold cache {inv['cold_cache_ms']:.1f}ms, warm cache {inv['warm_cache_ms']:.1f}ms"
+        f"{'' if inv['cache_matches_yaml'] else '  (CACHE MISMATCH)'}"
+    )
+
+
+def print_comparison(old: Dict, new: Dict) -> None:
+    print("\n  change against earlier run:")
+    for label, t in new["commands"].items():
+        before = old.get("commands", {}).get(label)
+        if before:
+            delta = (t["median_ms"] - before["median_ms"]) / before["median_ms"] * 100
+            print(
+                f"  {label:24}  {before['median_ms']:>7.1f}ms -> "
+                f"{t['median_ms']:>7.1f}ms  ({delta:+.0f}%)"
+            )
+    if old.get("inventory", {}).get("hosts") != new["inventory"]["hosts"]:
+        return  # different inventory sizes are not comparable
+    for key in ("yaml_ms", "warm_cache_ms"):
+        before = old["inventory"].get(key)
+        if before:
+            after = new["inventory"][key]
+            delta = (after - before) / before * 100
+            print(f"  inventory {key:14}  {before:>7.1f}ms -> {after:>7.1f}ms  ({delta:+.0f}%)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # The probes must not find a user's real inventory cache or config.
+    os.environ.setdefault("XDG_CACHE_HOME", tempfile.mkdtemp(prefix="soclog-bench-cache-"))
+
+    result = {
+        "benchmark": "startup",
+        "time_utc": datetime.now(timezone.utc).isoformat(),
+        "soclog_version": __version__,
+        "python": platform.python_version(),
+        "commands": time_commands(args.repeat),
+        "heavy_imports": heavy_imports(),
+        "inventory": time_inventory(args.hosts, max(1, args.repeat // 3)),
+    }
+    print_report(result)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(json.load(f), result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.max_ms is not None:
+        version_ms = result["commands"]["soclog --version"]["median_ms"]
+        if version_ms > args.max_ms or result["heavy_imports"]:
+            print(f"\nFAIL: --version {version_ms:.1f}ms (limit {args.max_ms:.0f}ms), "
+                  f"heavy imports: {result['heavy_imports'] or 'none'}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
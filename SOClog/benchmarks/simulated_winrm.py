@@ -0,0 +1,305 @@
+"""
+Simulated WinRM endpoint for benchmarks.
+
+SimulatedSession stands in for winrm.Session: WindowsRemote drives it
+through the same Protocol calls it uses against a real host (open_shell,
+run_command, receive, cleanup_command, close_shell), so the client code
+(persistent shells, retries, gzip wire mode) runs unchanged. Instead of
+executing PowerShell, the protocol recognises SOClog's scripts and
+answers with synthetic data:
+
+  - log probe        -> PAGE_BOUNDS / LOG_NOT_FOUND
+  - event page       -> compact JSON lines for the requested record range
+                        and TimeCreated bounds
+  - process listing  -> a JSON array of processes
+
+Event times rise with RecordId, spread evenly over span_hours up to the
+time install() was called, so time windows and --slice-hours slices
+select the same events they would on a real log.
+
+Latency is simulated per WinRM request, plus optional server-side render
+time per event and a wire bandwidth limit, so results reflect how the
+collector overlaps remote waits.
+"""
+
+import base64
+import gzip
+import json
+import re
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+GZIP_WIRE_MARKER = "SOCLOG-GZ:"
+
+
+@dataclass
+class EndpointConfig:
+    """Shape of the simulated host."""
+
+    sysmon_events: int = 20000
+    security_events: int = 20000
+    processes: int = 150
+    # Approximate size of each rendered Message text.
+    message_bytes: int = 600
+    has_sysmon: bool = True
+    # Hours between the oldest and the newest event of each log; the
+    # default keeps every event inside a 24-hour collection window.
+    span_hours: float = 23.0
+    # Round-trip time of every WinRM request.
+    latency_ms: float = 5.0
+    # Events rendered per second by Get-WinEvent on the endpoint (0 = instant).
+    server_events_per_s: float = 0.0
+    # Wire bandwidth in MB/s (0 = unlimited).
+    bandwidth_mb_s: float = 0.0
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+class EndpointStats:
+    """Counters shared by every simulated session (thread-safe)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.commands = 0
+            self.shells_opened = 0
+            self.events_served = 0
+            self.wire_bytes = 0
+            self.command_seconds: Dict[str, List[float]] = {}
+
+    def record(self, kind: str, seconds: float, wire_bytes: int, events: int) -> None:
+        with self._lock:
+            self.commands += 1
+            self.wire_bytes += wire_bytes
+            self.events_served += events
+            self.command_seconds.setdefault(kind, []).append(seconds)
+
+    def shell_opened(self) -> None:
+        with self._lock:
+            self.shells_opened += 1
+
+
+STATS = EndpointStats()
+
+_AFTER_ID = re.compile(r"EventRecordID>(\d+)")
+_NEWEST_ID = re.compile(r"EventRecordID<=(\d+)")
+_MAX_EVENTS = re.compile(r"-MaxEvents (\d+)")
+_BOOKMARK_ID = re.compile(r"\$afterId = (\d+)")
+_LOG_NAME = re.compile(r'\$logName = "([^"]+)"')
+_SINCE = re.compile(r"@SystemTime>='([^']+)'")
+_UNTIL = re.compile(r"@SystemTime<'([^']+)'")
+
+_LOREM = (
+    "Process Create: RuleName: - UtcTime: 2025-11-18 15:06:25.123 "
+    "ProcessGuid: {0b4a1c2d-1111-2222-3333-444455556666} Image: "
+    "C:\\Windows\\System32\\svchost.exe FileVersion: 10.0.22621.1 "
+    "Description: Host Process for Windows Services Product: Microsoft "
+    "Windows Operating System Company: Microsoft Corporation "
+)
+
+
+def _parse_time(text: str) -> datetime:
+    """XPath SystemTime literal ('2026-01-01T00:00:00.000Z') as UTC datetime."""
+    return datetime.strptime(text.rstrip("Z").split(".")[0], "%Y-%m-%dT%H:%M:%S").replace(
+        tzinfo=timezone.utc
+    )
+
+
+class _Transport:
+    session = None
+
+
+class SimulatedProtocol:
+    """The subset of winrm.protocol.Protocol that WindowsRemote uses."""
+
+    def __init__(self, config: EndpointConfig, now: datetime) -> None:
+        self.config = config
+        self.transport = _Transport()
+        self._commands: Dict[str, str] = {}
+        self._now = now
+
+    # ---------- timing ----------
+
+    def _round_trip(self, payload_bytes: int = 0) -> None:
+        delay = self.config.latency_ms / 1000.0
+        if self.config.bandwidth_mb_s > 0:
+            delay += payload_bytes / (self.config.bandwidth_mb_s * 1024 * 1024)
+        if delay > 0:
+            time.sleep(delay)
+
+    # ---------- protocol ----------
+
+    def open_shell(self, **kwargs) -> str:
+        self._round_trip()
+        STATS.shell_opened()
+        return str(uuid.uuid4())
+
+    def close_shell(self, shell_id: str, close_session: bool = True) -> None:
+        self._round_trip()
+
+    def run_command(self, shell_id: str, command: str, arguments=()) -> str:
+        self._round_trip()
+        encoded = command.split()[-1]
+        script = base64.b64decode(encoded).decode("utf_16_le")
+        command_id = str(uuid.uuid4())
+        self._commands[command_id] = script
+        return command_id
+
+    def cleanup_command(self, shell_id: str, command_id: str) -> None:
+        self._commands.pop(command_id, None)
+        self._round_trip()
+
+    def get_command_output_raw(self, shell_id: str, command_id: str):
+        started = time.perf_counter()
+        script = self._commands[command_id]
+        kind, text, events = self._answer(script)
+        if self.config.server_events_per_s > 0 and events:
+            time.sleep(events / self.config.server_events_per_s)
+        if GZIP_WIRE_MARKER in script:
+            packed = base64.b64encode(gzip.compress(text.encode("utf-8"))).decode("ascii")
+            text = GZIP_WIRE_MARKER + packed
+        stdout = (text + "\r\n").encode("utf-8") if text else b""
+        self._round_trip(len(stdout))
+        STATS.record(kind, time.perf_counter() - started, len(stdout), events)
+        return stdout, b"", 0, True
+
+    # pywinrm < 0.5 name
+    _raw_get_command_output = get_command_output_raw
+
+    def get_command_output(self, shell_id: str, command_id: str):
+        stdout, stderr, code, _ = self.get_command_output_raw(shell_id, command_id)
+        return stdout, stderr, code
+
+    # ---------- synthetic answers ----------
+
+    def _log_size(self, script: str) -> Tuple[str, int]:
+        match = _LOG_NAME.search(script)
+        log_name = match.group(1) if match else ""
+        if "Sysmon" in log_name:
+            return log_name, self.config.sysmon_events if self.config.has_sysmon else -1
+        return log_name, self.config.security_events
+
+    def _answer(self, script: str) -> Tuple[str, str, int]:
+        if "Get-Process" in script:
+            return "processes", self._processes(), 0
+        # Structured queries carry the XPath XML-escaped.
+        plain = script.replace("&gt;", ">").replace("&lt;", "<")
+        log_name, size = self._log_size(plain)
+        if "PAGE_BOUNDS" in plain:
+            if size < 0:
+                return "probe", "LOG_NOT_FOUND", 0
+            if size == 0:
+                return "probe", "NO_EVENTS", 0
+            match = _BOOKMARK_ID.search(plain)
+            after = int(match.group(1)) if match else 0
+            mode = "bookmark" if after else "window"
+            return "probe", f"PAGE_BOUNDS {mode} {after if after <= size else 0} {size}", 0
+        after = int(_AFTER_ID.search(plain).group(1))
+        newest = min(int(_NEWEST_ID.search(plain).group(1)), size)
+        limit = int(_MAX_EVENTS.search(plain).group(1))
+        # Times rise with RecordId, so each time bound is a RecordId bound.
+        since, until = _SINCE.search(plain), _UNTIL.search(plain)
+        if since:
+            after = max(after, self._first_at(_parse_time(since.group(1)), size) - 1)
+        if until:
+            newest = min(newest, self._first_at(_parse_time(until.group(1)), size) - 1)
+        last = min(newest, after + limit)
+        structured = "ToXml()" in plain
+        with_message = not structured or "$row.Message" in plain
+        lines = [
+            self._event(log_name, rid, size, structured, with_message)
+            for rid in range(after + 1, last + 1)
+        ]
+        return "page", "\r\n".join(lines), len(lines)
+
+    def _time(self, rid: int, size: int) -> datetime:
+        """TimeCreated of record rid in a log of size records (rid == size is newest)."""
+        span = timedelta(hours=self.config.span_hours)
+        return self._now - span * (size - rid) / max(size, 1)
+
+    def _first_at(self, when: datetime, size: int) -> int:
+        """Smallest RecordId with TimeCreated >= when (size + 1 if none)."""
+        low, high = 1, size + 1
+        while low < high:
+            mid = (low + high) // 2
+            if self._time(mid, size) >= when:
+                high = mid
+            else:
+                low = mid + 1
+        return low
+
+    def _event(
+        self, log_name: str, rid: int, size: int, structured: bool, with_message: bool
+    ) -> str:
+        sysmon = "Sysmon" in log_name
+        event_id = (1, 3, 11, 13, 22)[rid % 5] if sysmon else (4624, 4625, 4634, 4672, 4688)[rid % 5]
+        row: Dict = {
+            # .NET "o" format, as ToString('o') renders it: 7 fractional digits.
+            "TimeCreated": self._time(rid, size).strftime("%Y-%m-%dT%H:%M:%S.%f0Z"),
+            "RecordId": rid,
+            "Id": event_id,
+            "LevelDisplayName": "Information",
+            "ProviderName": "Microsoft-Windows-Sysmon" if sysmon else "Microsoft-Windows-Security-Auditing",
+            "MachineName": "WIN11LAB.lab.local",
+        }
+        if with_message:
+            reps = self.config.message_bytes // len(_LOREM) + 1
+            row["Message"] = (f"Record {rid}. " + _LOREM * reps)[: self.config.message_bytes]
+        if structured:
+            row["EventData"] = {
+                "Image": f"C:\\Windows\\System32\\proc{rid % 97}.exe",
+                "ProcessId": str(1000 + rid % 5000),
+                "User": "LAB\\analyst",
+                "IpAddress": f"10.0.{rid % 256}.{rid % 200}",
+                "LogonType": str(rid % 11),
+            }
+        return json.dumps(row, separators=(",", ":"))
+
+    def _processes(self) -> str:
+        procs = [
+            {
+                "PID": 100 + i,
+                "Name": f"proc{i % 40}",
+                "Path": f"C:\\Program Files\\Vendor\\proc{i % 40}.exe",
+                "User": "LAB\\analyst",
+                "HashSHA256": f"{i % 40:064x}",
+            }
+            for i in range(self.config.processes)
+        ]
+        return json.dumps(procs, separators=(",", ":"))
+
+
+class SimulatedSession:
+    """
+    Drop-in for winrm.Session. Every session serves the class-level
+    `config`, so set SimulatedSession.config before collecting.
+    """
+
+    config = EndpointConfig()
+    # The endpoint's clock; shared by every session so that clones of a
+    # client (extra shells) see the same event times.
+    now = datetime.now(timezone.utc)
+
+    def __init__(self, target: str, auth=None, **kwargs) -> None:
+        self.url = target
+        self.protocol = SimulatedProtocol(self.config, self.now)
+
+
+def install(config: Optional[EndpointConfig] = None) -> None:
+    """Point soclog.windows_remote at the simulated endpoint."""
+    # windows_remote imports pywinrm when the first client is created and
+    # looks up winrm.Session then, so patching the module is enough.
+    import winrm
+
+    if config is not None:
+        SimulatedSession.config = config
+    SimulatedSession.now = datetime.now(timezone.utc)
+    winrm.Session = SimulatedSession
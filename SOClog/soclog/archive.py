@@ -0,0 +1,254 @@
+"""
+Write-once artefact sink: hash and ZIP while writing.
+
+Every artefact of a run is written exactly once through ArtifactSink.open().
+The same byte stream feeds the SHA-256/size bookkeeping used for the
+manifest, the ZIP entry and (optionally) a loose copy in the run
+directory, so large collections are no longer written, re-read for
+hashing and re-read again for zipping.
+
+zipfile only allows one entry to be written at a time. The first
+artefact opened streams straight into the ZIP; artefacts opened while
+the ZIP is busy (the collectors run concurrently) are kept in their
+loose file, or a temporary spool file, and copied into the ZIP as soon
+as it is free again (at the latest by close()). Writers never wait for
+each other.
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from . import metrics
+from .defaults import ZIP_METHODS
+
+ZIP_COMPRESSION = dict(
+    zip(ZIP_METHODS, (zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED, zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA))
+)
+
+
+class _ArtifactStream(io.BufferedIOBase):
+    """Binary writer that hashes and fans out every chunk it receives."""
+
+    def __init__(self, targets: List) -> None:
+        super().__init__()
+        self._targets = targets
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        # Seconds spent hashing, writing and compressing (see metrics.py).
+        self.write_s = 0.0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("write to closed artefact stream")
+        started = time.perf_counter()
+        self.sha256.update(data)
+        for target in self._targets:
+            target.write(data)
+        n = len(data)
+        self.size += n
+        self.write_s += time.perf_counter() - started
+        return n
+
+    def flush(self) -> None:
+        for target in self._targets:
+            target.flush()
+
+
+class ArtifactSink:
+    """
+    Destination for all artefacts of one run directory.
+
+    out_dir: run directory (loose copies and the ZIP live here)
+    zip_path: ZIP to create, or None to only keep loose files
+    compression / level: ZIP method (see ZIP_COMPRESSION) and level
+    keep_loose: also keep an uncompressed copy of each artefact in out_dir
+
+    records lists one manifest record per artefact, in the order the
+    artefacts were closed. The ZIP is created on the first write and
+    finished by close(); if nothing was written no ZIP is left behind.
+    """
+
+    def __init__(
+        self,
+        out_dir: Path,
+        zip_path: Optional[Path],
+        compression: str = "deflated",
+        level: Optional[int] = None,
+        keep_loose: bool = True,
+    ) -> None:
+        if compression not in ZIP_COMPRESSION:
+            raise ValueError(
+                f"Unknown ZIP compression {compression!r}; "
+                f"expected one of {tuple(ZIP_COMPRESSION)}."
+            )
+        if zip_path is None and not keep_loose:
+            raise ValueError("An artefact sink needs a ZIP, loose files, or both.")
+        self.out_dir = Path(out_dir)
+        self.zip_path = Path(zip_path) if zip_path else None
+        self.compression = compression
+        self.level = level
+        self.keep_loose = keep_loose
+        self.records: List[Dict] = []
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._zip_busy = threading.Lock()
+        self._state = threading.Lock()
+        # (name, spool file or None for "copy from the loose file")
+        self._pending: List[Tuple[str, Optional[BinaryIO]]] = []
+
+    def _zipfile(self) -> zipfile.ZipFile:
+        with self._state:
+            if self._zip is None:
+                self._zip = zipfile.ZipFile(
+                    self.zip_path,
+                    "w",
+                    ZIP_COMPRESSION[self.compression],
+                    compresslevel=self.level,
+                )
+            return self._zip
+
+    def _zip_entry(self, name: str):
+        # force_zip64: streamed entries have no known size up front and
+        # event logs can exceed 2 GiB.
+        return self._zipfile().open(name, "w", force_zip64=True)
+
+    @contextmanager
+    def open(self, name: str) -> Iterator[io.BufferedIOBase]:
+        """
+        Open artefact `name` (relative to the run directory) for writing.
+
+        If the with-block raises, whatever was written is still kept and
+        recorded with "partial": true, so evidence gathered before a
+        failure is not thrown away silently.
+        """
+        loose = open(self.out_dir / name, "wb") if self.keep_loose else None
+        spool = None
+        entry = None
+        direct = self.zip_path is not None and self._zip_busy.acquire(blocking=False)
+        targets = [t for t in (loose,) if t is not None]
+        try:
+            if direct:
+                entry = self._zip_entry(name)
+                targets.append(entry)
+            elif self.zip_path is not None and loose is None:
+                spool = tempfile.TemporaryFile(dir=self.out_dir, prefix=".soclog-spool-")
+                targets.append(spool)
+
+            stream = _ArtifactStream(targets)
+            partial = False
+            try:
+                yield stream
+            except BaseException:
+                partial = True
+                raise
+            finally:
+                stream.flush()
+                if entry is not None:
+                    entry.close()
+                    entry = None
+                if loose is not None:
+                    loose.close()
+                if self.zip_path is not None and not direct:
+                    with self._state:
+                        self._pending.append((name, spool))
+                    spool = None  # now owned by the pending queue
+                self._record(name, stream, partial)
+        finally:
+            if entry is not None:
+                entry.close()
+            if spool is not None:
+                spool.close()
+            if direct:
+                self._drain_pending_locked()
+                self._zip_busy.release()
+            elif self.zip_path is not None and self._zip_busy.acquire(blocking=False):
+                try:
+                    self._drain_pending_locked()
+                finally:
+                    self._zip_busy.release()
+
+    def _drain_pending_locked(self) -> None:
+        """Copy queued artefacts into the ZIP. Caller holds _zip_busy."""
+        while True:
+            with self._state:
+                if not self._pending:
+                    return
+                name, spool = self._pending.pop(0)
+            try:
+                with self._zip_entry(name) as entry:
+                    if spool is not None:
+                        spool.seek(0)
+                        shutil.copyfileobj(spool, entry, 1024 * 1024)
+                    else:
+                        with open(self.out_dir / name, "rb") as src:
+                            shutil.copyfileobj(src, entry, 1024 * 1024)
+            finally:
+                if spool is not None:
+                    spool.close()
+
+    @contextmanager
+    def open_text(self, name: str) -> Iterator[TextIO]:
+        """Text (UTF-8) variant of open()."""
+        with self.open(name) as raw:
+            text = io.TextIOWrapper(raw, encoding="utf-8")
+            try:
+                yield text
+            finally:
+                text.flush()
+                text.detach()
+
+    def _record(self, name: str, stream: _ArtifactStream, partial: bool) -> None:
+        record = {
+            "file_name": os.path.basename(name),
+            "relative_path": name,
+            "size_bytes": stream.size,
+            "sha256": stream.sha256.hexdigest(),
+            "mtime_utc": datetime.now(timezone.utc).isoformat(),
+        }
+        if partial:
+            record["partial"] = True
+        with self._state:
+            self.records.append(record)
+        metrics.record(write_s=stream.write_s, bytes_written=stream.size)
+
+    def add_file(self, path: Path) -> None:
+        """
+        Copy an existing file (e.g. manifest.json, manifest.sig) into the
+        ZIP under its base name. It is not added to records.
+        """
+        if self.zip_path is None:
+            return
+        path = Path(path)
+        with self._zip_busy:
+            self._drain_pending_locked()
+            with self._zip_entry(path.name) as entry, open(path, "rb") as src:
+                shutil.copyfileobj(src, entry, 1024 * 1024)
+
+    @property
+    def names(self) -> List[str]:
+        with self._state:
+            return [r["relative_path"] for r in self.records]
+
+    def close(self) -> Optional[Path]:
+        """Finish the ZIP. Returns its path, or None if no ZIP was written."""
+        if self.zip_path is not None:
+            with self._zip_busy:
+                self._drain_pending_locked()
+        with self._state:
+            zf, self._zip = self._zip, None
+        if zf is None:
+            return None
+        zf.close()
+        return self.zip_path
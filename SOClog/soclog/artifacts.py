@@ -0,0 +1,214 @@
+"""
+Incremental writers for collected event artefacts.
+
+Event collectors hand over events page by page; these writers append
+each page to the artefact file as it arrives so the full event list
+never has to be held in memory.
+
+Three output formats are supported:
+  - "json":     one pretty-printed JSON array (the classic SOClog layout)
+  - "ndjson":   one compact JSON object per line
+  - "columnar": column-wise, dictionary-encoded and compressed (see
+                columnar.py)
+
+json and ndjson can be gzip-compressed on the fly (".gz" suffix).
+iter_events() reads any of these back, again without loading the whole
+file.
+"""
+
+import gzip
+import io
+import json
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, BinaryIO, Dict, Iterable, Iterator, TextIO, Union
+
+from .columnar import ColumnarReader, ColumnarWriter
+from .defaults import FORMATS
+
+# gzip level used for --gzip. Level 6 compresses JSON nearly as well as 9
+# at a fraction of the CPU cost.
+GZIP_LEVEL = 6
+
+
+def artifact_file_name(stem: str, fmt: str = "json", compress: bool = False) -> str:
+    """Return e.g. 'security_events.ndjson.gz' for stem 'security_events'."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown artefact format {fmt!r}; expected one of {FORMATS}.")
+    if fmt == "columnar" and compress:
+        raise ValueError("The columnar format is compressed already; gzip does not apply.")
+    return f"{stem}.{fmt}" + (".gz" if compress else "")
+
+
+class JsonArrayWriter:
+    """
+    Write a JSON array one element at a time.
+
+    The output is formatted exactly like json.dump(items, f, indent=2),
+    so files stay identical to what SOClog wrote before paging existed.
+    """
+
+    def __init__(self, f: TextIO) -> None:
+        self.f = f
+        self.count = 0
+
+    def write(self, item: Dict) -> None:
+        text = json.dumps(item, indent=2).replace("\n", "\n  ")
+        self.f.write(("[\n  " if self.count == 0 else ",\n  ") + text)
+        self.count += 1
+
+    def write_many(self, items: Iterable[Dict]) -> None:
+        for item in items:
+            self.write(item)
+
+    def close(self) -> None:
+        self.f.write("\n]" if self.count else "[]")
+
+    def finish(self, empty_data: Dict) -> None:
+        """Close the array, or write empty_data if nothing was written."""
+        if self.count:
+            self.close()
+        else:
+            json.dump(empty_data, self.f, indent=2)
+
+
+class NdjsonWriter:
+    """Write one compact JSON document per line."""
+
+    def __init__(self, f: TextIO) -> None:
+        self.f = f
+        self.count = 0
+
+    def write(self, item: Dict) -> None:
+        self.f.write(json.dumps(item, separators=(",", ":"), ensure_ascii=False))
+        self.f.write("\n")
+        self.count += 1
+
+    def write_many(self, items: Iterable[Dict]) -> None:
+        for item in items:
+            self.write(item)
+
+    def finish(self, empty_data: Dict) -> None:
+        """
+        Nothing to terminate. An NDJSON file with no events is left empty
+        rather than given a {"message": ...} line that looks like an event.
+        """
+
+
+@contextmanager
+def open_event_writer(
+    target: Union[str, Path, BinaryIO], fmt: str = "json", compress: bool = False
+) -> Iterator[Union[JsonArrayWriter, NdjsonWriter, ColumnarWriter]]:
+    """
+    Open target for writing events in the given format.
+
+    target is a path, or a binary stream (e.g. from archive.ArtifactSink)
+    which is written to but left open. The caller must call
+    writer.finish(empty_data) before leaving the with-block.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown artefact format {fmt!r}; expected one of {FORMATS}.")
+    owns_target = isinstance(target, (str, Path))
+    raw = open(target, "wb") if owns_target else target
+    try:
+        if fmt == "columnar":
+            yield ColumnarWriter(raw)
+            return
+        gz = None
+        if compress:
+            gz = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=GZIP_LEVEL)
+        text = io.TextIOWrapper(gz or raw, encoding="utf-8")
+        try:
+            yield NdjsonWriter(text) if fmt == "ndjson" else JsonArrayWriter(text)
+        finally:
+            text.flush()
+            text.detach()
+            if gz is not None:
+                gz.close()
+    finally:
+        if owns_target:
+            raw.close()
+
+
+# Characters read per chunk by iter_events() for JSON arrays.
+_READ_CHUNK = 1024 * 1024
+
+
+def iter_events(source: Union[str, Path, IO[bytes]], name: str = "") -> Iterator[Dict]:
+    """
+    Yield the objects stored in an artefact written by this module.
+
+    source is a path or a binary stream; name (default: the path) tells
+    the format apart by suffix: ".ndjson" or ".json", optionally ".gz",
+    or ".columnar" (which needs a seekable stream).
+    A JSON array yields its elements; a single JSON object (e.g. the
+    {"message": ...} written when a log had no events) is yielded as is.
+    """
+    if isinstance(source, (str, Path)):
+        name = name or str(source)
+        with open(source, "rb") as f:
+            yield from iter_events(f, name)
+        return
+
+    if name.endswith(".columnar"):
+        yield from ColumnarReader(source).iter_rows()
+        return
+
+    raw: IO[bytes] = source
+    if name.endswith(".gz"):
+        raw = gzip.GzipFile(fileobj=source, mode="rb")
+        name = name[: -len(".gz")]
+    text = io.TextIOWrapper(raw, encoding="utf-8")
+    try:
+        if name.endswith(".ndjson"):
+            for line in text:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_values(text)
+    finally:
+        text.detach()
+
+
+def _iter_json_values(text: TextIO) -> Iterator[Dict]:
+    """Incrementally decode a top-level JSON array (or single value)."""
+    decode = json.JSONDecoder().raw_decode
+    buf = text.read(_READ_CHUNK)
+    pos = 0
+    in_array = False
+    while True:
+        # Skip whitespace and array punctuation between values.
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf):
+                break
+            more = text.read(_READ_CHUNK)
+            if not more:
+                return
+            buf, pos = more, 0
+        if buf[pos] == "[" and not in_array:
+            in_array = True
+            pos += 1
+            continue
+        if buf[pos] == "]" and in_array:
+            return
+        while True:
+            try:
+                value, end = decode(buf, pos)
+                if end < len(buf):
+                    break
+                # A number at the very end of the buffer may continue
+                # in the next chunk.
+            except json.JSONDecodeError:
+                pass
+            more = text.read(_READ_CHUNK)
+            if not more:
+                value, end = decode(buf, pos)
+                break
+            buf, pos = buf[pos:] + more, 0
+        yield value
+        pos = end
+        if not in_array:
+            return
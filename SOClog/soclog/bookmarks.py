@@ -0,0 +1,104 @@
+"""
+Local bookmark store for incremental (--since-last) collection.
+
+For every host and event log channel we remember the highest
+EventRecordID collected so far and the TimeCreated of that record. The
+next run asks the endpoint only for records after it. The timestamp lets
+the collector script tell a still-valid bookmark apart from a log that
+has been cleared (record numbers restart) or has wrapped (old records
+overwritten).
+
+The store is a small JSON file:
+
+{
+  "win10lab": {
+    "Security": {"record_id": 123456, "time_created": "...", "updated_at_utc": "..."}
+  }
+}
+"""
+
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+BOOKMARK_FILE_NAME = ".soclog_bookmarks.json"
+
+
+@dataclass
+class Bookmark:
+    """Last collected record for one host/channel pair."""
+
+    record_id: int
+    time_created: str
+    updated_at_utc: str = ""
+
+
+class BookmarkStore:
+    """
+    Thread-safe JSON-backed bookmark store.
+
+    Every update() is written straight to disk (atomically, via a temp
+    file and rename) so a crash half way through a sweep keeps the
+    bookmarks of the hosts that already finished.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path).expanduser()
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, Dict]] = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._data = json.load(f) or {}
+
+    def get(self, host: str, channel: str) -> Optional[Bookmark]:
+        with self._lock:
+            entry = self._data.get(host, {}).get(channel)
+        if not entry:
+            return None
+        return Bookmark(
+            record_id=int(entry["record_id"]),
+            time_created=str(entry.get("time_created", "")),
+            updated_at_utc=str(entry.get("updated_at_utc", "")),
+        )
+
+    def update(self, host: str, channel: str, record_id: int, time_created: str) -> None:
+        bookmark = Bookmark(
+            record_id=int(record_id),
+            time_created=time_created,
+            updated_at_utc=datetime.now(timezone.utc).isoformat(),
+        )
+        with self._lock:
+            self._data.setdefault(host, {})[channel] = asdict(bookmark)
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def latest_record(events: Union[Dict, Iterable[Dict], None]) -> Optional[Bookmark]:
+    """
+    Return a Bookmark for the event with the highest RecordId, or None.
+
+    Accepts what the event collectors return: a list of event dicts, a
+    single event dict (ConvertTo-Json unwraps one-element arrays), or a
+    status dict such as {"message": ...} which yields None.
+    """
+    if isinstance(events, dict):
+        events = [events]
+    best = None
+    for event in events or []:
+        if not isinstance(event, dict) or event.get("RecordId") is None:
+            continue
+        if best is None or int(event["RecordId"]) > int(best["RecordId"]):
+            best = event
+    if best is None:
+        return None
+    return Bookmark(record_id=int(best["RecordId"]), time_created=str(best.get("TimeCreated", "")))
@@ -1,56 +1,57 @@
 import argparse
 import getpass
 import json
-import os
-import warnings
-from datetime import datetime
+import re
+import signal
+import sys
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 from . import __version__
-from .collectors import (
-    collect_sysmon_logs,
-    collect_security_logs,
-    collect_processes,
-)
+from .bookmarks import BOOKMARK_FILE_NAME, BookmarkStore
 from .config import (
     HostConfig,
+    default_cache_dir,
     load_hosts_from_yaml,
+    parse_interval,
     resolve_password_for_host,
 )
-from .integrity import (
-    build_manifest,
-    write_manifest,
-    sign_manifest_with_gpg,
+from .defaults import (
+    DEFAULT_MAX_SHELLS,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_RETRIES,
+    DEFAULT_SLICE_HOURS,
+    EVENT_DATA_MODES,
+    FORMATS,
+    ZIP_METHODS,
+)
+from .sharding import parse_shard, select_shard
+from .eventtime import format_time, parse_iso_time
+from .filters import FILTER_LOGS, EventFilter, parse_filters
+from .hashcache import HASH_CACHE_FILE_NAME, HashCacheStore
+from .progress import (
+    RESET,
+    BOLD,
+    DIM,
+    RED,
+    GREEN,
+    YELLOW,
+    MAGENTA,
+    CYAN,
+    ProgressReporter,
+    print_summary,
 )
-from .windows_remote import WindowsRemote, WindowsRemoteError
-import zipfile
-
-# =========================
-#  Warning suppression
-#  (hide spnego/ARC4 deprecation noise)
-# =========================
-try:
-    from cryptography.utils import CryptographyDeprecationWarning
-
-    warnings.filterwarnings("ignore", category=CryptographyDeprecationWarning)
-except Exception:
-    # If cryptography layout changes, just ignore
-    pass
-
-# =========================
-#  Simple ANSI colours
-# =========================
-RESET = "\033[0m"
-BOLD = "\033[1m"
-DIM = "\033[2m"
-
-RED = "\033[31m"
-GREEN = "\033[32m"
-YELLOW = "\033[33m"
-BLUE = "\033[34m"
-MAGENTA = "\033[35m"
-CYAN = "\033[36m"
+
+if TYPE_CHECKING:
+    from .pipeline import CollectOptions
+
+# Modules that load heavy dependencies (pywinrm and friends, sqlite3,
+# zipfile, ...) are imported inside the commands that use them, so
+# 'soclog --help' and '--version' start quickly. The benchmark in
+# benchmarks/bench_startup.py keeps an eye on this.
 
 
 def print_banner() -> None:
@@ -74,12 +75,23 @@ def print_banner() -> None:
     print()
 
 
-def parse_args() -> argparse.Namespace:
+def _shard_arg(value: str) -> Tuple[int, int]:
+    try:
+        return parse_shard(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def build_parser(prog: str = "soclog", description: Optional[str] = None) -> argparse.ArgumentParser:
+    """Parser for the collection options (shared by a run and 'soclog daemon')."""
     parser = argparse.ArgumentParser(
-        prog="soclog",
-        description=(
+        prog=prog,
+        description=description or (
             "SOClog - collect Windows Sysmon + Security logs and process list "
-            "from Kali via WinRM, and package into a ZIP file with integrity hashes."
+            "from Kali via WinRM, and package into a ZIP file with integrity hashes. "
+            "Other commands: 'soclog verify DIR|ZIP...', 'soclog index', "
+            "'soclog query', 'soclog daemon', 'soclog report', 'soclog detect', "
+            "'soclog ioc'."
         ),
     )
 
@@ -92,6 +104,14 @@ def parse_args() -> argparse.Namespace:
         "--config",
         help="YAML file listing multiple Windows hosts (see examples/hosts_example.yaml).",
     )
+    parser.add_argument(
+        "--no-inventory-cache",
+        action="store_true",
+        help=(
+            "Always re-parse the --config YAML instead of using the parsed copy "
+            "cached in ~/.cache/soclog (refreshed whenever the YAML changes)."
+        ),
+    )
 
     parser.add_argument(
         "--user",
@@ -110,6 +130,197 @@ def parse_args() -> argparse.Namespace:
         help="Collect logs for the last N days.",
     )
 
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        metavar="N",
+        help=(
+            "Events fetched per WinRM call when reading Sysmon/Security logs "
+            f"(default: {DEFAULT_PAGE_SIZE}, or chosen from the event size with "
+            "--preflight). Lower it for hosts with very large events."
+        ),
+    )
+
+    parser.add_argument(
+        "--slice-hours",
+        type=float,
+        default=DEFAULT_SLICE_HOURS,
+        metavar="H",
+        help=(
+            "Split time windows longer than H hours into H-hour slices read over "
+            f"several WinRM shells at once, then merged in time order (default: "
+            f"{DEFAULT_SLICE_HOURS}; 0 = one sequential read)."
+        ),
+    )
+
+    parser.add_argument(
+        "--slice-shells",
+        type=int,
+        metavar="N",
+        help="Shells reading the slices of one log at once (default: --max-shells).",
+    )
+
+    parser.add_argument(
+        "--event-data",
+        choices=EVENT_DATA_MODES,
+        default="message",
+        help=(
+            "Event detail to export: 'message' (rendered Message text, default), "
+            "'structured' (EventData name/value fields, no Message rendering; "
+            "fastest and smallest) or 'both'."
+        ),
+    )
+
+    parser.add_argument(
+        "--format",
+        dest="output_format",
+        choices=FORMATS,
+        default="json",
+        help=(
+            "Format of sysmon_events/security_events: 'json' (one indented array, "
+            "default), 'ndjson' (one compact event per line) or 'columnar' "
+            "(compact column-wise file, see docs)."
+        ),
+    )
+
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Also write each event file in the columnar format (.columnar).",
+    )
+
+    filters = parser.add_argument_group(
+        "server-side filters",
+        "Applied by Get-WinEvent on the endpoint. LOG is 'sysmon' or 'security'; "
+        "each flag can be repeated and overrides the same key of the host's "
+        "profile/filters in the YAML.",
+    )
+    filters.add_argument(
+        "--profile",
+        metavar="NAME",
+        help="Use collection profile NAME from the --config YAML for every host.",
+    )
+    filters.add_argument(
+        "--include-ids",
+        action="append",
+        default=[],
+        metavar="LOG=IDS",
+        help="Only collect these event IDs, e.g. sysmon=1,3,11-13.",
+    )
+    filters.add_argument(
+        "--exclude-ids",
+        action="append",
+        default=[],
+        metavar="LOG=IDS",
+        help="Never collect these event IDs, e.g. security=4624,4634,5156.",
+    )
+    filters.add_argument(
+        "--providers",
+        action="append",
+        default=[],
+        metavar="LOG=NAMES",
+        help="Only collect events from these providers (comma-separated).",
+    )
+    filters.add_argument(
+        "--xpath",
+        action="append",
+        default=[],
+        metavar="LOG=EXPR",
+        help="Extra XPath condition, e.g. \"security=EventData[Data[@Name='LogonType']='3']\".",
+    )
+
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Gzip-compress the event files while they are written (adds .gz).",
+    )
+
+    parser.add_argument(
+        "--hash-cache",
+        action="store_true",
+        help=(
+            "Cache executable hashes on this machine, per host "
+            f"(<output-dir>/{HASH_CACHE_FILE_NAME}), so repeat runs skip binaries "
+            "whose path, size and modification time are unchanged. Cached hashes "
+            "are NOT recomputed: a replaced binary with a forged timestamp keeps "
+            "its old hash. Such processes are marked HashCached. Off by default."
+        ),
+    )
+
+    parser.add_argument(
+        "--zip-compression",
+        choices=ZIP_METHODS,
+        default="deflated",
+        help="Compression method for the per-host ZIP (default: deflated).",
+    )
+
+    parser.add_argument(
+        "--zip-level",
+        type=int,
+        metavar="N",
+        help=(
+            "Compression level for deflated (0-9) or bzip2 (1-9) ZIPs. "
+            "Lower is faster; default is the zlib/bz2 default."
+        ),
+    )
+
+    parser.add_argument(
+        "--no-loose",
+        action="store_true",
+        help=(
+            "Write artefacts only into the ZIP, without uncompressed copies in the "
+            "output directory (manifest.json and manifest.sig are still kept)."
+        ),
+    )
+
+    parser.add_argument(
+        "--wire",
+        choices=("plain", "gzip"),
+        help=(
+            "How collector output travels over WinRM: 'plain' (default) or 'gzip' "
+            "(compressed on the Windows host, typically 5-10x fewer bytes for logs)."
+        ),
+    )
+
+    parser.add_argument(
+        "--preflight",
+        action="store_true",
+        help=(
+            "Before collecting, size every host's Sysmon/Security logs for the "
+            "requested window, check the estimate against free disk space (and "
+            "--transfer-budget), pick page size and compression, and stop if the "
+            "sweep does not fit."
+        ),
+    )
+
+    parser.add_argument(
+        "--transfer-budget",
+        type=_size_arg,
+        metavar="SIZE",
+        help=(
+            "Most event data the whole sweep may pull over WinRM, e.g. 500M or 20G; "
+            "implies --preflight (turns on --wire gzip if that is enough)."
+        ),
+    )
+
+    parser.add_argument(
+        "--since-last",
+        action="store_true",
+        help=(
+            "Only collect events newer than the last run for each host and log "
+            "(per-host bookmarks). The first run, or a cleared log, falls back to "
+            "--hours/--days."
+        ),
+    )
+
+    parser.add_argument(
+        "--bookmarks",
+        help=(
+            "Bookmark file used by --since-last "
+            f"(default: <output-dir>/{BOOKMARK_FILE_NAME})."
+        ),
+    )
+
     parser.add_argument(
         "--output-dir",
         default=str(Path.home() / "soclog_output"),
@@ -133,7 +344,17 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--sign-manifest",
         action="store_true",
-        help="Sign manifest.json with GPG (requires gpg installed).",
+        help=(
+            "Sign the sweep with GPG (requires gpg installed): one signature over a "
+            "Merkle root of every host's manifest.json, plus a manifest.proof.json "
+            "per host. soclog daemon signs each host's manifest instead."
+        ),
+    )
+
+    parser.add_argument(
+        "--sign-each-host",
+        action="store_true",
+        help="With --sign-manifest: write a manifest.sig per host (one gpg run each).",
     )
 
     parser.add_argument(
@@ -141,13 +362,139 @@ def parse_args() -> argparse.Namespace:
         help="GPG key ID or email to use when signing manifest. Optional.",
     )
 
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        metavar="N",
+        help=(
+            "Collect up to N hosts at the same time (default: 1). "
+            "Passwords are prompted for before collection starts."
+        ),
+    )
+
+    parser.add_argument(
+        "--max-shells",
+        type=int,
+        default=DEFAULT_MAX_SHELLS,
+        metavar="N",
+        help=(
+            "Maximum WinRM shells opened per host, used to run the Sysmon, "
+            f"Security and process collectors at once (default: {DEFAULT_MAX_SHELLS}; "
+            "1 = one after another). Per-host 'max_shells' in the YAML overrides it."
+        ),
+    )
+
+    parser.add_argument(
+        "--host-budget",
+        type=float,
+        metavar="SECONDS",
+        help=(
+            "Maximum time each host may spend on remote collection. Commands "
+            "still running when it expires are stopped and the host is "
+            "reported as partial with whatever was collected."
+        ),
+    )
+
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        metavar="N",
+        help=(
+            "Retries per WinRM command after a transient connection error, "
+            f"with jittered exponential backoff (default: {DEFAULT_RETRIES}; 0 = none)."
+        ),
+    )
+
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help=(
+            "After collecting, add the new runs to the local event index "
+            "(<output-dir>/.soclog_index.sqlite) for 'soclog query'."
+        ),
+    )
+
+    parser.add_argument(
+        "--detect",
+        action="append",
+        metavar="RULES",
+        help=(
+            "After collecting, run the Sigma-style rules in this file or directory "
+            "over the new runs and write alerts.ndjson per run (repeatable; see "
+            "'soclog detect')."
+        ),
+    )
+
+    parser.add_argument(
+        "--ioc-feed",
+        action="append",
+        metavar="FILE",
+        help=(
+            "After collecting, check process hashes and event IPs, domains and "
+            "hashes of the new runs against this IOC feed and write ioc_hits.json "
+            "per run (repeatable; see 'soclog ioc')."
+        ),
+    )
+
+    parser.add_argument(
+        "--shard",
+        type=_shard_arg,
+        metavar="I/N",
+        help=(
+            "Collect only this node's share of the hosts when N collector nodes "
+            "share one inventory (consistent hashing on host name; I is 1..N). "
+            "Writes soclog_summary_<I>of<N>.json to --output-dir for 'soclog report'."
+        ),
+    )
+
+    parser.add_argument(
+        "--prometheus-textfile",
+        metavar="PATH",
+        help=(
+            "Also write the run's per-host/per-stage metrics (see metrics.json "
+            "in each run directory) to PATH in the Prometheus text format, e.g. "
+            "for node_exporter's textfile collector (*.prom)."
+        ),
+    )
+
     parser.add_argument(
         "--version",
         action="version",
         version=f"%(prog)s {__version__}",
     )
 
-    return parser.parse_args()
+    return parser
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    return build_parser().parse_args(argv)
+
+
+def filters_from_args(args: argparse.Namespace) -> Dict[str, EventFilter]:
+    """Turn --include-ids/--exclude-ids/--providers/--xpath LOG=VALUE into filters."""
+    spec: Dict[str, Dict[str, str]] = {}
+    for key, values in (
+        ("include_ids", args.include_ids),
+        ("exclude_ids", args.exclude_ids),
+        ("providers", args.providers),
+        ("xpath", args.xpath),
+    ):
+        flag = "--" + key.replace("_", "-")
+        for value in values:
+            log, sep, rest = value.partition("=")
+            log = log.strip().lower()
+            if not sep or log not in FILTER_LOGS:
+                raise ValueError(
+                    f"{flag} expects LOG=VALUE with LOG one of {', '.join(FILTER_LOGS)}; got {value!r}."
+                )
+            entry = spec.setdefault(log, {})
+            if key in ("include_ids", "exclude_ids", "providers") and key in entry:
+                entry[key] += "," + rest
+            else:
+                entry[key] = rest
+    return parse_filters(spec, "command line")
 
 
 def make_host_configs_from_single(
@@ -166,47 +513,720 @@ def make_host_configs_from_single(
     return [cfg]
 
 
-def prepare_output_dir(base_output: str, host_name: str) -> Path:
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    path = Path(base_output).expanduser().resolve() / host_name / ts
-    path.mkdir(parents=True, exist_ok=True)
-    return path
+def resolve_passwords(
+    host_configs: List[HostConfig], ask_pass: bool
+) -> Tuple[List[Tuple[HostConfig, str]], List[HostConfig]]:
+    """
+    Resolve a password for every host before any collection starts.
 
+    All interactive prompts happen here, one after another, so that the
+    worker pool never has to read from the terminal.
 
-def print_progress(stage: str, current_step: int, total_steps: int) -> None:
-    """
-    Print a simple stage-based progress bar.
-
-    This is not per-event or per-byte; it's per major stage:
-      1) Connect
-      2) Sysmon
-      3) Security
-      4) Processes
-      5) Manifest (+sign)
-      6) ZIP
+    Returns (jobs, skipped): jobs is a list of (cfg, password) pairs,
+    skipped lists hosts for which no password could be obtained.
     """
-    percent = int(current_step * 100 / total_steps)
-    bar_width = 30
-    filled = int(bar_width * percent / 100)
-    bar = "█" * filled + "-" * (bar_width - filled)
-    print(f"{BLUE}[>]{RESET} {stage}")
-    print(f"    {BOLD}{GREEN}{bar}{RESET} {BOLD}{percent:3d}%{RESET}")
+    jobs: List[Tuple[HostConfig, str]] = []
+    skipped: List[HostConfig] = []
+
+    for cfg in host_configs:
+        password = resolve_password_for_host(cfg)
+
+        if password is None and (cfg.ask_password or ask_pass):
+            password = getpass.getpass(
+                prompt=f"Password for {cfg.username}@{cfg.host}: "
+            )
+
+        if password is None:
+            print(
+                f"{RED}[!]{RESET} No password available for host {cfg.name}. "
+                "Use an env var (password_env) or --ask-pass."
+            )
+            skipped.append(cfg)
+            continue
 
+        jobs.append((cfg, password))
 
-def create_zip_from_dir(target_dir: Path, zip_path: Path) -> None:
-    """Zip the contents of a directory into zip_path."""
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-        for root, dirs, files in os.walk(target_dir):
-            for filename in files:
-                full_path = Path(root) / filename
-                # store relative path (inside host/timestamp dir)
-                rel_path = full_path.relative_to(target_dir)
-                zf.write(full_path, arcname=rel_path)
+    return jobs, skipped
 
 
-def main() -> None:
+def verify_main(argv: List[str]) -> int:
+    """`soclog verify`: re-check stored collections against manifest.json."""
+    from .verify import verify_many
+
+    parser = argparse.ArgumentParser(
+        prog="soclog verify",
+        description=(
+            "Re-hash every file listed in manifest.json (and check manifest.sig "
+            "with gpg) for run directories or ZIPs. Directories that are not run "
+            "directories are searched recursively."
+        ),
+    )
+    parser.add_argument("paths", nargs="+", metavar="DIR|ZIP")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="N",
+        help="Collections (or files) checked in parallel (default: CPU count, max 8).",
+    )
+    parser.add_argument(
+        "--no-signature",
+        action="store_true",
+        help="Skip gpg verification of manifest.sig.",
+    )
+    parser.add_argument(
+        "--gpg-key",
+        metavar="KEY",
+        help=(
+            "Require a signature by this key (key ID, fingerprint or e-mail); "
+            "unsigned collections fail instead of only warning."
+        ),
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Only print collections that fail.",
+    )
+    args = parser.parse_args(argv)
+    if args.gpg_key and args.no_signature:
+        parser.error("--gpg-key needs signature checking; drop --no-signature.")
+
+    results = verify_many(
+        args.paths,
+        check_signature=not args.no_signature,
+        workers=args.workers,
+        gpg_key=args.gpg_key,
+    )
+    if not results:
+        print(f"{YELLOW}[!]{RESET} No collections found.")
+        return 1
+
+    failed = 0
+    for r in results:
+        notes = [f"signature: {r.signature}"] if r.signature else []
+        if r.proof:
+            notes.append(f"sweep proof: {r.proof}")
+        sig = f" {DIM}({', '.join(notes)}){RESET}" if notes else ""
+        if r.ok:
+            if not args.quiet:
+                print(f"{GREEN}[+]{RESET} OK    {r.path} {DIM}({r.checked} files){RESET}{sig}")
+                for warning in r.warnings:
+                    print(f"    {YELLOW}[*]{RESET} {warning}")
+            continue
+        failed += 1
+        print(f"{RED}[!]{RESET} FAIL  {r.path}{sig}")
+        for problem in r.problems:
+            print(f"    {RED}-{RESET} {problem}")
+
+    print(
+        f"{BOLD}{len(results) - failed}/{len(results)} collection(s) verified"
+        f"{RESET}" + (f", {RED}{failed} failed{RESET}" if failed else "")
+    )
+    return 1 if failed else 0
+
+
+def _print_index_stats(stats, db_path: str) -> None:
+    print(
+        f"{GREEN}[+]{RESET} Indexed {stats.runs_indexed} new run(s): "
+        f"{stats.events} events, {stats.processes} process rows "
+        f"{DIM}({stats.runs_skipped} already indexed; {db_path}){RESET}"
+    )
+    for problem in stats.problems:
+        print(f"    {YELLOW}[*]{RESET} skipped {problem}")
+
+
+def index_main(argv: List[str]) -> int:
+    """`soclog index`: add new collection runs to the local event index."""
+    from .index import default_index_path, update_index
+
+    parser = argparse.ArgumentParser(
+        prog="soclog index",
+        description=(
+            "Load Sysmon, Security and process artefacts of every run not yet "
+            "indexed into a local SQLite database for 'soclog query'."
+        ),
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        metavar="DIR|ZIP",
+        help="Runs or directories to index (default: --output-dir).",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path.home() / "soclog_output"),
+        help="SOClog output directory (default: ~/soclog_output).",
+    )
+    parser.add_argument(
+        "--db",
+        help="Index database (default: <output-dir>/.soclog_index.sqlite).",
+    )
+    args = parser.parse_args(argv)
+
+    db_path = args.db or default_index_path(args.output_dir)
+    stats = update_index(args.paths or [args.output_dir], db_path)
+    _print_index_stats(stats, db_path)
+    return 0
+
+
+_RELATIVE_TIME = re.compile(r"^(\d+)([mhdw])$")
+_UNIT_SECONDS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def _parse_when(value: str) -> int:
+    """argparse type: '7d', '12h', '30m', '2w' ago, or an ISO time (UTC)."""
+    match = _RELATIVE_TIME.match(value.strip())
+    if match:
+        seconds = int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+        return int((time.time() - seconds) * 1000)
+    ms = parse_iso_time(value)
+    if ms is None:
+        raise argparse.ArgumentTypeError(
+            f"expected e.g. 7d, 12h or 2025-11-18T15:00:00, got {value!r}"
+        )
+    return ms
+
+
+def _first_line(text: Optional[str], width: int = 80) -> str:
+    line = (text or "").strip().splitlines()[0] if (text or "").strip() else ""
+    return line if len(line) <= width else line[: width - 3] + "..."
+
+
+def query_main(argv: List[str]) -> int:
+    """`soclog query`: search the local event index."""
+    from .index import EventIndex, default_index_path, update_index
+
+    parser = argparse.ArgumentParser(
+        prog="soclog query",
+        description=(
+            "Search events (or process snapshots) in the local index built by "
+            "'soclog index' / --index. Filters are combined with AND."
+        ),
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path.home() / "soclog_output"),
+        help="SOClog output directory (default: ~/soclog_output).",
+    )
+    parser.add_argument(
+        "--db",
+        help="Index database (default: <output-dir>/.soclog_index.sqlite).",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Index new runs under --output-dir before querying.",
+    )
+    parser.add_argument("--host", action="append", default=[], help="Host name (repeatable).")
+    parser.add_argument(
+        "--event-id", type=int, action="append", default=[], help="Event ID (repeatable)."
+    )
+    parser.add_argument(
+        "--channel", action="append", choices=("sysmon", "security"), default=[]
+    )
+    parser.add_argument(
+        "--since", type=_parse_when, help="Events at or after: 7d, 12h, or ISO time (UTC)."
+    )
+    parser.add_argument("--until", type=_parse_when, help="Events before: same formats.")
+    parser.add_argument("--ip", help="Source IP address.")
+    parser.add_argument("--user", help="Account name (case-insensitive).")
+    parser.add_argument("--image", help="Substring of the process image path.")
+    parser.add_argument("--text", help="Substring of the message or event data.")
+    parser.add_argument(
+        "--count",
+        nargs="?",
+        const="total",
+        choices=("total", "host", "event_id", "ip", "user", "channel", "image"),
+        help="Only count matches, optionally per host/event_id/ip/user/channel/image.",
+    )
+    parser.add_argument(
+        "--processes",
+        action="store_true",
+        help="Search process snapshots instead (--host, --name, --sha256, --path).",
+    )
+    parser.add_argument("--name", help="Process name (with --processes).")
+    parser.add_argument("--sha256", help="Executable SHA-256 (with --processes).")
+    parser.add_argument("--path", help="Substring of the executable path (with --processes).")
+    parser.add_argument(
+        "--limit", type=int, default=100, help="Maximum rows (default: 100, 0 = all)."
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print one JSON object per line."
+    )
+    args = parser.parse_args(argv)
+
+    db_path = args.db or default_index_path(args.output_dir)
+    if args.update:
+        _print_index_stats(update_index([args.output_dir], db_path), db_path)
+    elif not Path(db_path).expanduser().is_file():
+        print(f"{RED}[!]{RESET} No index at {db_path}. Run 'soclog index' first.")
+        return 1
+
+    started = time.monotonic()
+    with EventIndex(db_path) as index:
+        if args.processes:
+            rows = [dict(r) for r in index.query_processes(
+                hosts=args.host, name=args.name, sha256=args.sha256,
+                path=args.path, limit=args.limit,
+            )]
+            columns = ("host", "collected_at", "pid", "name", "user", "path", "sha256")
+        else:
+            filters = dict(
+                hosts=args.host, event_ids=args.event_id, channels=args.channel,
+                since=args.since, until=args.until, ip=args.ip, user=args.user,
+                image=args.image, text=args.text,
+            )
+            if args.count:
+                group_by = None if args.count == "total" else args.count
+                counts = index.count_events(group_by=group_by, **filters)
+                for key, n in counts:
+                    if args.json:
+                        print(json.dumps({args.count: key, "count": n} if group_by else {"count": n}))
+                    else:
+                        print(f"{n:>10}  {key if group_by else 'events'}")
+                return 0
+            rows = []
+            for r in index.query_events(limit=args.limit, **filters):
+                row = dict(r)
+                row["time"] = format_time(row.pop("ts"))
+                if row["data"] is not None:
+                    row["data"] = json.loads(row["data"])
+                rows.append(row)
+            columns = ("time", "host", "channel", "event_id", "ip", "user", "message")
+
+    elapsed = (time.monotonic() - started) * 1000
+    if args.json:
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+        return 0
+
+    print(f"{BOLD}" + "  ".join(c.upper() for c in columns) + f"{RESET}")
+    for row in rows:
+        cells = [
+            _first_line(str(row[c]) if row.get(c) is not None else "", 60)
+            for c in columns
+        ]
+        print("  ".join(cells))
+    print(f"{DIM}{len(rows)} row(s) in {elapsed:.0f} ms{RESET}")
+    return 0
+
+
+def report_main(argv: List[str]) -> int:
+    """`soclog report`: merge the node summaries of a sharded collection."""
+    from .report import build_report, find_summaries
+
+    parser = argparse.ArgumentParser(
+        prog="soclog report",
+        description=(
+            "Merge the soclog_summary_*.json files written by collector nodes "
+            "(--shard) into one report, and check that every shard reported and "
+            "every host was collected exactly once."
+        ),
+    )
+    parser.add_argument("paths", nargs="+", metavar="FILE|DIR")
+    parser.add_argument(
+        "--config",
+        help="Inventory YAML; hosts in it that no node collected are reported.",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args(argv)
+
+    inventory = None
+    if args.config:
+        try:
+            inventory = [
+                str(cfg.name) for cfg in load_hosts_from_yaml(args.config, cache_dir=default_cache_dir())
+            ]
+        except ValueError as exc:
+            raise SystemExit(f"{RED}Error in {args.config}: {exc}{RESET}")
+
+    summaries = find_summaries(args.paths)
+    if not summaries:
+        print(f"{YELLOW}[!]{RESET} No node summaries found.")
+        return 1
+    report = build_report(summaries, inventory)
+
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2))
+        return 0 if report.ok else 1
+
+    for node in sorted(report.nodes, key=lambda n: n["shard"]):
+        print(
+            f"{CYAN}[*]{RESET} Shard {node['shard']} on {BOLD}{node['node']}{RESET}: "
+            f"{node['hosts']} host(s), finished {node['finished_utc']}"
+        )
+    colours = {"ok": GREEN, "partial": YELLOW, "failed": RED, "skipped": DIM}
+    name_w = max([len("HOST")] + [len(h["name"]) for h in report.hosts])
+    print(f"\n  {'HOST'.ljust(name_w)}  {'SHARD':6}  {'STATUS':8}  {'EVENTS':>8}  {'TIME':>8}  DETAILS")
+    for h in report.hosts:
+        details = h.get("zip_path") or ""
+        if h.get("errors"):
+            details = f"{details}  ({h['errors'][0]})" if details else h["errors"][0]
+        print(
+            f"  {h['name'].ljust(name_w)}  {h['shard']:6}  "
+            f"{colours.get(h['status'], '')}{h['status']:8}{RESET}  "
+            f"{h.get('events', ''):>8}  {h.get('elapsed_s', 0):>7.1f}s  {details}"
+        )
+    totals = ", ".join(f"{k}: {v}" for k, v in sorted(report.status_counts.items()))
+    print(f"  {DIM}{len(report.hosts)} host(s) from {len(report.nodes)} node(s) - {totals}{RESET}")
+
+    for error in report.errors:
+        print(f"{RED}[!]{RESET} {error}")
+    if len(report.shard_counts) > 1:
+        print(
+            f"{RED}[!]{RESET} Nodes disagree on the number of shards: "
+            f"{', '.join(map(str, report.shard_counts))}."
+        )
+    if report.missing_shards:
+        print(f"{RED}[!]{RESET} No summary for shard(s): {', '.join(map(str, report.missing_shards))}.")
+    if report.duplicate_hosts:
+        print(f"{YELLOW}[!]{RESET} Collected by more than one node: {', '.join(report.duplicate_hosts)}.")
+    if report.uncovered_hosts:
+        print(f"{RED}[!]{RESET} Not collected by any node: {', '.join(report.uncovered_hosts)}.")
+    return 0 if report.ok else 1
+
+
+def _print_detect_results(results) -> int:
+    """Print one line per collection (and its alerts per rule); return the alert count."""
+    total = 0
+    for r in results:
+        total += len(r.alerts)
+        colour = RED if r.alerts else GREEN
+        where = f" {DIM}-> {r.alerts_path}{RESET}" if r.alerts_path and r.alerts else ""
+        print(
+            f"{colour}[{'!' if r.alerts else '+'}]{RESET} {BOLD}{r.host or r.path}{RESET}: "
+            f"{len(r.alerts)} alert(s) in {r.events} events{where}"
+        )
+        for rule, count in sorted(r.counts_by_rule().items(), key=lambda kv: -kv[1]):
+            print(f"    {YELLOW}-{RESET} {rule}: {count}")
+        for problem in r.problems:
+            print(f"    {RED}-{RESET} {problem}")
+    return total
+
+
+def detect_main(argv: List[str]) -> int:
+    """`soclog detect`: run detection rules over collected events."""
+    from .detect import LEVELS, RuleError, iter_alerts, scan_collections
+
+    parser = argparse.ArgumentParser(
+        prog="soclog detect",
+        description=(
+            "Run Sigma-style YAML rules over the Sysmon and Security events of "
+            "collected runs (directories or ZIPs) and write the alerts of each run "
+            "to alerts.ndjson."
+        ),
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        metavar="DIR|ZIP",
+        help="Runs or directories to scan (default: --output-dir).",
+    )
+    parser.add_argument(
+        "--rules",
+        action="append",
+        required=True,
+        metavar="FILE|DIR",
+        help="Rule file or directory of *.yml rules (repeatable).",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path.home() / "soclog_output"),
+        help="SOClog output directory (default: ~/soclog_output).",
+    )
+    parser.add_argument(
+        "--min-level",
+        choices=LEVELS,
+        default="informational",
+        help="Ignore rules below this level.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="N",
+        help="Worker processes (default: CPU count).",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help="Also write every alert of this scan to FILE (NDJSON).",
+    )
+    parser.add_argument(
+        "--no-write",
+        action="store_true",
+        help="Do not write alerts.ndjson next to the scanned runs.",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the alerts as NDJSON instead of a summary."
+    )
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    try:
+        results = scan_collections(
+            args.paths or [args.output_dir],
+            args.rules,
+            min_level=args.min_level,
+            workers=args.workers,
+            write=not args.no_write,
+        )
+    except RuleError as exc:
+        raise SystemExit(f"{RED}Error: {exc}{RESET}")
+    if not results:
+        print(f"{YELLOW}[!]{RESET} No collections found.")
+        return 1
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for alert in iter_alerts(results):
+                f.write(json.dumps(alert, default=str) + "\n")
+    if args.json:
+        for alert in iter_alerts(results):
+            print(json.dumps(alert, default=str))
+        return 0
+
+    total = _print_detect_results(results)
+    events = sum(r.events for r in results)
+    elapsed = time.monotonic() - started
+    print(
+        f"{BOLD}{total} alert(s) in {len(results)} collection(s){RESET} "
+        f"{DIM}({events} events in {elapsed:.1f}s){RESET}"
+    )
+    return 0
+
+
+def _load_ioc_feeds(paths: List[str], quiet: bool = False):
+    """Load IOC feeds once, exiting with a message on unreadable files."""
+    from .ioc import load_indicators
+
+    started = time.monotonic()
+    try:
+        indicators = load_indicators(paths)
+    except OSError as exc:
+        raise SystemExit(f"{RED}Error: cannot read IOC feed: {exc}{RESET}")
+    if quiet:
+        return indicators
+    feeds = ", ".join(
+        f"{Path(f.path).name} ({f.total}{f', {f.skipped} skipped' if f.skipped else ''})"
+        for f in indicators.feeds
+    )
+    print(
+        f"{CYAN}[*]{RESET} Loaded {len(indicators)} indicator(s) from {feeds} "
+        f"{DIM}in {time.monotonic() - started:.1f}s{RESET}"
+    )
+    return indicators
+
+
+def _print_ioc_results(results) -> int:
+    """Print one line per collection (and its hits); return the hit count."""
+    total = 0
+    for r in results:
+        total += len(r.hits)
+        colour = RED if r.hits else GREEN
+        where = f" {DIM}-> {r.hits_path}{RESET}" if r.hits_path and r.hits else ""
+        print(
+            f"{colour}[{'!' if r.hits else '+'}]{RESET} {BOLD}{r.host or r.path}{RESET}: "
+            f"{len(r.hits)} IOC hit(s) in {r.processes} processes, {r.events} events{where}"
+        )
+        counts = sorted(r.counts_by_indicator().items(), key=lambda kv: -kv[1])
+        for (kind, indicator), count in counts:
+            print(f"    {YELLOW}-{RESET} {kind} {indicator}: {count}")
+        for problem in r.problems:
+            print(f"    {RED}-{RESET} {problem}")
+    return total
+
+
+def ioc_main(argv: List[str]) -> int:
+    """`soclog ioc`: match IOC feeds against collected runs."""
+    from .ioc import match_collections
+
+    parser = argparse.ArgumentParser(
+        prog="soclog ioc",
+        description=(
+            "Check the process hashes and the IP, domain and hash fields of the "
+            "Sysmon and Security events of collected runs (directories or ZIPs) "
+            "against IOC feeds, and write the hits of each run to ioc_hits.json."
+        ),
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        metavar="DIR|ZIP",
+        help="Runs or directories to check (default: --output-dir).",
+    )
+    parser.add_argument(
+        "--feed",
+        action="append",
+        required=True,
+        metavar="FILE",
+        help=(
+            "IOC feed: one hash, IP, CIDR or domain per line, or a Markdown/CSV "
+            "table of them (repeatable)."
+        ),
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path.home() / "soclog_output"),
+        help="SOClog output directory (default: ~/soclog_output).",
+    )
+    parser.add_argument(
+        "--no-write",
+        action="store_true",
+        help="Do not write ioc_hits.json next to the checked runs.",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the hits as NDJSON instead of a summary."
+    )
+    args = parser.parse_args(argv)
+
+    indicators = _load_ioc_feeds(args.feed, quiet=args.json)
+    started = time.monotonic()
+    results = match_collections(args.paths or [args.output_dir], indicators, write=not args.no_write)
+    if not results:
+        print(f"{YELLOW}[!]{RESET} No collections found.")
+        return 1
+    if args.json:
+        for r in results:
+            for hit in r.hits:
+                print(json.dumps({"host": r.host, **hit}, default=str))
+        return 0
+
+    total = _print_ioc_results(results)
+    elapsed = time.monotonic() - started
+    print(
+        f"{BOLD}{total} IOC hit(s) in {len(results)} collection(s){RESET} "
+        f"{DIM}({sum(r.processes for r in results)} processes, "
+        f"{sum(r.events for r in results)} events in {elapsed:.1f}s){RESET}"
+    )
+    return 0
+
+
+def _size_arg(value: str) -> int:
+    from .preflight import parse_size
+
+    try:
+        return parse_size(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def _interval_arg(value: str) -> float:
+    try:
+        return parse_interval(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def daemon_main(argv: List[str]) -> int:
+    """`soclog daemon`: collect every host periodically until stopped."""
+    from .daemon import DEFAULT_INTERVAL, DEFAULT_JITTER, FleetScheduler
+    from .index import default_index_path, update_index
+    from .detect import scan_collections
+    from .ioc import match_collections
+    from .metrics import write_prometheus_textfile
+    from .pipeline import HostResult
+
+    parser = build_parser(
+        prog="soclog daemon",
+        description=(
+            "Keep running and collect every host periodically, at the interval "
+            "set for its group or host in the YAML (or --interval). Takes the "
+            "same options as a collection run; --parallel is the limit on hosts "
+            "collected at the same time, and bookmarks (--since-last) are "
+            "always used."
+        ),
+    )
+    daemon = parser.add_argument_group("schedule")
+    daemon.add_argument(
+        "--interval",
+        type=_interval_arg,
+        default=DEFAULT_INTERVAL,
+        metavar="DURATION",
+        help="Interval for hosts without one in the YAML, e.g. 900, 15m, 1h (default: 1h).",
+    )
+    daemon.add_argument(
+        "--jitter",
+        type=float,
+        default=DEFAULT_JITTER,
+        metavar="FRACTION",
+        help=(
+            "Random delay added to each run, up to this fraction of the host's "
+            f"interval (default: {DEFAULT_JITTER})."
+        ),
+    )
     print_banner()
-    args = parse_args()
+    args = parser.parse_args(argv)
+    if not 0 <= args.jitter <= 1:
+        raise SystemExit(f"{RED}Error: --jitter must be between 0 and 1.{RESET}")
+    # Each run picks up where the previous one stopped.
+    args.since_last = True
+    host_configs, options = collection_setup(args)
+    # Load once, before connecting: a bad feed should fail now, not after the sweep.
+    indicators = _load_ioc_feeds(args.ioc_feed) if args.ioc_feed else None
+    host_configs = apply_shard(args, host_configs)
+
+    # Asked once, here; the daemon never prompts again.
+    jobs, skipped = resolve_passwords(host_configs, args.ask_pass)
+    if not jobs:
+        raise SystemExit(f"{RED}Error: no host has a password; nothing to schedule.{RESET}")
+    if args.preflight or args.transfer_budget:
+        # Sizes the first round; later rounds only read new records.
+        run_preflight(args, jobs, options, args.parallel)
+
+    latest: Dict[str, HostResult] = {
+        cfg.name: HostResult(
+            name=cfg.name, host=cfg.host, status="skipped", errors=["no password available"]
+        )
+        for cfg in skipped
+    }
+    results_lock = threading.Lock()
+
+    def on_result(result: HostResult) -> None:
+        # Runs finish on worker threads; one index/textfile writer at a time.
+        with results_lock:
+            latest[result.name] = result
+            if args.prometheus_textfile:
+                write_prometheus_textfile(list(latest.values()), args.prometheus_textfile)
+            if args.index and result.out_dir is not None:
+                update_index([str(result.out_dir)], default_index_path(args.output_dir))
+            if args.detect and result.out_dir is not None:
+                _print_detect_results(scan_collections([str(result.out_dir)], args.detect, workers=1))
+            if indicators is not None and result.out_dir is not None:
+                _print_ioc_results(match_collections([str(result.out_dir)], indicators))
+
+    reporter = ProgressReporter(prefix_host=True)
+    scheduler = FleetScheduler(
+        jobs,
+        options,
+        reporter,
+        default_interval=args.interval,
+        max_concurrent=args.parallel,
+        jitter=args.jitter,
+        on_result=on_result,
+    )
+
+    def request_stop(signum, frame) -> None:
+        print(f"{YELLOW}[!]{RESET} Stopping after the running collections finish...")
+        scheduler.stop()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    print(
+        f"{BOLD}{CYAN}[*]{RESET} Scheduling {len(jobs)} host(s), "
+        f"at most {args.parallel} at a time:"
+    )
+    for line in scheduler.describe():
+        print(line)
+    scheduler.run()
+
+    for name, counts in scheduler.stats.items():
+        print(f"  {name}: {counts['runs']} run(s), {counts['missed']} missed interval(s)")
+    return 0
+
+
+def collection_setup(args: argparse.Namespace) -> Tuple[List[HostConfig], "CollectOptions"]:
+    """Validate collection arguments; return the host configs and run options."""
+    from .pipeline import CollectOptions
 
     if args.host and not args.user:
         raise SystemExit(f"{RED}Error: --host requires --user.{RESET}")
@@ -214,165 +1234,289 @@ def main() -> None:
     if args.config and args.user:
         raise SystemExit(f"{RED}Error: --config mode does not use --user.{RESET}")
 
-    # Determine hours/days
-    hours = args.hours
-    days = args.days
+    if args.parallel < 1:
+        raise SystemExit(f"{RED}Error: --parallel must be at least 1.{RESET}")
+
+    if args.gzip and args.output_format == "columnar":
+        raise SystemExit(
+            f"{RED}Error: --gzip does not apply to --format columnar "
+            f"(columns are compressed already).{RESET}"
+        )
+
+    if args.page_size is not None and args.page_size < 1:
+        raise SystemExit(f"{RED}Error: --page-size must be at least 1.{RESET}")
+
+    if args.slice_hours < 0 or 0 < args.slice_hours * 3600 < 1:
+        raise SystemExit(f"{RED}Error: --slice-hours must be 0 or at least one second.{RESET}")
+
+    if args.slice_shells is not None and args.slice_shells < 1:
+        raise SystemExit(f"{RED}Error: --slice-shells must be at least 1.{RESET}")
+
+    if args.zip_level is not None:
+        low = 1 if args.zip_compression == "bzip2" else 0
+        if args.zip_compression in ("stored", "lzma") or not low <= args.zip_level <= 9:
+            raise SystemExit(
+                f"{RED}Error: --zip-level must be {low}-9 and needs "
+                f"--zip-compression deflated or bzip2.{RESET}"
+            )
+
+    if args.max_shells < 1:
+        raise SystemExit(f"{RED}Error: --max-shells must be at least 1.{RESET}")
+
+    if args.host_budget is not None and args.host_budget <= 0:
+        raise SystemExit(f"{RED}Error: --host-budget must be positive.{RESET}")
+
+    if args.retries < 0:
+        raise SystemExit(f"{RED}Error: --retries cannot be negative.{RESET}")
+
+    if args.profile and not args.config:
+        raise SystemExit(f"{RED}Error: --profile needs --config (profiles live in the YAML).{RESET}")
+    try:
+        cli_filters = filters_from_args(args)
+    except ValueError as exc:
+        raise SystemExit(f"{RED}Error: {exc}{RESET}")
+
+    if args.detect:
+        from .detect import RuleError, load_rules
+
+        try:
+            load_rules(args.detect)  # fail before connecting, not after
+        except RuleError as exc:
+            raise SystemExit(f"{RED}Error: {exc}{RESET}")
 
     # Build host configs
     if args.config:
-        host_configs = load_hosts_from_yaml(args.config)
+        try:
+            host_configs = load_hosts_from_yaml(
+                args.config,
+                profile=args.profile,
+                cache_dir=None if args.no_inventory_cache else default_cache_dir(),
+            )
+        except ValueError as exc:
+            raise SystemExit(f"{RED}Error in {args.config}: {exc}{RESET}")
     else:
         host_configs = make_host_configs_from_single(
             args.host, args.user, args.password_env, args.ask_pass
         )
 
-    base_output = args.output_dir
+    names = [cfg.name for cfg in host_configs]
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise SystemExit(
+            f"{RED}Error: duplicate host names in config: {', '.join(duplicates)}.{RESET}"
+        )
 
-    for cfg in host_configs:
-        print(
-            f"{BOLD}{CYAN}[*]{RESET} {BOLD}Collecting from host:{RESET} "
-            f"{YELLOW}{cfg.name}{RESET} {DIM}({cfg.host}){RESET}"
+    bookmarks = None
+    if args.since_last:
+        bookmarks_path = args.bookmarks or str(
+            Path(args.output_dir).expanduser() / BOOKMARK_FILE_NAME
         )
+        bookmarks = BookmarkStore(bookmarks_path)
+    elif args.bookmarks:
+        raise SystemExit(f"{RED}Error: --bookmarks requires --since-last.{RESET}")
 
-        password = resolve_password_for_host(cfg)
+    options = CollectOptions(
+        output_dir=args.output_dir,
+        hours=args.hours,
+        days=args.days,
+        sign_manifest=args.sign_manifest,
+        gpg_key=args.gpg_key,
+        max_shells=args.max_shells,
+        bookmarks=bookmarks,
+        page_size=args.page_size or DEFAULT_PAGE_SIZE,
+        slice_hours=args.slice_hours or None,
+        slice_shells=args.slice_shells,
+        output_format=args.output_format,
+        compress=args.gzip,
+        columnar_copy=args.columnar,
+        gzip_wire=args.wire == "gzip",
+        event_data=args.event_data,
+        hash_cache=(
+            HashCacheStore(Path(args.output_dir).expanduser() / HASH_CACHE_FILE_NAME)
+            if args.hash_cache else None
+        ),
+        zip_compression=args.zip_compression,
+        zip_level=args.zip_level,
+        keep_loose=not args.no_loose,
+        host_budget=args.host_budget,
+        retries=args.retries,
+        filters=cli_filters,
+    )
 
-        ask_pass = cfg.ask_password or args.ask_pass
-        if password is None and ask_pass:
-            password = getpass.getpass(
-                prompt=f"Password for {cfg.username}@{cfg.host}: "
-            )
+    return host_configs, options
 
-        if password is None:
-            print(
-                f"{RED}[!]{RESET} No password available for host {cfg.name}. "
-                "Use an env var (password_env) or --ask-pass."
-            )
-            continue
 
-        total_steps = 6
+def run_preflight(
+    args: argparse.Namespace, jobs: List[Tuple[HostConfig, str]], options, parallel: int
+) -> None:
+    """Size the sweep, apply the chosen settings to options, or exit if it does not fit."""
+    from .preflight import format_size, plan_collection, probe_hosts
 
-        # ========== CONNECT ==========
-        print_progress("Connecting via WinRM (NTLM)...", 1, total_steps)
-        try:
-            client = WindowsRemote(
-                host=cfg.host,
-                username=cfg.username,
-                password=password,
-                use_https=False,  # HTTP for lab; switch later for HTTPS if desired
-                ask_password_if_missing=False,
-            )
-        except WindowsRemoteError as exc:
-            print(f"{RED}[!]{RESET} Failed to connect to {cfg.name}: {exc}")
-            continue
+    print(f"{BOLD}{CYAN}[*]{RESET} Pre-flight: sizing the logs of {len(jobs)} host(s)...")
+    estimates = probe_hosts(jobs, options, parallel=parallel)
+    plan = plan_collection(
+        estimates,
+        options,
+        transfer_budget=args.transfer_budget,
+        page_size=args.page_size,
+        wire=args.wire,
+    )
 
-        out_dir = prepare_output_dir(base_output, cfg.name)
+    print(f"\n  {'HOST':<20}  {'EVENTS':>10}  {'ON DISK':>10}  {'TRANSFER':>10}")
+    suffix = "_gz" if plan.compress else ""
+    wire = "wire_gz" if plan.gzip_wire else "wire"
+    for h in estimates:
+        if h.error:
+            print(f"  {h.name:<20}  {RED}probe failed: {h.error}{RESET}")
+            continue
+        disk = h.bytes("zip" + suffix) + (h.bytes("loose" + suffix) if options.keep_loose else 0)
         print(
-            f"    {BOLD}Output directory:{RESET} "
-            f"{MAGENTA}{out_dir}{RESET}"
+            f"  {h.name:<20}  {h.events:>10}  {format_size(disk):>10}  "
+            f"{format_size(h.bytes(wire)):>10}"
         )
+    budget = f" of {format_size(plan.transfer_budget)}" if plan.transfer_budget else ""
+    print(
+        f"  {DIM}{plan.events} events; needs {format_size(plan.disk_needed)} of "
+        f"{format_size(plan.disk_free)} free (incl. reserve), transfers "
+        f"{format_size(plan.transfer)}{budget}{RESET}"
+    )
+    if options.filters or any(cfg.filters for cfg, _ in jobs):
+        print(f"  {DIM}Server-side filters are not estimated: these are upper bounds.{RESET}")
+    failed = [h.name for h in estimates if h.error]
+    if failed:
+        print(f"{YELLOW}[!]{RESET} Not sized (left out of the estimate): {', '.join(failed)}.")
+    for change in plan.changes:
+        print(f"{CYAN}[*]{RESET} Using {change}.")
+    if not plan.ok:
+        for problem in plan.problems:
+            print(f"{RED}[!]{RESET} The sweep {problem}.")
+        raise SystemExit(f"{RED}Error: pre-flight check failed; nothing was collected.{RESET}")
+    plan.apply(options)
+    print(f"{GREEN}[+]{RESET} Pre-flight check passed.\n")
+
+
+def sign_sweep_results(results: List, args: argparse.Namespace) -> None:
+    """Sign the sweep's Merkle root once and write the per-host proofs."""
+    from .merkle import sign_sweep
+
+    try:
+        sweep = sign_sweep(results, args.output_dir, gpg_key=args.gpg_key)
+    except Exception as exc:
+        print(f"{RED}[!]{RESET} Failed to sign the sweep with GPG: {exc}")
+        return
+    if sweep is None:
+        print(f"{YELLOW}[!]{RESET} No manifests to sign.")
+        return
+    print(
+        f"{GREEN}[+]{RESET} Signed Merkle root of {sweep.leaves} manifest(s): "
+        f"{sweep.signature_path} {DIM}(root {sweep.root[:16]}...){RESET}"
+    )
+
+
+def apply_shard(args: argparse.Namespace, host_configs: List[HostConfig]) -> List[HostConfig]:
+    """Keep only the hosts of --shard, if given."""
+    if not args.shard:
+        return host_configs
+    index, count = args.shard
+    selected = select_shard(host_configs, index, count)
+    print(
+        f"{BOLD}{CYAN}[*]{RESET} Shard {index}/{count}: "
+        f"{len(selected)} of {len(host_configs)} host(s)."
+    )
+    return selected
+
+
+# `soclog <subcommand> ...`; anything else is a collection run.
+SUBCOMMANDS = {
+    "verify": verify_main,
+    "index": index_main,
+    "query": query_main,
+    "daemon": daemon_main,
+    "report": report_main,
+    "detect": detect_main,
+    "ioc": ioc_main,
+}
+
 
-        collected_files: List[str] = []
+def main() -> None:
+    argv = sys.argv[1:]
+    if argv and argv[0] in SUBCOMMANDS:
+        raise SystemExit(SUBCOMMANDS[argv[0]](argv[1:]))
+
+    print_banner()
+    args = parse_args(argv)
+
+    # Past --help/--version: now load the collection machinery.
+    from .index import default_index_path, update_index
+    from .detect import scan_collections
+    from .ioc import match_collections
+    from .metrics import write_prometheus_textfile
+    from .pipeline import HostResult, run_collection
+    from .report import write_node_summary
 
-        # ========== SYSMON ==========
-        print_progress(
-            "Starting Sysmon collection (this may take a bit)...",
-            2,
-            total_steps,
+    host_configs, options = collection_setup(args)
+    # Load once, before connecting: a bad feed should fail now, not after the sweep.
+    indicators = _load_ioc_feeds(args.ioc_feed) if args.ioc_feed else None
+    options.sweep_signing = args.sign_manifest and not args.sign_each_host
+    inventory_hosts = len(host_configs)
+    host_configs = apply_shard(args, host_configs)
+    started_utc = datetime.now(timezone.utc).isoformat()
+
+    # Prompt for every password up front; workers must not touch the tty.
+    jobs, skipped = resolve_passwords(host_configs, args.ask_pass)
+
+    parallel = min(args.parallel, max(len(jobs), 1))
+    if (args.preflight or args.transfer_budget) and jobs:
+        run_preflight(args, jobs, options, parallel)
+    if parallel > 1:
+        print(
+            f"{BOLD}{CYAN}[*]{RESET} Collecting {len(jobs)} host(s) "
+            f"with {parallel} parallel workers."
         )
-        try:
-            status, sysmon_data = collect_sysmon_logs(client, hours=hours, days=days)
-            sysmon_path = out_dir / "sysmon_events.json"
-            with open(sysmon_path, "w", encoding="utf-8") as f:
-                json.dump(sysmon_data, f, indent=2)
-            collected_files.append(str(sysmon_path))
-
-            if status == "missing":
-                print(f"    {YELLOW}[!]{RESET} Sysmon not installed on this host.")
-            elif status == "empty":
-                print(
-                    f"    {YELLOW}[*]{RESET} No Sysmon events for requested time range."
-                )
-            else:
-                print(f"    {GREEN}[+]{RESET} Sysmon events collected.")
-        except WindowsRemoteError as exc:
-            print(f"    {RED}[!]{RESET} Failed to collect Sysmon logs: {exc}")
+    reporter = ProgressReporter(prefix_host=parallel > 1)
+    results = run_collection(jobs, options, reporter, parallel=parallel)
 
-        # ========== SECURITY LOG ==========
-        print_progress(
-            "Starting Security log collection...", 3, total_steps
+    results.extend(
+        HostResult(
+            name=cfg.name,
+            host=cfg.host,
+            status="skipped",
+            errors=["no password available"],
         )
+        for cfg in skipped
+    )
+    if len(results) > 1 or parallel > 1:
+        print_summary(results)
+
+    if options.sweep_signing:
+        sign_sweep_results(results, args)
+
+    if args.prometheus_textfile:
         try:
-            status, sec_data = collect_security_logs(client, hours=hours, days=days)
-            sec_path = out_dir / "security_events.json"
-            with open(sec_path, "w", encoding="utf-8") as f:
-                json.dump(sec_data, f, indent=2)
-            collected_files.append(str(sec_path))
-
-            if status == "empty":
-                print(
-                    f"    {YELLOW}[*]{RESET} No Security log events for requested time range."
-                )
-            else:
-                print(f"    {GREEN}[+]{RESET} Security log events collected.")
-        except WindowsRemoteError as exc:
-            print(f"    {RED}[!]{RESET} Failed to collect Security logs: {exc}")
+            write_prometheus_textfile(results, args.prometheus_textfile)
+        except OSError as exc:
+            print(f"{RED}[!]{RESET} Failed to write {args.prometheus_textfile}: {exc}")
 
-        # ========== PROCESSES ==========
-        print_progress(
-            "Collecting running processes and hashes...", 4, total_steps
-        )
+    if args.shard:
+        index, count = args.shard
         try:
-            proc_data = collect_processes(client)
-            proc_path = out_dir / "processes.json"
-            with open(proc_path, "w", encoding="utf-8") as f:
-                json.dump(proc_data, f, indent=2)
-            collected_files.append(str(proc_path))
-            print(f"    {GREEN}[+]{RESET} Process list collected.")
-        except WindowsRemoteError as exc:
-            print(f"    {RED}[!]{RESET} Failed to collect process list: {exc}")
-
-        # ========== MANIFEST & INTEGRITY ==========
-        if collected_files:
-            print_progress("Building integrity manifest...", 5, total_steps)
-            manifest = build_manifest(collected_files, host=cfg.name)
-            manifest_path = out_dir / "manifest.json"
-            write_manifest(manifest, str(manifest_path))
-            collected_files.append(str(manifest_path))
-            print(f"    {GREEN}[+]{RESET} manifest.json generated.")
-
-            if args.sign_manifest:
-                sig_path = out_dir / "manifest.sig"
-                try:
-                    sign_manifest_with_gpg(
-                        str(manifest_path),
-                        str(sig_path),
-                        gpg_key=args.gpg_key,
-                    )
-                    collected_files.append(str(sig_path))
-                    print(f"    {GREEN}[+]{RESET} manifest.sig created (GPG signature).")
-                except Exception as exc:
-                    print(
-                        f"    {YELLOW}[!]{RESET} Failed to sign manifest with GPG: {exc}"
-                    )
-
-            # ========== ZIP ==========
-            print_progress("Packaging artefacts into ZIP...", 6, total_steps)
-            zip_path = out_dir / f"soclog_{cfg.name}_{out_dir.name}.zip"
-            try:
-                create_zip_from_dir(out_dir, zip_path)
-                print(f"    {GREEN}[+]{RESET} ZIP created: {BOLD}{zip_path}{RESET}")
-            except OSError as exc:
-                if exc.errno == 28:
-                    print(
-                        f"    {YELLOW}[!]{RESET} Failed to create ZIP: no space left on device. "
-                        f"Collected files and manifest are still available in {out_dir}."
-                    )
-                else:
-                    print(f"    {RED}[!]{RESET} Failed to create ZIP: {exc}")
-        else:
-            print(
-                f"    {YELLOW}[!]{RESET} No artefacts collected; skipping manifest and ZIP."
+            path = write_node_summary(
+                results, args.output_dir, index, count, inventory_hosts, started_utc
             )
+            print(f"{GREEN}[+]{RESET} Node summary: {path}")
+        except OSError as exc:
+            print(f"{RED}[!]{RESET} Failed to write the node summary: {exc}")
+
+    collected = [str(r.out_dir) for r in results if r.out_dir is not None]
+    if args.index and collected:
+        db_path = default_index_path(args.output_dir)
+        _print_index_stats(update_index(collected, db_path), db_path)
+
+    if args.detect and collected:
+        _print_detect_results(scan_collections(collected, args.detect))
+
+    if indicators is not None and collected:
+        _print_ioc_results(match_collections(collected, indicators))
 
 
 if __name__ == "__main__":
@@ -1,16 +1,79 @@
 import json
+import queue
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Tuple, Optional
-
+from typing import Dict, Iterator, List, Tuple, Optional
+
+from .bookmarks import Bookmark
+from .defaults import DEFAULT_PAGE_SIZE, EVENT_DATA_MODES
+from .hashcache import KEY_DIGEST_CHARS, known_digests, resolve_hashes
+from .filters import EventFilter
+from .metrics import active_stage, record, reporting_to
+from .scheduler import ShellPool
 from .windows_remote import WindowsRemote, WindowsRemoteError
 
+SYSMON_LOG = "Microsoft-Windows-Sysmon/Operational"
+SECURITY_LOG = "Security"
+
+# Fields exported for every event. TimeCreated is rendered as an ISO 8601
+# UTC round-trip string so it is identical across PowerShell versions and
+# can be compared exactly against a stored bookmark.
+EVENT_FIELDS = (
+    "@{Name='TimeCreated';Expression={$_.TimeCreated.ToUniversalTime().ToString('o')}}, "
+    "RecordId, Id, LevelDisplayName, ProviderName, MachineName, Message"
+)
+
+# Per-event projection for the structured modes. Data elements without
+# a Name attribute (classic providers) are keyed Param0, Param1, ...
+_STRUCTURED_PROJECTION = """$page | ForEach-Object {{
+    $xml = [xml]$_.ToXml()
+    $data = [ordered]@{{}}
+    if ($xml.Event.EventData) {{
+        $i = 0
+        foreach ($d in $xml.Event.EventData.ChildNodes) {{
+            $key = $d.GetAttribute("Name")
+            if (-not $key) {{ $key = if ($d.LocalName -eq "Data") {{ "Param$i" }} else {{ $d.LocalName }} }}
+            $data[$key] = $d.InnerText
+            $i++
+        }}
+    }} elseif ($xml.Event.UserData -and $xml.Event.UserData.FirstChild) {{
+        foreach ($d in $xml.Event.UserData.FirstChild.ChildNodes) {{ $data[$d.LocalName] = $d.InnerText }}
+    }}
+    $row = [ordered]@{{
+        TimeCreated = $_.TimeCreated.ToUniversalTime().ToString('o')
+        RecordId = $_.RecordId
+        Id = $_.Id
+        LevelDisplayName = $_.LevelDisplayName
+        ProviderName = $_.ProviderName
+        MachineName = $_.MachineName
+    }}
+{message_line}    $row.EventData = $data
+    ConvertTo-Json -InputObject ([PSCustomObject]$row) -Depth 5 -Compress
+}}"""
+
+_INT_VALUE = re.compile(r"-?(0|[1-9][0-9]{0,17})")
+
+# Lines the probe script prints to report how a --since-last bookmark
+# was handled.
+BOOKMARK_MARKERS = {
+    "BOOKMARK_GAP": "gap",
+    "BOOKMARK_RESET": "reset",
+}
 
-def _make_start_time(hours: Optional[int] = None, days: Optional[int] = None) -> str:
-    """
-    Compute a UTC ISO timestamp string for 'now minus X hours/days'.
 
-    Returned as e.g. '2025-11-16T12:34:56'.
-    """
+_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def _window_start(
+    hours: Optional[int] = None,
+    days: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> datetime:
+    """UTC 'now minus X hours/days', to the second."""
     if hours is None and days is None:
         hours = 24  # default: last 24 hours
 
@@ -20,162 +83,618 @@ def _make_start_time(hours: Optional[int] = None, days: Optional[int] = None) ->
     if days:
         delta += timedelta(days=days)
 
-    start_dt = datetime.now(timezone.utc) - delta
-    return start_dt.strftime("%Y-%m-%dT%H:%M:%S")
+    if now is None:
+        now = datetime.now(timezone.utc)
+    return (now - delta).replace(microsecond=0)
 
 
-def collect_sysmon_logs(
-    client: WindowsRemote, hours: Optional[int] = None, days: Optional[int] = None
-) -> Tuple[str, Dict]:
+def time_slices(
+    start: datetime, end: datetime, slice_hours: float
+) -> List[Tuple[str, Optional[str]]]:
     """
-    Collect recent Sysmon events from Windows as JSON.
+    Split [start, end) into consecutive slices of slice_hours, as
+    (start, end) timestamp strings for _fetch_page(). The last slice
+    has no end, so events written while the run goes on (up to the
+    pinned newest record) still fall into it. A window no longer than
+    slice_hours is a single slice.
+    """
+    step = timedelta(hours=slice_hours)
+    if step.total_seconds() < 1:
+        raise ValueError("slice_hours must be at least one second.")
+    bounds = [start]
+    while bounds[-1] + step < end:
+        bounds.append(bounds[-1] + step)
+    ends: List[Optional[str]] = [b.strftime(_TIME_FORMAT) for b in bounds[1:]]
+    return list(zip((b.strftime(_TIME_FORMAT) for b in bounds), ends + [None]))
 
-    Returns a tuple (status, data):
-      - status: "ok", "missing", or "empty"
-      - data: dictionary or list (parsed JSON), or {"message": "..."} if missing/empty.
+
+def _bookmark_check_script(bookmark: Optional[Bookmark]) -> str:
+    """
+    PowerShell that sets $mode ("window" or "bookmark") and $afterId.
+
+    Without a bookmark this is the plain time window. With one, only
+    records after bookmark.record_id are requested, provided the endpoint
+    still has that record with the same TimeCreated. Otherwise:
+      - if the oldest remaining record is newer than the bookmark the log
+        has wrapped: print BOOKMARK_GAP and take everything still there;
+      - else the log was cleared or replaced: print BOOKMARK_RESET and
+        fall back to the time window.
+    """
+    if bookmark is None:
+        return '$mode = "window"\n$afterId = 0'
+
+    return f"""
+$mode = "window"
+$afterId = {int(bookmark.record_id)}
+$afterTime = "{bookmark.time_created}"
+$mark = Get-WinEvent -LogName $logName -FilterXPath "*[System[EventRecordID=$afterId]]" -MaxEvents 1 -ErrorAction SilentlyContinue
+if ($mark -and $mark.TimeCreated.ToUniversalTime().ToString('o') -eq $afterTime) {{
+    $mode = "bookmark"
+}} else {{
+    $oldest = Get-WinEvent -LogName $logName -MaxEvents 1 -Oldest -ErrorAction SilentlyContinue
+    if ($oldest -and $oldest.RecordId -gt $afterId -and $afterTime -and
+        $oldest.TimeCreated.ToUniversalTime() -ge [datetime]::Parse($afterTime).ToUniversalTime()) {{
+        $mode = "bookmark"
+        Write-Output "BOOKMARK_GAP"
+    }} else {{
+        Write-Output "BOOKMARK_RESET"
+    }}
+}}
+if ($mode -eq "window") {{ $afterId = 0 }}
+"""
+
+
+def _probe_log(
+    client: WindowsRemote,
+    log_name: str,
+    bookmark: Optional[Bookmark],
+    notes: Optional[List[str]],
+) -> Tuple[str, str, int, int]:
+    """
+    Check that log_name exists and work out the record range to page over.
+
+    Returns (status, mode, after_id, newest_id); status is "ok",
+    "missing" or "empty". Pinning newest_id up front keeps paging finite
+    on a busy log: events arriving during the run are left for the next one.
     """
-    start_time = _make_start_time(hours, days)
     script = f"""
 $ErrorActionPreference = "Stop"
-$logName = "Microsoft-Windows-Sysmon/Operational"
+$logName = "{log_name}"
 $log = Get-WinEvent -ListLog $logName -ErrorAction SilentlyContinue
 if (-not $log) {{
-    Write-Output "SYSMON_NOT_INSTALLED"
-    exit 0
+    Write-Output "LOG_NOT_FOUND"
+    return
 }}
-$startTime = [datetime]"{start_time}"
-$events = Get-WinEvent -FilterHashtable @{{LogName=$logName; StartTime=$startTime}} -ErrorAction SilentlyContinue
-if (-not $events) {{
+$newest = Get-WinEvent -LogName $logName -MaxEvents 1 -ErrorAction SilentlyContinue
+if (-not $newest) {{
     Write-Output "NO_EVENTS"
-    exit 0
+    return
 }}
-$events | Select-Object TimeCreated, Id, LevelDisplayName, ProviderName, MachineName, Message |
-    ConvertTo-Json -Depth 5
+{_bookmark_check_script(bookmark)}
+Write-Output ("PAGE_BOUNDS " + $mode + " " + $afterId + " " + $newest.RecordId)
 """
-
     status_code, stdout, stderr = client.run_powershell(script)
 
-    if "SYSMON_NOT_INSTALLED" in stdout:
-        return "missing", {"message": "Sysmon is not installed on this host."}
-    if "NO_EVENTS" in stdout:
-        return "empty", {"message": "No Sysmon events found for the requested time range."}
-
-    if status_code != 0 and not stdout:
+    bounds = None
+    for line in stdout.splitlines():
+        line = line.strip()
+        if line == "LOG_NOT_FOUND":
+            return "missing", "window", 0, 0
+        if line == "NO_EVENTS":
+            return "empty", "window", 0, 0
+        if line in BOOKMARK_MARKERS and notes is not None:
+            notes.append(BOOKMARK_MARKERS[line])
+        if line.startswith("PAGE_BOUNDS "):
+            bounds = line.split()
+
+    if bounds is None or len(bounds) != 4:
         raise WindowsRemoteError(
-            f"Failed to collect Sysmon logs. Exit code {status_code}, stderr: {stderr}"
+            f"Failed to probe {log_name} log. Exit code {status_code}, stderr: {stderr}"
         )
 
-    stdout = stdout.strip()
-    if not stdout:
-        return "empty", {"message": "Sysmon output was empty."}
-
-    try:
-        data = json.loads(stdout)
-    except json.JSONDecodeError:
-        # If JSON parsing fails, keep raw text for troubleshooting.
-        data = {"raw": stdout}
-    return "ok", data
-
-
-def collect_security_logs(
-    client: WindowsRemote, hours: Optional[int] = None, days: Optional[int] = None
-) -> Tuple[str, Dict]:
+    _, mode, after_id, newest_id = bounds
+    after_id, newest_id = int(after_id), int(newest_id)
+    if newest_id <= after_id:
+        return "empty", mode, after_id, newest_id
+    return "ok", mode, after_id, newest_id
+
+
+def _fetch_page(
+    client: WindowsRemote,
+    log_name: str,
+    after_id: int,
+    newest_id: int,
+    start_time: Optional[str],
+    page_size: int,
+    event_data: str = "message",
+    event_filter: Optional[EventFilter] = None,
+    end_time: Optional[str] = None,
+) -> List[Dict]:
     """
-    Collect recent Security log events (Windows Security log) as JSON.
-
-    Same status pattern as Sysmon collector: "ok" / "empty".
+    Fetch up to page_size events with after_id < EventRecordID <= newest_id
+    (and start_time <= TimeCreated < end_time), oldest first.
     """
-    start_time = _make_start_time(hours, days)
+    time_clause = ""
+    if start_time is not None:
+        upper = f" and @SystemTime<'{end_time}.000Z'" if end_time is not None else ""
+        time_clause = f" and TimeCreated[@SystemTime>='{start_time}.000Z'{upper}]"
+    system_clause = f"EventRecordID>{after_id} and EventRecordID<={newest_id}{time_clause}"
+
+    if event_filter is None or event_filter.is_empty:
+        query = f'-LogName $logName -FilterXPath "*[System[{system_clause}]]"'
+        query_setup = ""
+    else:
+        # Filtering happens on the endpoint: a structured query with one
+        # Select per chunk of allowed IDs and Suppress for denied ones.
+        query = "-FilterXml ([xml]$query)"
+        query_setup = f"$query = @'\n{event_filter.query_xml(log_name, system_clause)}\n'@\n"
+
+    # One compact JSON object per line, so the page can be parsed (and
+    # handed on) one event at a time instead of as a single document.
     script = f"""
 $ErrorActionPreference = "Stop"
-$logName = "Security"
-$startTime = [datetime]"{start_time}"
-$events = Get-WinEvent -FilterHashtable @{{LogName=$logName; StartTime=$startTime}} -ErrorAction SilentlyContinue
-if (-not $events) {{
-    Write-Output "NO_EVENTS"
-    exit 0
-}}
-$events | Select-Object TimeCreated, Id, LevelDisplayName, ProviderName, MachineName, Message |
-    ConvertTo-Json -Depth 5
+$logName = "{log_name}"
+{query_setup}$page = @(Get-WinEvent {query} -MaxEvents {int(page_size)} -Oldest -ErrorAction SilentlyContinue)
+{_event_projection(event_data)}
 """
-
     status_code, stdout, stderr = client.run_powershell(script)
 
-    if "NO_EVENTS" in stdout:
-        return "empty", {"message": "No Security events found for the requested time range."}
-
     if status_code != 0 and not stdout:
         raise WindowsRemoteError(
-            f"Failed to collect Security logs. Exit code {status_code}, stderr: {stderr}"
+            f"Failed to read {log_name} events after record {after_id}. "
+            f"Exit code {status_code}, stderr: {stderr}"
         )
 
-    stdout = stdout.strip()
-    if not stdout:
-        return "empty", {"message": "Security log output was empty."}
+    started = time.perf_counter()
+    try:
+        events = list(iter_json_lines(stdout))
+    except json.JSONDecodeError as exc:
+        raise WindowsRemoteError(
+            f"Unreadable {log_name} page after record {after_id}: {exc}"
+        ) from exc
+    for event in events:
+        if isinstance(event.get("EventData"), dict):
+            event["EventData"] = type_event_data(event["EventData"])
+    record(parse_s=time.perf_counter() - started)
+    return events
+
+
+def _event_projection(event_data: str) -> str:
+    """PowerShell turning $page into one compact JSON line per event."""
+    if event_data not in EVENT_DATA_MODES:
+        raise ValueError(
+            f"Unknown event data mode {event_data!r}; expected one of {EVENT_DATA_MODES}."
+        )
+    if event_data == "message":
+        return (
+            f"$page | Select-Object {EVENT_FIELDS} |\n"
+            "    ForEach-Object { ConvertTo-Json -InputObject $_ -Depth 5 -Compress }"
+        )
+    message_line = "    $row.Message = $_.Message\n" if event_data == "both" else ""
+    return _STRUCTURED_PROJECTION.format(message_line=message_line)
+
+
+def type_event_data(data: Dict) -> Dict:
+    """
+    Give EventData values proper types.
+
+    Everything in the event XML is text; plain decimal numbers (no sign
+    tricks, no leading zeros) become ints so that fields like LogonType
+    or ProcessId can be compared numerically. Hex values such as
+    "0x3e7", GUIDs, SIDs and times stay strings, as do empty values
+    (which become None).
+    """
+    typed = {}
+    for key, value in data.items():
+        if value is None or value == "":
+            typed[key] = None
+        elif isinstance(value, str) and _INT_VALUE.fullmatch(value):
+            typed[key] = int(value)
+        else:
+            typed[key] = value
+    return typed
+
+
+def iter_json_lines(text: str) -> Iterator[Dict]:
+    """
+    Parse WinRM output holding one JSON document per line, lazily.
 
+    Blank lines are skipped. Raises json.JSONDecodeError on a bad line.
+    """
+    decode = json.JSONDecoder().decode
+    start = 0
+    length = len(text)
+    while start < length:
+        end = text.find("\n", start)
+        if end == -1:
+            end = length
+        line = text[start:end].strip()
+        start = end + 1
+        if line:
+            yield decode(line)
+
+
+def _iter_range_pages(
+    client: WindowsRemote,
+    log_name: str,
+    after_id: int,
+    newest_id: int,
+    start_time: Optional[str],
+    end_time: Optional[str],
+    page_size: int,
+    event_data: str,
+    event_filter: Optional[EventFilter],
+) -> Iterator[List[Dict]]:
+    """Walk forward by EventRecordID from after_id to newest_id, one page per call."""
+    after = after_id
+    while after < newest_id:
+        page = _fetch_page(
+            client,
+            log_name,
+            after,
+            newest_id,
+            start_time,
+            page_size,
+            event_data,
+            event_filter,
+            end_time,
+        )
+        if not page:
+            return
+        yield page
+        last = max(int(event.get("RecordId") or 0) for event in page)
+        if len(page) < page_size or last <= after:
+            return
+        after = last
+
+
+def _iter_sliced_pages(
+    client: WindowsRemote,
+    pool: ShellPool,
+    shells: int,
+    slices: List[Tuple[str, Optional[str]]],
+    fetch_range,
+) -> Iterator[List[Dict]]:
+    """
+    Fetch time slices concurrently and yield their pages in slice order.
+
+    client (the caller's shell) works through the slices, oldest first,
+    together with up to shells - 1 more shells borrowed from pool
+    without blocking: the caller already holds a shell, so waiting for
+    another could deadlock against a sibling collector doing the same.
+    Helpers that find the pool busy retry until the slices run out.
+
+    A slice is spooled to a temporary file as it arrives and read back
+    page by page once every earlier slice has been yielded, so memory
+    stays bounded by page_size. An error in a slice is raised when the
+    consumer reaches that slice, after the slices before it.
+    """
+    todo: "queue.Queue[int]" = queue.Queue()
+    for index in range(len(slices)):
+        todo.put(index)
+    spools: List[Optional[object]] = [None] * len(slices)
+    errors: List[Optional[BaseException]] = [None] * len(slices)
+    done = [threading.Event() for _ in slices]
+    stop = threading.Event()
+    state = active_stage()
+
+    def work(shell: WindowsRemote) -> None:
+        while not stop.is_set():
+            try:
+                index = todo.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                spool = tempfile.TemporaryFile(prefix="soclog-slice-")
+                spools[index] = spool
+                for page in fetch_range(shell, *slices[index]):
+                    spool.write(json.dumps(page).encode("utf-8") + b"\n")
+                    if stop.is_set():
+                        break
+            except Exception as exc:
+                errors[index] = exc
+            finally:
+                done[index].set()
+
+    def lead() -> None:
+        with reporting_to(state):
+            work(client)
+
+    def helper() -> None:
+        with reporting_to(state):
+            while not stop.is_set() and not todo.empty():
+                with pool.acquire(block=False) as shell:
+                    if shell is not None:
+                        work(shell)
+                        return
+                stop.wait(1.0)
+
+    executor = ThreadPoolExecutor(max_workers=shells, thread_name_prefix="soclog-slice")
     try:
-        data = json.loads(stdout)
-    except json.JSONDecodeError:
-        data = {"raw": stdout}
-    return "ok", data
+        executor.submit(lead)
+        for _ in range(shells - 1):
+            executor.submit(helper)
+        for index in range(len(slices)):
+            done[index].wait()
+            spool = spools[index]
+            try:
+                if errors[index] is not None:
+                    raise errors[index]
+                spool.seek(0)
+                for line in spool:
+                    yield json.loads(line)
+            finally:
+                if spool is not None:
+                    spool.close()
+                spools[index] = None
+    finally:
+        # Also reached when the consumer stops early: let the workers
+        # finish their current page, then drop what they spooled.
+        stop.set()
+        executor.shutdown(wait=True)
+        for spool in spools:
+            if spool is not None:
+                spool.close()
+
+
+def open_event_pages(
+    client: WindowsRemote,
+    log_name: str,
+    hours: Optional[int] = None,
+    days: Optional[int] = None,
+    bookmark: Optional[Bookmark] = None,
+    notes: Optional[List[str]] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    event_data: str = "message",
+    event_filter: Optional[EventFilter] = None,
+    pool: Optional[ShellPool] = None,
+    slice_hours: Optional[float] = None,
+    slice_shells: Optional[int] = None,
+) -> Tuple[str, Iterator[List[Dict]]]:
+    """
+    Page through an event log in bounded batches.
+
+    The log is probed immediately; the returned iterator then fetches one
+    page of at most page_size events per WinRM call, walking forward by
+    EventRecordID, and yields each page as soon as it arrives. Memory
+    on both ends therefore depends on page_size, not on the time window.
+
+    bookmark: if given, only events after this record are collected
+      (--since-last); see _bookmark_check_script() for the fallbacks.
+    notes: optional list; "gap" or "reset" is appended when the bookmark
+      could not be used as-is.
+    event_data: one of EVENT_DATA_MODES.
+    event_filter: optional filters.EventFilter applied on the endpoint,
+      so events it rejects are never transferred.
+    pool, slice_hours, slice_shells: a time window longer than
+      slice_hours is split into slices that are fetched concurrently,
+      over client plus shells borrowed from pool (slice_shells in all,
+      default pool.max_shells), and yielded in time order; see
+      _iter_sliced_pages(). Bookmark runs are not sliced.
+
+    Returns (status, pages) where status is "ok", "missing" or "empty".
+    For "missing"/"empty" the iterator yields nothing. "ok" only means
+    the range is non-empty; the time filter may still leave no events.
+    """
+    if page_size < 1:
+        raise ValueError("page_size must be at least 1.")
+    if slice_shells is not None and slice_shells < 1:
+        raise ValueError("slice_shells must be at least 1.")
+    _event_projection(event_data)  # validate before touching the host
+
+    status, mode, after_id, newest_id = _probe_log(client, log_name, bookmark, notes)
+    # One "now" for both ends, so a window of exactly slice_hours is
+    # not split into a full slice and a stray one-second slice.
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    window_start = _window_start(hours, days, now)
+    start_time = window_start.strftime(_TIME_FORMAT) if mode == "window" else None
+
+    def fetch_range(
+        shell: WindowsRemote, start: Optional[str], end: Optional[str] = None
+    ) -> Iterator[List[Dict]]:
+        return _iter_range_pages(
+            shell, log_name, after_id, newest_id, start, end,
+            page_size, event_data, event_filter,
+        )
+
+    shells = 1
+    if pool is not None and slice_hours and start_time is not None:
+        shells = min(slice_shells or pool.max_shells, pool.max_shells)
+    slices = [(start_time, None)]
+    if shells > 1 and (now - window_start).total_seconds() > slice_hours * 3600:
+        slices = time_slices(window_start, now, slice_hours)
+
+    def pages() -> Iterator[List[Dict]]:
+        if status != "ok":
+            return
+        if len(slices) == 1:
+            yield from fetch_range(client, start_time)
+        else:
+            yield from _iter_sliced_pages(
+                client, pool, min(shells, len(slices)), slices, fetch_range
+            )
+
+    return status, pages()
+
+
+def status_message(label: str, status: str) -> Dict:
+    """The {"message": ...} document written when a log has no events."""
+    if status == "missing":
+        return {"message": f"{label} is not installed on this host."}
+    return {"message": f"No {label} events found for the requested time range."}
+
+
+def _collect_all(
+    client: WindowsRemote,
+    log_name: str,
+    label: str,
+    **kwargs,
+) -> Tuple[str, Dict]:
+    status, pages = open_event_pages(client, log_name, **kwargs)
+    events = [event for page in pages for event in page]
+    if status == "ok" and not events:
+        status = "empty"
+    if status != "ok":
+        return status, status_message(label, status)
+    return "ok", events
 
 
-def collect_processes(client: WindowsRemote) -> Dict:
+def collect_sysmon_logs(
+    client: WindowsRemote,
+    hours: Optional[int] = None,
+    days: Optional[int] = None,
+    bookmark: Optional[Bookmark] = None,
+    notes: Optional[List[str]] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    event_data: str = "message",
+) -> Tuple[str, Dict]:
     """
-    Collect a list of running processes with PID, Name, Path, User (if feasible),
-    and SHA-256 of the executable (where accessible).
+    Collect recent Sysmon events from Windows as JSON.
 
-    Returns a dict like {"processes": [...]}.
+    Convenience wrapper around open_event_pages() that keeps every page
+    in memory; the CLI pipeline streams pages to disk instead.
+
+    Returns a tuple (status, data):
+      - status: "ok", "missing", or "empty"
+      - data: list of events, or {"message": "..."} if missing/empty.
     """
-    script = r"""
+    return _collect_all(
+        client, SYSMON_LOG, "Sysmon",
+        hours=hours, days=days, bookmark=bookmark, notes=notes,
+        page_size=page_size, event_data=event_data,
+    )
+
+
+def collect_security_logs(
+    client: WindowsRemote,
+    hours: Optional[int] = None,
+    days: Optional[int] = None,
+    bookmark: Optional[Bookmark] = None,
+    notes: Optional[List[str]] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    event_data: str = "message",
+) -> Tuple[str, Dict]:
+    """
+    Collect recent Security log events (Windows Security log) as JSON.
+
+    Same status pattern as Sysmon collector: "ok" / "empty".
+    """
+    return _collect_all(
+        client, SECURITY_LOG, "Security",
+        hours=hours, days=days, bookmark=bookmark, notes=notes,
+        page_size=page_size, event_data=event_data,
+    )
+
+
+# Process inventory script. Each unique executable is hashed once (80
+# svchost.exe processes share one Get-FileHash), results are collected
+# from the foreach output instead of quadratic "$results +=" appends, and
+# owners come from Get-Process -IncludeUserName (one call) rather than a
+# WMI GetOwner() round trip per process. $useCache, $knownKeys and
+# $digestBytes are set by the caller (see hashcache.py).
+_PROCESS_SCRIPT = r"""
 $ErrorActionPreference = "SilentlyContinue"
 
-# Create a hashtable mapping PID -> user for efficiency
-$wmiProcs = Get-WmiObject Win32_Process
-$userMap = @{}
-foreach ($p in $wmiProcs) {
-    try {
-        $owner = $p.GetOwner()
+# PID -> user. -IncludeUserName needs an elevated session; otherwise fall
+# back to WMI owners.
+$userById = @{}
+try {
+    $procs = Get-Process -IncludeUserName -ErrorAction Stop
+} catch {
+    $procs = Get-Process
+    foreach ($w in Get-CimInstance Win32_Process) {
+        $owner = Invoke-CimMethod -InputObject $w -MethodName GetOwner
         if ($owner.ReturnValue -eq 0) {
-            $userMap[$p.ProcessId] = "$($owner.Domain)\$($owner.User)"
+            $userById[[int]$w.ProcessId] = "$($owner.Domain)\$($owner.User)"
         }
-    } catch {}
+    }
 }
 
-$results = @()
-
-foreach ($p in Get-Process) {
-    $path = $null
-    $hash = $null
-    $user = $null
+# PID -> executable path, for processes whose MainModule is not readable.
+$pathById = @{}
+foreach ($w in Get-CimInstance Win32_Process -Property ProcessId, ExecutablePath) {
+    if ($w.ExecutablePath) { $pathById[[int]$w.ProcessId] = $w.ExecutablePath }
+}
 
-    try {
-        $path = $p.MainModule.FileName
-    } catch {}
+# Collector-side cache: digests of the "path|size|LastWriteTimeUtc ticks"
+# keys the collector holds a hash for. Those files are not hashed; the
+# key is returned instead and the collector fills in the hash.
+$known = New-Object 'System.Collections.Generic.HashSet[string]'
+$width = 2 * $digestBytes
+for ($i = 0; $i + $width -le $knownKeys.Length; $i += $width) {
+    [void]$known.Add($knownKeys.Substring($i, $width))
+}
+$sha = [System.Security.Cryptography.SHA256]::Create()
+$hashByPath = @{}
+$keyByPath = @{}
 
-    if ($userMap.ContainsKey($p.Id)) {
-        $user = $userMap[$p.Id]
-    }
+$results = foreach ($p in $procs) {
+    $path = $p.Path
+    if (-not $path) { $path = $pathById[[int]$p.Id] }
+    $user = $p.UserName
+    if (-not $user) { $user = $userById[[int]$p.Id] }
 
+    $hash = $null
+    $key = $null
     if ($path) {
-        try {
-            $hashObj = Get-FileHash -Algorithm SHA256 -LiteralPath $path
-            $hash = $hashObj.Hash
-        } catch {}
+        if ($hashByPath.ContainsKey($path)) {
+            $hash = $hashByPath[$path]
+            $key = $keyByPath[$path]
+        } else {
+            $cached = $false
+            if ($useCache) {
+                $item = Get-Item -LiteralPath $path
+                if ($item) {
+                    $key = "$path|$($item.Length)|$($item.LastWriteTimeUtc.Ticks)"
+                    $digest = $sha.ComputeHash([System.Text.Encoding]::UTF8.GetBytes($key))
+                    $cached = $known.Contains((-join ($digest[0..($digestBytes - 1)] | ForEach-Object { $_.ToString("x2") })))
+                }
+            }
+            if (-not $cached) {
+                $hashObj = Get-FileHash -Algorithm SHA256 -LiteralPath $path
+                $hash = $hashObj.Hash
+            }
+            $hashByPath[$path] = $hash
+            $keyByPath[$path] = $key
+        }
     }
 
-    $results += [PSCustomObject]@{
+    $row = [PSCustomObject]@{
         PID = $p.Id
         Name = $p.ProcessName
         Path = $path
         User = $user
         HashSHA256 = $hash
     }
+    if ($key) { $row | Add-Member -NotePropertyName HashKey -NotePropertyValue $key }
+    $row
 }
 
-$results | ConvertTo-Json -Depth 4
+ConvertTo-Json -InputObject @($results) -Depth 4 -Compress
 """
 
+
+def collect_processes(client: WindowsRemote, hash_cache: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Collect a list of running processes with PID, Name, Path, User (if feasible),
+    and SHA-256 of the executable (where accessible).
+
+    hash_cache: the collector's cached hashes for this host (key ->
+      SHA-256, see hashcache.py), or None to hash every executable.
+      Executables whose path, size and LastWriteTime match a cached key
+      are not re-hashed; they get the cached hash and "HashCached": true.
+      The dict is updated in place to the entries of this run.
+
+    Returns a dict like {"processes": [...]}.
+    """
+    use_cache = hash_cache is not None
+    script = (
+        f"$useCache = ${str(use_cache).lower()}\n"
+        f"$knownKeys = \"{known_digests(hash_cache) if use_cache else ''}\"\n"
+        f"$digestBytes = {KEY_DIGEST_CHARS // 2}\n"
+        + _PROCESS_SCRIPT
+    )
+
     status_code, stdout, stderr = client.run_powershell(script, timeout=300)
 
     if status_code != 0 and not stdout:
@@ -187,16 +706,23 @@ $results | ConvertTo-Json -Depth 4
     if not stdout:
         return {"processes": []}
 
+    started = time.perf_counter()
     try:
         data = json.loads(stdout)
     except json.JSONDecodeError:
         # If JSON parsing fails, keep raw text
         return {"raw": stdout}
+    record(parse_s=time.perf_counter() - started)
 
     # Ensure we always return a dict with "processes"
     if isinstance(data, list):
-        return {"processes": data}
-    elif isinstance(data, dict) and "processes" in data:
-        return data
-    else:
-        return {"processes": data}
+        data = {"processes": data}
+    elif not (isinstance(data, dict) and "processes" in data):
+        data = {"processes": data}
+    if use_cache:
+        procs = data["processes"]
+        procs = procs if isinstance(procs, list) else [procs]
+        seen = resolve_hashes([p for p in procs if isinstance(p, dict)], hash_cache)
+        hash_cache.clear()
+        hash_cache.update(seen)
+    return data
@@ -0,0 +1,370 @@
+"""
+Compact column-wise event files (".columnar").
+
+JSON exports repeat ProviderName, MachineName, LevelDisplayName and every
+field name on every event. A columnar file instead stores each field as
+one column, split into row groups:
+
+  - strings are dictionary-encoded per row group (each distinct value is
+    stored once, rows hold small integer codes) unless most values are
+    unique, in which case they are stored plainly
+  - TimeCreated is an int64 (100-nanosecond ticks since the epoch, UTC,
+    so the 7 fractional digits of .NET times survive); RecordId and Id
+    are int64 too, all delta-encoded
+  - every column chunk is zlib-compressed on its own
+
+Files round-trip: a value a typed column cannot hold exactly (a time in
+another notation, a RecordId given as a string, a number in a string
+column) keeps its typed form for analytics and its original form in
+_extra, which iter_rows() puts back.
+
+File layout:
+
+  MAGIC | row group 0 chunks | row group 1 chunks | ... | footer | footer length (u64) | MAGIC
+
+The footer is JSON and lists the schema and the offset/size/encoding of
+every column chunk, so ColumnarReader can read only the columns asked
+for. The writer streams row groups as events arrive and needs no seek,
+so it can write straight into an archive.ArtifactSink stream.
+"""
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+from pathlib import Path
+from typing import IO, Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .eventtime import format_time_ticks, format_time_us, parse_time_ticks
+
+MAGIC = b"SOCLCOL1"
+# Version 1 stored "time" columns in microseconds; still readable.
+FORMAT_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+
+# Events per row group. Large enough for dictionaries and zlib to pay
+# off, small enough that the writer's buffer stays a few MB.
+ROW_GROUP_SIZE = 16384
+
+ZLIB_LEVEL = 6
+
+# Column types:
+#   "time":   TimeCreated, stored as int64 epoch 100-ns ticks
+#   "int":    int64
+#   "string": text, dictionary-encoded or plain
+#   "json":   any JSON value, stored as compact JSON text (like "string")
+EVENT_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("TimeCreated", "time"),
+    ("RecordId", "int"),
+    ("Id", "int"),
+    ("LevelDisplayName", "string"),
+    ("ProviderName", "string"),
+    ("MachineName", "string"),
+    ("Message", "string"),
+    ("EventData", "json"),
+    # Any other keys of the event, as one JSON object (or null).
+    ("_extra", "json"),
+)
+
+# A string column chunk switches from dictionary to plain encoding when
+# more than this share of its values are distinct.
+_PLAIN_RATIO = 0.5
+
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+class ColumnarFormatError(ValueError):
+    """The file is not a valid columnar event file."""
+
+
+def _pack_array(values: array) -> bytes:
+    if not _LITTLE_ENDIAN:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpack_array(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if not _LITTLE_ENDIAN:
+        values.byteswap()
+    return values
+
+
+def _encode_ints(values: Sequence[Optional[int]]) -> Tuple[bytes, Dict]:
+    """Delta-encode int64 values; nulls get a validity byte mask."""
+    has_nulls = any(v is None for v in values)
+    deltas = array("q")
+    previous = 0
+    for v in values:
+        v = previous if v is None else v
+        deltas.append(v - previous)
+        previous = v
+    payload = _pack_array(deltas)
+    if has_nulls:
+        payload = bytes(0 if v is None else 1 for v in values) + payload
+    return payload, {"encoding": "delta", "nulls": has_nulls}
+
+
+def _decode_ints(data: bytes, rows: int, meta: Dict) -> List[Optional[int]]:
+    mask = None
+    if meta.get("nulls"):
+        mask, data = data[:rows], data[rows:]
+    values: List[Optional[int]] = []
+    total = 0
+    for delta in _unpack_array("q", data):
+        total += delta
+        values.append(total)
+    if mask is not None:
+        values = [v if m else None for v, m in zip(values, mask)]
+    return values
+
+
+def _encode_strings(values: Sequence[Optional[str]]) -> Tuple[bytes, Dict]:
+    distinct: Dict[str, int] = {}
+    for v in values:
+        if v is not None and v not in distinct:
+            distinct[v] = len(distinct)
+    if values and len(distinct) > _PLAIN_RATIO * len(values):
+        return json.dumps(list(values), ensure_ascii=False).encode("utf-8"), {"encoding": "plain"}
+    dictionary = json.dumps(list(distinct), ensure_ascii=False).encode("utf-8")
+    codes = array("i", (-1 if v is None else distinct[v] for v in values))
+    payload = struct.pack("<I", len(dictionary)) + dictionary + _pack_array(codes)
+    return payload, {"encoding": "dict", "distinct": len(distinct)}
+
+
+def _decode_strings(data: bytes, rows: int, meta: Dict) -> List[Optional[str]]:
+    if meta["encoding"] == "plain":
+        return json.loads(data.decode("utf-8"))
+    (dict_len,) = struct.unpack_from("<I", data)
+    dictionary = json.loads(data[4 : 4 + dict_len].decode("utf-8"))
+    return [None if c < 0 else dictionary[c] for c in _unpack_array("i", data[4 + dict_len :])]
+
+
+def _to_json_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+class ColumnarWriter:
+    """
+    Write events to a binary stream in the columnar format.
+
+    Same interface as the writers in artifacts.py: write(), write_many()
+    and finish(empty_data), which must be called once at the end.
+    """
+
+    def __init__(
+        self,
+        f: BinaryIO,
+        columns: Sequence[Tuple[str, str]] = EVENT_COLUMNS,
+        row_group_size: int = ROW_GROUP_SIZE,
+    ) -> None:
+        self.f = f
+        self.columns = list(columns)
+        self.row_group_size = row_group_size
+        self.count = 0
+        self._names = {name for name, _ in self.columns}
+        self._has_extra = "_extra" in self._names
+        self._buffer: Dict[str, List] = {name: [] for name, _ in self.columns}
+        self._row_groups: List[Dict] = []
+        self._offset = 0
+        self._write(MAGIC)
+
+    def _write(self, data: bytes) -> None:
+        self.f.write(data)
+        self._offset += len(data)
+
+    def write(self, item: Dict) -> None:
+        # Originals of values the typed columns cannot reproduce exactly.
+        inexact: Dict[str, Any] = {}
+        for name, kind in self.columns:
+            if name == "_extra":
+                continue
+            raw = item.get(name)
+            value = raw
+            if raw is None:
+                if name in item:
+                    inexact[name] = None  # an explicit null, not a missing key
+            elif kind == "json":
+                value = _to_json_text(raw)
+            elif kind == "time":
+                value = parse_time_ticks(raw)
+                if value is None or format_time_ticks(value) != raw:
+                    inexact[name] = raw
+            elif kind == "int":
+                try:
+                    value = int(raw)
+                except (TypeError, ValueError):
+                    value = None
+                if type(raw) is not int:
+                    inexact[name] = raw
+            elif not isinstance(raw, str):
+                value = str(raw)
+                inexact[name] = raw
+            self._buffer[name].append(value)
+        if self._has_extra:
+            extra = {k: v for k, v in item.items() if k not in self._names}
+            extra.update(inexact)
+            self._buffer["_extra"].append(_to_json_text(extra) if extra else None)
+        self.count += 1
+        if len(self._buffer[self.columns[0][0]]) >= self.row_group_size:
+            self._flush_row_group()
+
+    def write_many(self, items: Iterable[Dict]) -> None:
+        for item in items:
+            self.write(item)
+
+    def _flush_row_group(self) -> None:
+        rows = len(self._buffer[self.columns[0][0]])
+        if not rows:
+            return
+        chunks = {}
+        for name, kind in self.columns:
+            values = self._buffer[name]
+            if kind in ("time", "int"):
+                payload, meta = _encode_ints(values)
+            else:
+                payload, meta = _encode_strings(values)
+            data = zlib.compress(payload, ZLIB_LEVEL)
+            meta.update(offset=self._offset, length=len(data))
+            self._write(data)
+            chunks[name] = meta
+            self._buffer[name] = []
+        self._row_groups.append({"rows": rows, "chunks": chunks})
+
+    def finish(self, empty_data: Optional[Dict] = None) -> None:
+        """
+        Write the last row group and the footer. empty_data is kept in
+        the footer metadata when no event was written.
+        """
+        self._flush_row_group()
+        footer = {
+            "version": FORMAT_VERSION,
+            "columns": [{"name": n, "type": t} for n, t in self.columns],
+            "rows": self.count,
+            "row_groups": self._row_groups,
+            "metadata": {} if self.count or not empty_data else {"empty": empty_data},
+        }
+        data = json.dumps(footer, separators=(",", ":")).encode("utf-8")
+        self._write(data)
+        self._write(struct.pack("<Q", len(data)) + MAGIC)
+
+
+class ColumnarReader:
+    """
+    Read a columnar event file from a seekable binary stream.
+
+    Only the column chunks that are asked for are read and decompressed.
+    """
+
+    def __init__(self, f: IO[bytes]) -> None:
+        self.f = f
+        f.seek(0, 2)
+        size = f.tell()
+        tail_len = 8 + len(MAGIC)
+        if size < len(MAGIC) + tail_len:
+            raise ColumnarFormatError("file too short")
+        f.seek(size - tail_len)
+        tail = f.read(tail_len)
+        if tail[8:] != MAGIC:
+            raise ColumnarFormatError("bad trailer")
+        (footer_len,) = struct.unpack("<Q", tail[:8])
+        f.seek(size - tail_len - footer_len)
+        self.footer = json.loads(f.read(footer_len).decode("utf-8"))
+        if self.footer.get("version") not in READABLE_VERSIONS:
+            raise ColumnarFormatError(f"unsupported version {self.footer.get('version')!r}")
+        self.types = {c["name"]: c["type"] for c in self.footer["columns"]}
+        self._ticks = self.footer["version"] >= 2
+
+    @property
+    def columns(self) -> List[str]:
+        return [c["name"] for c in self.footer["columns"]]
+
+    @property
+    def num_rows(self) -> int:
+        return self.footer["rows"]
+
+    @property
+    def metadata(self) -> Dict:
+        return self.footer.get("metadata", {})
+
+    def _chunk(self, meta: Dict) -> bytes:
+        self.f.seek(meta["offset"])
+        return zlib.decompress(self.f.read(meta["length"]))
+
+    def iter_row_groups(
+        self, columns: Optional[Sequence[str]] = None
+    ) -> Iterator[Dict[str, List]]:
+        """
+        Yield {column: values} for each row group, as stored ("time"
+        columns in ticks for version 2 files, see read_columns).
+        """
+        names = list(columns) if columns is not None else self.columns
+        unknown = [n for n in names if n not in self.types]
+        if unknown:
+            raise KeyError(f"No such column(s): {', '.join(unknown)}")
+        for group in self.footer["row_groups"]:
+            out: Dict[str, List] = {}
+            for name in names:
+                meta = group["chunks"][name]
+                data = self._chunk(meta)
+                if self.types[name] in ("time", "int"):
+                    out[name] = _decode_ints(data, group["rows"], meta)
+                else:
+                    out[name] = _decode_strings(data, group["rows"], meta)
+            yield out
+
+    def read_columns(self, columns: Optional[Sequence[str]] = None) -> Dict[str, List]:
+        """
+        Return {column: list of values} for the given columns (default: all).
+
+        Values are raw: "time" columns are epoch microseconds and "json"
+        columns are JSON text, which is what analytics usually want.
+        """
+        names = list(columns) if columns is not None else self.columns
+        out: Dict[str, List] = {name: [] for name in names}
+        for group in self.iter_row_groups(names):
+            for name in names:
+                values = group[name]
+                if self._ticks and self.types[name] == "time":
+                    values = [None if v is None else v // 10 for v in values]
+                out[name].extend(values)
+        return out
+
+    def iter_rows(self, columns: Optional[Sequence[str]] = None) -> Iterator[Dict]:
+        """
+        Yield events as dicts shaped like the JSON exports: times as ISO
+        strings, JSON columns parsed, _extra merged back in, and null
+        fields left out.
+        """
+        for group in self.iter_row_groups(columns):
+            names = list(group)
+            for values in zip(*(group[n] for n in names)):
+                event: Dict[str, Any] = {}
+                for name, value in zip(names, values):
+                    if value is None:
+                        continue
+                    kind = self.types[name]
+                    if kind == "time":
+                        value = format_time_ticks(value) if self._ticks else format_time_us(value)
+                    elif kind == "json":
+                        value = json.loads(value)
+                    if name == "_extra":
+                        event.update(value)
+                    else:
+                        event[name] = value
+                yield event
+
+
+def read_columns(
+    source: Union[str, Path, IO[bytes]], columns: Optional[Sequence[str]] = None
+) -> Dict[str, List]:
+    """Read the given columns (default: all) of a columnar file or stream."""
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            return ColumnarReader(f).read_columns(columns)
+    return ColumnarReader(source).read_columns(columns)
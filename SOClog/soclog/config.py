@@ -1,8 +1,12 @@
+import hashlib
+import json
 import os
-from dataclasses import dataclass
-from typing import List, Optional
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
 
-import yaml
+from .filters import EventFilter, merge_filters, parse_filters
 
 
 @dataclass
@@ -14,14 +18,130 @@ class HostConfig:
     username: str
     password_env: Optional[str] = None
     ask_password: bool = False
+    max_shells: Optional[int] = None
+    # Name of the collection profile used, and the resulting server-side
+    # filters per log ("sysmon" / "security").
+    profile: Optional[str] = None
+    filters: Dict[str, EventFilter] = field(default_factory=dict)
+    # For 'soclog daemon': schedule group and collection interval in
+    # seconds (None = the group's interval, else the --interval default).
+    group: Optional[str] = None
+    interval: Optional[float] = None
 
 
-def load_hosts_from_yaml(path: str) -> List[HostConfig]:
+_DURATION = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*$")
+_DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_interval(value) -> float:
+    """Parse an interval like 900, "90s", "15m", "1h" or "1d" into seconds."""
+    match = _DURATION.match(str(value))
+    if not match:
+        raise ValueError(f"Invalid interval {value!r}; expected e.g. 900, 15m, 1h or 1d.")
+    seconds = float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+    if seconds <= 0:
+        raise ValueError(f"Interval {value!r} must be positive.")
+    return seconds
+
+
+# Bump when HostConfig/EventFilter or the YAML rules change, so stale
+# inventory caches are ignored.
+INVENTORY_CACHE_VERSION = 1
+
+
+def default_cache_dir() -> Path:
+    """Where parsed inventories are cached ($XDG_CACHE_HOME/soclog/inventory)."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "soclog" / "inventory"
+
+
+def _cache_path(path: str, profile: Optional[str], cache_dir: Path) -> Path:
+    key = hashlib.sha256(f"{path}\0{profile or ''}".encode("utf-8")).hexdigest()[:32]
+    return cache_dir / f"{key}.json"
+
+
+def _host_from_dict(data: Dict) -> HostConfig:
+    filters = {
+        log: EventFilter(
+            include_ids=[tuple(r) for r in flt["include_ids"]],
+            exclude_ids=[tuple(r) for r in flt["exclude_ids"]],
+            providers=list(flt["providers"]),
+            xpath=flt["xpath"],
+        )
+        for log, flt in data.pop("filters").items()
+    }
+    return HostConfig(filters=filters, **data)
+
+
+def _read_inventory_cache(
+    cache_file: Path, path: str, stat: os.stat_result
+) -> Optional[List[HostConfig]]:
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if (
+            cached.get("version") != INVENTORY_CACHE_VERSION
+            or cached.get("path") != path
+            or cached.get("mtime_ns") != stat.st_mtime_ns
+            or cached.get("size") != stat.st_size
+        ):
+            return None
+        return [_host_from_dict(h) for h in cached["hosts"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_inventory_cache(
+    cache_file: Path, path: str, stat: os.stat_result, hosts: List[HostConfig]
+) -> None:
+    data = {
+        "version": INVENTORY_CACHE_VERSION,
+        "path": path,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "hosts": [asdict(h) for h in hosts],
+    }
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_name(f".{cache_file.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, cache_file)
+    except OSError:
+        pass  # the cache is only an optimisation
+
+
+def load_hosts_from_yaml(
+    path: str,
+    profile: Optional[str] = None,
+    cache_dir: Optional[Path] = None,
+) -> List[HostConfig]:
     """
     Load host definitions from a YAML file.
 
+    profile, if given, replaces every host's own 'profile'.
+
+    cache_dir, if given, keeps a parsed and validated copy of the
+    inventory there (see default_cache_dir()), so large inventories are
+    not re-parsed on every start. The copy is used only while the YAML's
+    size and modification time are unchanged. It holds no passwords,
+    only the names of password environment variables.
+
     Expected format:
 
+    groups:                    # optional, schedules for 'soclog daemon'
+      dcs:
+        interval: 5m
+      workstations:
+        interval: 1h
+
+    profiles:                  # optional, named server-side filters
+      quiet:
+        security:
+          exclude_ids: [4624, 4634, 5156, 5158]
+        sysmon:
+          include_ids: [1, 3, "11-13", 22]
+
     hosts:
       - name: win10lab
         host: 192.168.56.10
@@ -32,10 +152,60 @@ def load_hosts_from_yaml(path: str) -> List[HostConfig]:
         host: win11.lab.local
         username: LAB\\dfir
         ask_password: true
+        max_shells: 1          # optional, WinRM shells used at once
+        group: workstations    # optional, see 'groups'
+        interval: 30m          # optional, overrides the group's interval
+        profile: quiet         # optional
+        filters:               # optional, overrides the profile per key
+          security:
+            providers: [Microsoft-Windows-Security-Auditing]
+            xpath: "EventData[Data[@Name='LogonType']='3']"
+
+    Filter keys per log: include_ids, exclude_ids, providers, xpath.
     """
+    if cache_dir is None:
+        return _parse_hosts_yaml(path, profile)
+
+    path = os.path.abspath(os.path.expanduser(path))
+    stat = os.stat(path)
+    cache_file = _cache_path(path, profile, Path(cache_dir))
+    hosts = _read_inventory_cache(cache_file, path, stat)
+    if hosts is None:
+        hosts = _parse_hosts_yaml(path, profile)
+        _write_inventory_cache(cache_file, path, stat, hosts)
+    return hosts
+
+
+def _parse_hosts_yaml(path: str, profile: Optional[str]) -> List[HostConfig]:
+    import yaml  # only needed here; keeps 'soclog --help' fast
+
     with open(path, "r", encoding="utf-8") as f:
         data = yaml.safe_load(f) or {}
 
+    profiles_data = data.get("profiles") or {}
+    if not isinstance(profiles_data, dict):
+        raise ValueError("'profiles' must be a mapping of profile names.")
+    profiles = {
+        str(pname): parse_filters(spec, f"profiles.{pname}")
+        for pname, spec in profiles_data.items()
+    }
+    if profile is not None and profile not in profiles:
+        raise ValueError(f"Unknown profile {profile!r} (not in {path}).")
+
+    groups_data = data.get("groups") or {}
+    if not isinstance(groups_data, dict):
+        raise ValueError("'groups' must be a mapping of group names.")
+    group_intervals: Dict[str, Optional[float]] = {}
+    for gname, spec in groups_data.items():
+        spec = spec or {}
+        if not isinstance(spec, dict):
+            raise ValueError(f"groups.{gname}: expected a mapping.")
+        try:
+            interval = spec.get("interval")
+            group_intervals[str(gname)] = None if interval is None else parse_interval(interval)
+        except ValueError as exc:
+            raise ValueError(f"groups.{gname}: {exc}") from None
+
     hosts_data = data.get("hosts", [])
     hosts: List[HostConfig] = []
 
@@ -52,6 +222,31 @@ def load_hosts_from_yaml(path: str) -> List[HostConfig]:
         password_env = item.get("password_env")
         ask_password = bool(item.get("ask_password", False))
 
+        max_shells = item.get("max_shells")
+        if max_shells is not None:
+            max_shells = int(max_shells)
+            if max_shells < 1:
+                raise ValueError(f"Host {name!r}: 'max_shells' must be at least 1.")
+
+        host_profile = profile or item.get("profile")
+        if host_profile is not None and host_profile not in profiles:
+            raise ValueError(f"Host {name!r}: unknown profile {host_profile!r}.")
+        filters = merge_filters(
+            profiles.get(host_profile) if host_profile else None,
+            parse_filters(item.get("filters"), f"Host {name!r} filters"),
+        )
+
+        group = item.get("group")
+        if group is not None and str(group) not in group_intervals:
+            raise ValueError(f"Host {name!r}: unknown group {group!r}.")
+        try:
+            interval = item.get("interval")
+            interval = parse_interval(interval) if interval is not None else None
+        except ValueError as exc:
+            raise ValueError(f"Host {name!r}: {exc}") from None
+        if interval is None and group is not None:
+            interval = group_intervals[str(group)]
+
         hosts.append(
             HostConfig(
                 name=name,
@@ -59,6 +254,11 @@ def load_hosts_from_yaml(path: str) -> List[HostConfig]:
                 username=username,
                 password_env=password_env,
                 ask_password=ask_password,
+                max_shells=max_shells,
+                profile=host_profile,
+                filters=filters,
+                group=None if group is None else str(group),
+                interval=interval,
             )
         )
 
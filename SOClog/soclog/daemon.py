@@ -0,0 +1,252 @@
+"""
+Continuous collection for 'soclog daemon'.
+
+FleetScheduler keeps running and collects every host periodically, at
+the host's own interval (HostConfig.interval, set per host or per group
+in the YAML) or a default one:
+
+  - First runs are spread across each host's interval by a stable
+    per-host offset, and every run gets a little random jitter on top,
+    so a fleet never connects all at once.
+  - At most max_concurrent collections run at the same time; hosts that
+    are due while all slots are busy wait for the next free slot.
+  - A host is never collected twice at once. If a run overruns its
+    interval (or waits too long for a slot), the missed intervals are
+    not replayed one by one: the host gets a single catch-up run as soon
+    as it is free, and with bookmarks that run collects everything since
+    the previous one.
+  - Each host's ShellPool is kept between runs (warm connections), so
+    short intervals reuse remote shells and HTTP connections. For
+    intervals longer than the shells' idle timeout, shells are released
+    after each run and only the client is kept. A failed run drops the
+    pool so the next run reconnects from scratch.
+
+Passwords are resolved once, before the scheduler starts.
+"""
+
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .config import HostConfig
+from .pipeline import CollectOptions, HostResult, collect_host, connect_host
+from .progress import BOLD, DIM, RESET, ProgressReporter
+from .scheduler import ShellPool
+from .windows_remote import WindowsRemoteError
+
+# Interval for hosts that have none in the YAML (seconds).
+DEFAULT_INTERVAL = 3600.0
+
+# Random delay added to each run, as a fraction of the host's interval.
+DEFAULT_JITTER = 0.1
+
+
+def start_offset(name: str, interval: float) -> float:
+    """
+    Offset of a host's first run within its interval.
+
+    Derived from the host name, so hosts are spread evenly across the
+    interval and keep their place when the daemon restarts.
+    """
+    return zlib.crc32(name.encode("utf-8")) / 2 ** 32 * interval
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m{seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m"
+
+
+@dataclass
+class ScheduledHost:
+    """Scheduling state of one host."""
+
+    cfg: HostConfig
+    password: str
+    interval: float
+    # Start of the interval slot the next run belongs to, and when that
+    # run is due (slot plus jitter); both time.monotonic() values.
+    slot: float = 0.0
+    next_due: float = 0.0
+    pool: Optional[ShellPool] = None
+    running: bool = False
+    runs: int = 0
+    missed: int = 0
+
+
+class FleetScheduler:
+    """
+    Periodic collection of many hosts; see the module docstring.
+
+    jobs are (host config, password) pairs as returned by
+    cli.resolve_passwords(). on_result, if given, is called with each
+    finished HostResult (from a worker thread).
+    """
+
+    def __init__(
+        self,
+        jobs: List[Tuple[HostConfig, str]],
+        options: CollectOptions,
+        reporter: ProgressReporter,
+        default_interval: float = DEFAULT_INTERVAL,
+        max_concurrent: int = 1,
+        jitter: float = DEFAULT_JITTER,
+        on_result: Optional[Callable[[HostResult], None]] = None,
+    ) -> None:
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1.")
+        if not 0 <= jitter <= 1:
+            raise ValueError("jitter must be between 0 and 1.")
+        self.options = options
+        self.reporter = reporter
+        self.max_concurrent = max_concurrent
+        self.jitter = jitter
+        self.on_result = on_result
+
+        now = time.monotonic()
+        self.hosts: List[ScheduledHost] = []
+        for cfg, password in jobs:
+            interval = cfg.interval or default_interval
+            entry = ScheduledHost(cfg=cfg, password=password, interval=interval)
+            entry.slot = now + start_offset(cfg.name, interval)
+            entry.next_due = entry.slot + self._jitter(entry)
+            self.hosts.append(entry)
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._active = 0
+
+    def _jitter(self, entry: ScheduledHost) -> float:
+        return random.uniform(0, self.jitter * entry.interval)
+
+    def stop(self) -> None:
+        """Stop scheduling; run() returns once running collections finish."""
+        self._stopping.set()
+        self._wake.set()
+
+    def schedule(self) -> List[Tuple[str, float, float]]:
+        """(host, interval, seconds until next run) for every host."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (e.cfg.name, e.interval, max(0.0, e.next_due - now))
+                for e in sorted(self.hosts, key=lambda e: e.next_due)
+            ]
+
+    def run(self) -> None:
+        """Run until stop() is called."""
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrent, thread_name_prefix="soclog-daemon"
+        )
+        try:
+            while not self._stopping.is_set():
+                self._wake.clear()
+                timeout = self._start_due(executor)
+                self._wake.wait(timeout)
+        finally:
+            executor.shutdown(wait=True)
+            for entry in self.hosts:
+                if entry.pool is not None:
+                    entry.pool.close()
+                    entry.pool = None
+
+    def _start_due(self, executor: ThreadPoolExecutor) -> Optional[float]:
+        """Start due hosts in free slots; return how long to sleep (None = until woken)."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [e for e in self.hosts if not e.running]
+            for entry in sorted((e for e in idle if e.next_due <= now), key=lambda e: e.next_due):
+                if self._active >= self.max_concurrent:
+                    break
+                entry.running = True
+                self._active += 1
+                executor.submit(self._run, entry)
+            if self._active >= self.max_concurrent:
+                return None  # a finishing run wakes us
+            waiting = [e.next_due for e in self.hosts if not e.running]
+        if not waiting:
+            return None
+        return max(0.0, min(waiting) - now)
+
+    def _run(self, entry: ScheduledHost) -> None:
+        name = entry.cfg.name
+        result: Optional[HostResult] = None
+        try:
+            if entry.pool is None:
+                try:
+                    entry.pool = connect_host(entry.cfg, entry.password, self.options)
+                except WindowsRemoteError:
+                    pass  # collect_host() connects again and reports the error
+            result = collect_host(entry.cfg, entry.password, self.options, self.reporter, entry.pool)
+            self._after_run(entry, result)
+        except Exception as exc:  # keep the daemon alive
+            self.reporter.error(name, f"Scheduler error: {exc!r}")
+        finally:
+            with self._lock:
+                entry.runs += 1
+                entry.running = False
+                self._active -= 1
+                self._reschedule(entry)
+            self._wake.set()
+        if result is not None and self.on_result is not None:
+            try:
+                self.on_result(result)
+            except Exception as exc:
+                self.reporter.warn(name, f"Failed to handle result: {exc!r}")
+
+    def _after_run(self, entry: ScheduledHost, result: HostResult) -> None:
+        pool = entry.pool
+        if pool is None:
+            return
+        if result.status == "failed":
+            pool.close()
+            entry.pool = None
+        elif any(entry.interval > c.idle_timeout for c in pool.clients):
+            # The shells would be idle-reaped before the next run anyway.
+            for client in pool.clients:
+                client.release_shell()
+
+    def _reschedule(self, entry: ScheduledHost) -> None:
+        """Pick the next run after one finished. Caller holds _lock."""
+        now = time.monotonic()
+        entry.slot += entry.interval
+        if entry.slot <= now:
+            missed = int((now - entry.slot) // entry.interval) + 1
+            entry.missed += missed
+            entry.slot = entry.next_due = now
+            self.reporter.warn(
+                entry.cfg.name,
+                f"Run took longer than the {format_duration(entry.interval)} interval; "
+                f"{missed} run(s) missed, catching up now.",
+            )
+            return
+        entry.next_due = entry.slot + self._jitter(entry)
+        self.reporter.detail(
+            entry.cfg.name,
+            f"{DIM}Next run in {format_duration(entry.next_due - now)}.{RESET}",
+        )
+
+    def describe(self) -> List[str]:
+        """Human-readable schedule, one line per host."""
+        lines = []
+        for name, interval, due_in in self.schedule():
+            lines.append(
+                f"  {BOLD}{name}{RESET}  every {format_duration(interval)}, "
+                f"first run in {format_duration(due_in)}"
+            )
+        return lines
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {e.cfg.name: {"runs": e.runs, "missed": e.missed} for e in self.hosts}
@@ -0,0 +1,38 @@
+"""
+Defaults and choices shared by the CLI and the modules that use them.
+
+Kept free of imports so that building the argument parser (and with it
+'soclog --help' / '--version') does not load the collection machinery.
+The owning modules import these names from here.
+"""
+
+# Event artefact formats (artifacts.py).
+FORMATS = ("json", "ndjson", "columnar")
+
+# ZIP methods for --zip-compression (archive.ZIP_COMPRESSION).
+ZIP_METHODS = ("deflated", "stored", "bzip2", "lzma")
+
+# How event details are exported (collectors.py):
+#   - "message":    the rendered Message text (classic behaviour)
+#   - "structured": the raw EventData/UserData name-value pairs from the
+#                   event XML as an "EventData" object; no Message is
+#                   rendered, which is the slowest part of Get-WinEvent
+#   - "both":       EventData plus the rendered Message
+EVENT_DATA_MODES = ("message", "structured", "both")
+
+# Default number of events fetched per Get-WinEvent call. Each page is a
+# separate WinRM command, so this bounds both the endpoint's memory and
+# the size of a single WinRM response.
+DEFAULT_PAGE_SIZE = 2000
+
+# Default number of WinRM shells SOClog opens per host at the same time.
+# Windows allows 30 shells per user by default (MaxShellsPerUser), so
+# this leaves plenty of headroom even with --parallel.
+DEFAULT_MAX_SHELLS = 3
+
+# Time windows longer than this many hours are split into slices that
+# are read over several shells at once (collectors.py, --slice-hours).
+DEFAULT_SLICE_HOURS = 24
+
+# Retries after a transient WinRM transport error (windows_remote.py).
+DEFAULT_RETRIES = 2
@@ -0,0 +1,743 @@
+"""
+Local detections over collected events ('soclog detect').
+
+Rules are Sigma-style YAML documents:
+
+    title: Mimikatz command line
+    id: 7d6c1a9e-...
+    level: high
+    logsource:
+      product: windows
+      service: sysmon            # or security; category: process_creation
+    detection:
+      selection:
+        EventID: 1
+        CommandLine|contains:
+          - sekurlsa::
+          - lsadump::
+      filter:
+        Image|endswith: '\\legit.exe'
+      condition: selection and not filter
+
+Supported: selections as a mapping (fields ANDed) or a list of mappings
+(ORed) or of plain strings (keywords, searched in the Message); value
+lists (ORed, or ANDed with |all); the modifiers contains, startswith,
+endswith, re and all; * and ? wildcards; null; conditions with and, or,
+not, parentheses, "1 of sel*", "all of sel*" and "1 of them". Matching
+is case-insensitive except for |re.
+
+Field names are looked up in the event's EventData (structured mode),
+then in the "Name: value" lines of the rendered Message (message mode,
+as Sysmon renders them). EventID, Provider_Name, Computer, Level and
+Message map to the exported top-level fields.
+
+Rules are compiled once into a RuleSet:
+
+  - Every rule's possible EventIDs are derived from its condition, and
+    rules are bucketed by channel and EventID, so an event is only
+    checked against the rules that can match it (one dict lookup).
+  - Values are lowercased when the rule is compiled, and field values
+    once per event. Every (field, needle) test - contains, startswith,
+    endswith or equals, including wildcard values that reduce to them -
+    runs at most once per event and is shared by all rules using it.
+    Plain 'in' tests beat one combined regex alternation here: Python's
+    re tries every alternative at every position.
+
+scan_collections() runs the rule set over Sysmon and Security artefacts
+of run directories or ZIPs, one artefact per task, in a process pool
+(each worker compiles the rules itself), streaming events without
+loading a file into memory. Alerts are written per collection to
+alerts.ndjson.
+"""
+
+import fnmatch
+import json
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+from .artifacts import iter_events
+from .verify import find_collections, open_member, read_manifest
+
+ALERTS_FILE_NAME = "alerts.ndjson"
+
+LEVELS = ("informational", "low", "medium", "high", "critical")
+
+# Artefact file name prefix -> logsource service.
+CHANNELS = {"sysmon_events": "sysmon", "security_events": "security"}
+
+# Sigma logsource categories -> (service, EventIDs) for the Sysmon events
+# SOClog collects.
+CATEGORIES = {
+    "process_creation": ("sysmon", {1}),
+    "network_connection": ("sysmon", {3}),
+    "process_termination": ("sysmon", {5}),
+    "driver_load": ("sysmon", {6}),
+    "image_load": ("sysmon", {7}),
+    "create_remote_thread": ("sysmon", {8}),
+    "raw_access_thread": ("sysmon", {9}),
+    "process_access": ("sysmon", {10}),
+    "file_event": ("sysmon", {11}),
+    "registry_add": ("sysmon", {12}),
+    "registry_delete": ("sysmon", {12}),
+    "registry_set": ("sysmon", {13}),
+    "registry_rename": ("sysmon", {14}),
+    "registry_event": ("sysmon", {12, 13, 14}),
+    "create_stream_hash": ("sysmon", {15}),
+    "pipe_created": ("sysmon", {17, 18}),
+    "wmi_event": ("sysmon", {19, 20, 21}),
+    "dns_query": ("sysmon", {22}),
+    "file_delete": ("sysmon", {23, 26}),
+}
+
+# Sigma field name -> top-level field of an exported event.
+_TOP_LEVEL = {
+    "EventID": "Id",
+    "Provider_Name": "ProviderName",
+    "Provider": "ProviderName",
+    "Computer": "MachineName",
+    "Level": "LevelDisplayName",
+    "Message": "Message",
+    "RecordID": "RecordId",
+}
+
+# "Name: value" lines of a rendered Message (Sysmon style).
+_MESSAGE_FIELD = re.compile(r"^\s*([A-Za-z][\w ]*?):[ \t]*(.*?)\s*$", re.M)
+
+
+def message_fields(message: str) -> Dict[str, str]:
+    """
+    Fields of a rendered Message, from its "Name: value" lines; spaces
+    are dropped from names ("Source Network Address" ->
+    "SourceNetworkAddress") and the first occurrence of a name wins.
+    """
+    fields: Dict[str, str] = {}
+    for key, value in _MESSAGE_FIELD.findall(message):
+        fields.setdefault(key.replace(" ", ""), value)
+    return fields
+
+
+_KEYWORDS = "Message"
+
+
+class RuleError(ValueError):
+    """A detection rule cannot be parsed or compiled."""
+
+
+# ---------- per-event view ----------
+
+
+class _EventView:
+    """An event with lazily extracted, lowercased and cached field values."""
+
+    __slots__ = ("event", "values", "needles", "_message_fields")
+
+    def __init__(self, event: Dict) -> None:
+        self.event = event
+        self.values: Dict[str, Optional[str]] = {}
+        # (field, needle kind, needle) -> bool, shared by all rules.
+        self.needles: Dict[Tuple[str, str, str], bool] = {}
+        self._message_fields: Optional[Dict[str, str]] = None
+
+    def raw(self, name: str):
+        top = _TOP_LEVEL.get(name)
+        if top is not None:
+            return self.event.get(top)
+        data = self.event.get("EventData")
+        if isinstance(data, dict) and name in data:
+            return data[name]
+        if self._message_fields is None:
+            self._message_fields = message_fields(self.event.get("Message") or "")
+        return self._message_fields.get(name)
+
+    def get(self, name: str) -> Optional[str]:
+        """Lowercased field value, or None if the event has no such field."""
+        try:
+            return self.values[name]
+        except KeyError:
+            value = self.raw(name)
+            text = None if value is None else str(value).lower()
+            self.values[name] = text
+            return text
+
+
+# ---------- value matchers ----------
+
+Matcher = Callable[[_EventView], bool]
+
+
+def _needle_matcher(name: str, kind: str, needle: str) -> Matcher:
+    key = (name, kind, needle)
+
+    def match(view: _EventView) -> bool:
+        try:
+            return view.needles[key]
+        except KeyError:
+            value = view.get(name)
+            if value is None:
+                hit = False
+            elif kind == "contains":
+                hit = needle in value
+            elif kind == "startswith":
+                hit = value.startswith(needle)
+            elif kind == "endswith":
+                hit = value.endswith(needle)
+            else:
+                hit = value == needle
+            view.needles[key] = hit
+            return hit
+
+    return match
+
+
+def _value_matcher(name: str, value, modifiers: List[str]) -> Matcher:
+    if value is None:
+        return lambda view: view.get(name) in (None, "")
+    if "re" in modifiers:
+        try:
+            pattern = re.compile(str(value))
+        except re.error as exc:
+            raise RuleError(f"{name}: invalid regular expression {value!r}: {exc}") from None
+
+        def match_re(view: _EventView) -> bool:
+            raw = view.raw(name)
+            return raw is not None and pattern.search(str(raw)) is not None
+
+        return match_re
+
+    text = str(value).lower()
+    kind = next((m for m in ("contains", "startswith", "endswith") if m in modifiers), None)
+    if kind is None and not ("*" in text or "?" in text):
+        return _needle_matcher(name, "equals", text)
+    if kind is None:
+        # Plain wildcard values: *x*, x* and *x become substring tests.
+        inner = text.strip("*")
+        if "*" not in inner and "?" not in inner and inner:
+            if text.startswith("*") and text.endswith("*"):
+                kind, text = "contains", inner
+            elif text.endswith("*"):
+                kind, text = "startswith", inner
+            elif text.startswith("*"):
+                kind, text = "endswith", inner
+        if kind is None:
+            pattern = re.compile(fnmatch.translate(text), re.S)
+
+            def match_glob(view: _EventView) -> bool:
+                value_ = view.get(name)
+                return value_ is not None and pattern.match(value_) is not None
+
+            return match_glob
+    return _needle_matcher(name, kind, text)
+
+
+def _field_matcher(key: str, values) -> Tuple[Matcher, Optional[FrozenSet[int]]]:
+    """Matcher for one "Field|mod|mod: value(s)" entry, and its EventIDs if key is EventID."""
+    name, *modifiers = str(key).split("|")
+    unknown = set(modifiers) - {"contains", "startswith", "endswith", "re", "all"}
+    if unknown:
+        raise RuleError(f"{key}: unsupported modifier(s) {', '.join(sorted(unknown))}")
+    if not isinstance(values, list):
+        values = [values]
+    if not values:
+        raise RuleError(f"{key}: empty value list")
+    matchers = [_value_matcher(name, v, modifiers) for v in values]
+
+    event_ids = None
+    if name == "EventID" and not modifiers:
+        try:
+            event_ids = frozenset(int(v) for v in values)
+        except (TypeError, ValueError):
+            raise RuleError(f"EventID values must be integers, got {values!r}") from None
+
+    if len(matchers) == 1:
+        return matchers[0], event_ids
+    if "all" in modifiers:
+        return (lambda view: all(m(view) for m in matchers)), event_ids
+    return (lambda view: any(m(view) for m in matchers)), event_ids
+
+
+def _selection(name: str, spec) -> Tuple[Matcher, Optional[FrozenSet[int]]]:
+    """Compile a named selection; also return the EventIDs it is limited to."""
+    if isinstance(spec, dict):
+        if not spec:
+            raise RuleError(f"selection {name!r} is empty")
+        parts = [_field_matcher(k, v) for k, v in spec.items()]
+        matchers = [m for m, _ in parts]
+        ids = [e for _, e in parts if e is not None]
+        event_ids = frozenset.intersection(*ids) if ids else None
+        if len(matchers) == 1:
+            return matchers[0], event_ids
+        return (lambda view: all(m(view) for m in matchers)), event_ids
+    if isinstance(spec, list) and spec:
+        if all(isinstance(item, dict) for item in spec):
+            parts = [_selection(name, item) for item in spec]
+            matchers = [m for m, _ in parts]
+            ids = [e for _, e in parts]
+            event_ids = None if None in ids else frozenset().union(*ids)
+            return (lambda view: any(m(view) for m in matchers)), event_ids
+        if all(not isinstance(item, (dict, list)) for item in spec):
+            return _field_matcher(f"{_KEYWORDS}|contains", [str(item) for item in spec])
+    raise RuleError(f"selection {name!r} must be a mapping, a list of mappings or keywords")
+
+
+# ---------- condition parser ----------
+
+_TOKEN = re.compile(r"\s*(\(|\)|[\w*.-]+)")
+
+Compiled = Tuple[Matcher, Optional[FrozenSet[int]]]
+
+
+def _and(parts: List[Compiled]) -> Compiled:
+    matchers = [m for m, _ in parts]
+    ids = [e for _, e in parts if e is not None]
+    event_ids = frozenset.intersection(*ids) if ids else None
+    if len(matchers) == 1:
+        return parts[0]
+    return (lambda view: all(m(view) for m in matchers)), event_ids
+
+
+def _or(parts: List[Compiled]) -> Compiled:
+    matchers = [m for m, _ in parts]
+    ids = [e for _, e in parts]
+    event_ids = None if None in ids else frozenset().union(*ids)
+    if len(matchers) == 1:
+        return parts[0]
+    return (lambda view: any(m(view) for m in matchers)), event_ids
+
+
+class _ConditionParser:
+    """
+    Recursive descent over:
+
+        expr   := term ("or" term)*
+        term   := factor ("and" factor)*
+        factor := "not" factor | "(" expr ")"
+                | ("1" | "any" | "all") "of" (pattern | "them") | name
+    """
+
+    def __init__(self, text: str, selections: Dict[str, Compiled]) -> None:
+        self.text = text
+        self.selections = selections
+        self.tokens: List[str] = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            match = _TOKEN.match(text, pos)
+            if not match:
+                raise RuleError(f"condition {self.text!r}: unexpected {text[pos:]!r}")
+            self.tokens.append(match.group(1))
+            pos = match.end()
+        self.pos = 0
+
+    def parse(self) -> Compiled:
+        result = self._expr()
+        if self.pos != len(self.tokens):
+            raise RuleError(f"condition {self.text!r}: unexpected {self.tokens[self.pos]!r}")
+        return result
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise RuleError(f"condition {self.text!r}: unexpected end")
+        self.pos += 1
+        return token
+
+    def _expr(self) -> Compiled:
+        parts = [self._term()]
+        while self._peek() == "or":
+            self.pos += 1
+            parts.append(self._term())
+        return _or(parts)
+
+    def _term(self) -> Compiled:
+        parts = [self._factor()]
+        while self._peek() == "and":
+            self.pos += 1
+            parts.append(self._factor())
+        return _and(parts)
+
+    def _factor(self) -> Compiled:
+        token = self._next()
+        if token == "not":
+            matcher, _ = self._factor()
+            return (lambda view: not matcher(view)), None
+        if token == "(":
+            result = self._expr()
+            if self._next() != ")":
+                raise RuleError(f"condition {self.text!r}: missing ')'")
+            return result
+        if token in ("1", "any", "all") and self._peek() == "of":
+            self.pos += 1
+            target = self._next()
+            if target == "them":
+                names = [n for n in self.selections if not n.startswith("_")]
+            else:
+                names = [n for n in self.selections if fnmatch.fnmatchcase(n, target)]
+            if not names:
+                raise RuleError(f"condition {self.text!r}: no selection matches {target!r}")
+            parts = [self.selections[n] for n in names]
+            return _and(parts) if token == "all" else _or(parts)
+        if token in self.selections:
+            return self.selections[token]
+        raise RuleError(f"condition {self.text!r}: unknown selection {token!r}")
+
+
+# ---------- rules ----------
+
+
+@dataclass
+class Rule:
+    """One compiled detection rule."""
+
+    title: str
+    rule_id: str
+    level: str
+    source: str
+    # Logsource service ("sysmon" / "security"), None = both.
+    service: Optional[str]
+    # EventIDs the rule can match, None = any.
+    event_ids: Optional[FrozenSet[int]]
+    matcher: Matcher
+    tags: List[str] = field(default_factory=list)
+
+
+def compile_rule(doc: Dict, source: str = "") -> Rule:
+    """Compile one parsed rule document."""
+    if not isinstance(doc, dict):
+        raise RuleError("a rule must be a mapping")
+    title = str(doc.get("title") or "").strip()
+    if not title:
+        raise RuleError("rule has no title")
+    level = str(doc.get("level") or "medium").lower()
+    if level not in LEVELS:
+        raise RuleError(f"{title}: unknown level {level!r}")
+
+    logsource = doc.get("logsource") or {}
+    service = logsource.get("service")
+    category_ids = None
+    if service is not None and service not in CHANNELS.values():
+        raise RuleError(f"{title}: unsupported logsource service {service!r}")
+    category = logsource.get("category")
+    if category is not None:
+        if category not in CATEGORIES:
+            raise RuleError(f"{title}: unsupported logsource category {category!r}")
+        service, ids = CATEGORIES[category]
+        category_ids = frozenset(ids)
+
+    detection = doc.get("detection")
+    if not isinstance(detection, dict) or "condition" not in detection:
+        raise RuleError(f"{title}: detection needs selections and a condition")
+    try:
+        selections = {
+            str(name): _selection(str(name), spec)
+            for name, spec in detection.items()
+            if name not in ("condition", "timeframe")
+        }
+        condition = detection["condition"]
+        if isinstance(condition, list):
+            condition = " or ".join(f"({c})" for c in condition)
+        matcher, event_ids = _ConditionParser(str(condition), selections).parse()
+    except RuleError as exc:
+        raise RuleError(f"{title}: {exc}") from None
+
+    if category_ids is not None:
+        matcher, event_ids = _and(
+            [(lambda view: _event_id(view) in category_ids, category_ids), (matcher, event_ids)]
+        )
+    return Rule(
+        title=title,
+        rule_id=str(doc.get("id") or title),
+        level=level,
+        source=source,
+        service=service,
+        event_ids=event_ids,
+        matcher=matcher,
+        tags=[str(t) for t in doc.get("tags") or []],
+    )
+
+
+def _event_id(view: _EventView) -> Optional[int]:
+    try:
+        return int(view.event.get("Id"))
+    except (TypeError, ValueError):
+        return None
+
+
+def find_rule_files(paths: Iterable[str]) -> List[Path]:
+    """Rule files among paths; directories are searched recursively."""
+    found: List[Path] = []
+    for p in paths:
+        path = Path(p).expanduser()
+        if path.is_dir():
+            found.extend(sorted(f for f in path.rglob("*") if f.suffix in (".yml", ".yaml")))
+        else:
+            found.append(path)
+    return found
+
+
+def load_rules(paths: Iterable[str], min_level: str = "informational") -> List[Rule]:
+    """Load and compile every rule in paths (files or directories)."""
+    import yaml  # only 'soclog detect' needs it here
+
+    floor = LEVELS.index(min_level)
+    rules = []
+    for path in find_rule_files(paths):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                docs = [d for d in yaml.safe_load_all(f) if d]
+        except (OSError, yaml.YAMLError) as exc:
+            raise RuleError(f"{path}: {exc}") from None
+        for doc in docs:
+            try:
+                rule = compile_rule(doc, str(path))
+            except RuleError as exc:
+                raise RuleError(f"{path}: {exc}") from None
+            if LEVELS.index(rule.level) >= floor:
+                rules.append(rule)
+    return rules
+
+
+class RuleSet:
+    """Rules bucketed by logsource service and EventID."""
+
+    def __init__(self, rules: List[Rule]) -> None:
+        self.rules = rules
+        self._by_id: Dict[str, Dict[int, List[Rule]]] = {}
+        self._any_id: Dict[str, List[Rule]] = {}
+        for service in CHANNELS.values():
+            by_id: Dict[int, List[Rule]] = {}
+            any_id: List[Rule] = []
+            for rule in rules:
+                if rule.service not in (None, service):
+                    continue
+                if rule.event_ids is None:
+                    any_id.append(rule)
+                else:
+                    for event_id in rule.event_ids:
+                        by_id.setdefault(event_id, []).append(rule)
+            self._by_id[service] = by_id
+            self._any_id[service] = any_id
+        self._candidates: Dict[Tuple[str, Optional[int]], List[Rule]] = {}
+
+    def candidates(self, service: str, event_id: Optional[int]) -> List[Rule]:
+        """Rules that can match events with this service and EventID."""
+        key = (service, event_id)
+        try:
+            return self._candidates[key]
+        except KeyError:
+            specific = self._by_id.get(service, {}).get(event_id, [])
+            rules = specific + self._any_id.get(service, [])
+            self._candidates[key] = rules
+            return rules
+
+    def match(self, service: str, event: Dict) -> List[Rule]:
+        """Rules that match one event of the given service."""
+        try:
+            event_id = int(event.get("Id"))
+        except (TypeError, ValueError):
+            event_id = None
+        rules = self.candidates(service, event_id)
+        if not rules:
+            return []
+        view = _EventView(event)
+        return [rule for rule in rules if rule.matcher(view)]
+
+
+# ---------- scanning collections ----------
+
+
+def _service_for(name: str) -> Optional[str]:
+    base = Path(name).name
+    for prefix, service in CHANNELS.items():
+        if base.startswith(prefix + "."):
+            return service
+    return None
+
+
+def _event_artefacts(collection: Path) -> Tuple[str, List[Tuple[str, str]]]:
+    """(host, [(artefact name, service)]) for a run directory or ZIP."""
+    manifest = read_manifest(collection)
+    names = [r.get("relative_path") or r.get("file_name") or "" for r in manifest.get("files", [])]
+    artefacts = []
+    for name in names:
+        service = _service_for(name)
+        if service is None:
+            continue
+        if name.endswith(".columnar") and any(
+            _service_for(other) == service and not other.endswith(".columnar") for other in names
+        ):
+            continue  # columnar copy of an artefact scanned already
+        artefacts.append((name, service))
+    host = manifest.get("host") or collection.parent.name
+    return host, artefacts
+
+
+def alert_record(rule: Rule, event: Dict, host: str, service: str) -> Dict:
+    return {
+        "time_utc": event.get("TimeCreated"),
+        "host": host,
+        "channel": service,
+        "event_id": event.get("Id"),
+        "record_id": event.get("RecordId"),
+        "rule_id": rule.rule_id,
+        "rule": rule.title,
+        "level": rule.level,
+        "tags": rule.tags,
+        "event": event,
+    }
+
+
+def scan_artefact(
+    ruleset: RuleSet, collection: Path, name: str, service: str, host: str
+) -> Tuple[int, List[Dict]]:
+    """Stream one event artefact through the rules; return (events, alerts)."""
+    events = 0
+    alerts: List[Dict] = []
+    match = ruleset.match
+    with open_member(collection, name) as source:
+        for event in iter_events(source, name):
+            # Skip the {"message": "No events ..."} placeholder.
+            if not isinstance(event, dict) or "Id" not in event:
+                continue
+            events += 1
+            for rule in match(service, event):
+                alerts.append(alert_record(rule, event, host, service))
+    return events, alerts
+
+
+# Compiled in each worker process by _init_worker().
+_worker_rules: Optional[RuleSet] = None
+
+
+def _init_worker(rule_paths: List[str], min_level: str) -> None:
+    global _worker_rules
+    _worker_rules = RuleSet(load_rules(rule_paths, min_level))
+
+
+def _scan_task(task: Tuple[str, str, str, str]) -> Tuple[int, List[Dict]]:
+    collection, name, service, host = task
+    return scan_artefact(_worker_rules, Path(collection), name, service, host)
+
+
+@dataclass
+class DetectResult:
+    """Detection outcome for one collection."""
+
+    path: Path
+    host: str = ""
+    events: int = 0
+    alerts: List[Dict] = field(default_factory=list)
+    alerts_path: Optional[Path] = None
+    problems: List[str] = field(default_factory=list)
+
+    def counts_by_rule(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for alert in self.alerts:
+            counts[alert["rule"]] = counts.get(alert["rule"], 0) + 1
+        return counts
+
+
+def alerts_path_for(collection: Path) -> Path:
+    """alerts.ndjson in a run directory, <zip stem>.alerts.ndjson next to a ZIP."""
+    if collection.is_dir():
+        return collection / ALERTS_FILE_NAME
+    return collection.with_name(f"{collection.stem}.{ALERTS_FILE_NAME}")
+
+
+def write_alerts(alerts: List[Dict], path: Path) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for alert in alerts:
+            f.write(json.dumps(alert, separators=(",", ":"), default=str))
+            f.write("\n")
+    tmp.replace(path)
+
+
+def scan_collections(
+    paths: Iterable[str],
+    rule_paths: List[str],
+    min_level: str = "informational",
+    workers: Optional[int] = None,
+    write: bool = True,
+) -> List[DetectResult]:
+    """
+    Run the rules in rule_paths over every collection found under paths.
+
+    Each Sysmon/Security artefact is one task; with workers > 1 tasks run
+    in a process pool. With write, each collection's alerts (possibly
+    none) are written to alerts_path_for(collection). Results are in
+    discovery order; alerts within a collection are in artefact order.
+    Raises RuleError if a rule does not compile.
+    """
+    rule_paths = [str(p) for p in rule_paths]
+    ruleset = RuleSet(load_rules(rule_paths, min_level))  # fail early on bad rules
+
+    results: List[DetectResult] = []
+    tasks: List[Tuple[str, str, str, str]] = []
+    owners: List[DetectResult] = []
+    for collection in find_collections(paths):
+        result = DetectResult(path=collection)
+        results.append(result)
+        try:
+            result.host, artefacts = _event_artefacts(collection)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as exc:
+            result.problems.append(f"cannot read manifest: {exc}")
+            continue
+        for name, service in artefacts:
+            tasks.append((str(collection), name, service, result.host))
+            owners.append(result)
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(tasks)),
+            initializer=_init_worker,
+            initargs=(rule_paths, min_level),
+        )
+        with executor:
+            futures = [executor.submit(_scan_task, task) for task in tasks]
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except (OSError, ValueError, zipfile.BadZipFile) as exc:
+                    outcomes.append(exc)
+    else:
+        outcomes = []
+        for collection, name, service, host in tasks:
+            try:
+                outcomes.append(scan_artefact(ruleset, Path(collection), name, service, host))
+            except (OSError, ValueError, zipfile.BadZipFile) as exc:
+                outcomes.append(exc)
+
+    for task, result, outcome in zip(tasks, owners, outcomes):
+        if isinstance(outcome, BaseException):
+            result.problems.append(f"{task[1]}: {outcome}")
+            continue
+        events, alerts = outcome
+        result.events += events
+        result.alerts.extend(alerts)
+
+    if write:
+        for result in results:
+            if result.problems and not result.events:
+                continue
+            result.alerts_path = alerts_path_for(result.path)
+            try:
+                write_alerts(result.alerts, result.alerts_path)
+            except OSError as exc:
+                result.problems.append(f"cannot write {result.alerts_path.name}: {exc}")
+                result.alerts_path = None
+    return results
+
+
+def iter_alerts(results: Iterable[DetectResult]) -> Iterator[Dict]:
+    for result in results:
+        yield from result.alerts
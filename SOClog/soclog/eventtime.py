@@ -0,0 +1,95 @@
+"""
+Event timestamp helpers.
+
+Collectors export TimeCreated as an ISO 8601 string in UTC (.NET "o"
+format, 7 fractional digits); runs made with older SOClog versions on
+Windows PowerShell 5.1 hold "/Date(<ms>)/" instead. These helpers turn
+either into integers for indexing and columnar storage, and back.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+# ConvertTo-Json on Windows PowerShell 5.1 renders DateTime as /Date(ms)/.
+_MS_DATE = re.compile(r"/Date\((-?\d+)")
+# The 7th fractional digit of a .NET "o" time (100-nanosecond ticks).
+_TICK_DIGIT = re.compile(r"T[\d:]+\.\d{6}(\d)")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def parse_time_us(value) -> Optional[int]:
+    """Return an event timestamp as microseconds since the epoch (UTC)."""
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        # Older runs: TimeCreated serialised as an object with a DateTime.
+        value = value.get("value") or value.get("DateTime")
+        if value is None:
+            return None
+    text = str(value)
+    match = _MS_DATE.search(text)
+    if match:
+        return int(match.group(1)) * 1000
+    return parse_iso_time_us(text)
+
+
+def parse_iso_time_us(text: str) -> Optional[int]:
+    """Parse an ISO 8601 time (naive = UTC) into epoch microseconds."""
+    text = text.strip().replace("Z", "+00:00")
+    # .NET "o" format has 7 fractional digits; Python accepts up to 6.
+    text = re.sub(r"(\.\d{6})\d+", r"\1", text)
+    try:
+        dt = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    delta = dt - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def parse_time_ticks(value) -> Optional[int]:
+    """
+    Return an event timestamp as 100-nanosecond ticks since the epoch
+    (UTC), keeping the 7th fractional digit of .NET "o" times.
+    """
+    us = parse_time_us(value)
+    if us is None:
+        return None
+    match = _TICK_DIGIT.search(value) if isinstance(value, str) else None
+    return us * 10 + (int(match.group(1)) if match else 0)
+
+
+def parse_time(value) -> Optional[int]:
+    """Return an event timestamp as milliseconds since the epoch (UTC)."""
+    us = parse_time_us(value)
+    return None if us is None else us // 1000
+
+
+def parse_iso_time(text: str) -> Optional[int]:
+    """Parse an ISO 8601 time (naive = UTC) into epoch milliseconds."""
+    us = parse_iso_time_us(text)
+    return None if us is None else us // 1000
+
+
+def format_time_us(us: Optional[int]) -> str:
+    """Epoch microseconds -> '2025-11-18T15:06:25.123456Z'."""
+    if us is None:
+        return ""
+    return (_EPOCH + timedelta(microseconds=us)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def format_time_ticks(ticks: Optional[int]) -> str:
+    """Epoch 100-ns ticks -> '2025-11-18T15:06:25.1234567Z' (.NET "o" format)."""
+    if ticks is None:
+        return ""
+    return f"{format_time_us(ticks // 10)[:-1]}{ticks % 10}Z"
+
+
+def format_time(ms: Optional[int]) -> str:
+    """Epoch milliseconds -> '2025-11-18T15:06:25.123Z'."""
+    if ms is None:
+        return ""
+    return format_time_us(ms * 1000)[:-4] + "Z"
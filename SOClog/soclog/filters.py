@@ -0,0 +1,221 @@
+"""
+Server-side event filters.
+
+An EventFilter narrows what Get-WinEvent returns on the endpoint, so
+unwanted events (e.g. 4624/4634/5156 noise in Security) never cross
+WinRM. Filters come from collection profiles in the hosts YAML, from a
+host's own `filters:` block and from CLI flags, merged in that order.
+
+Filters are turned into a structured query (Get-WinEvent -FilterXml):
+
+  - include_ids become <Select> queries. The event log rejects XPath
+    with too many terms, so allowlists are split into Selects of at most
+    MAX_IDS_PER_SELECT IDs each (an ID range "4720-4738" counts as one).
+  - exclude_ids become <Suppress> queries, split the same way.
+  - providers and xpath are added to every Select.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Logs a filter can apply to (keys in YAML / CLI).
+FILTER_LOGS = ("sysmon", "security")
+
+# Terms per Select/Suppress. Get-WinEvent fails with "The specified
+# query is invalid" somewhere above ~22 OR-ed EventIDs.
+MAX_IDS_PER_SELECT = 20
+
+_FILTER_KEYS = ("include_ids", "exclude_ids", "providers", "xpath")
+
+IdRange = Tuple[int, int]
+
+
+def parse_ids(value) -> List[IdRange]:
+    """
+    Parse event IDs from YAML or CLI: 4625, "4624-4634", or a list or
+    comma-separated string of those. Returns (low, high) ranges.
+    """
+    if value is None:
+        return []
+    if isinstance(value, (int, str)):
+        items: Iterable = str(value).split(",")
+    else:
+        items = value
+    ranges: List[IdRange] = []
+    for item in items:
+        text = str(item).strip()
+        if not text:
+            continue
+        low_text, _, high_text = text.partition("-")
+        try:
+            low = int(low_text)
+            high = int(high_text) if high_text else low
+        except ValueError:
+            raise ValueError(f"Invalid event ID {text!r}; expected e.g. 4625 or 4624-4634.")
+        if not 0 <= low <= high <= 65535:
+            raise ValueError(f"Invalid event ID range {text!r}.")
+        ranges.append((low, high))
+    return ranges
+
+
+def _parse_names(value) -> List[str]:
+    if value is None:
+        return []
+    items = value.split(",") if isinstance(value, str) else value
+    names = [str(v).strip() for v in items if str(v).strip()]
+    for name in names:
+        if "'" in name:
+            raise ValueError(f"Provider name {name!r} may not contain a quote.")
+    return names
+
+
+def _id_term(id_range: IdRange) -> str:
+    low, high = id_range
+    if low == high:
+        return f"EventID={low}"
+    return f"(EventID>={low} and EventID<={high})"
+
+
+def _chunks(items: Sequence[str], size: int) -> List[List[str]]:
+    return [list(items[i : i + size]) for i in range(0, len(items), size)]
+
+
+@dataclass
+class EventFilter:
+    """What to keep from one event log. Empty fields mean "no restriction"."""
+
+    include_ids: List[IdRange] = field(default_factory=list)
+    exclude_ids: List[IdRange] = field(default_factory=list)
+    providers: List[str] = field(default_factory=list)
+    # XPath predicate on the event, e.g.
+    # "EventData[Data[@Name='LogonType']='3']". A full Event Viewer
+    # query "*[...]" is accepted too.
+    xpath: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict, where: str = "filter") -> "EventFilter":
+        """Build a filter from a YAML mapping (keys as in _FILTER_KEYS)."""
+        if not isinstance(data, dict):
+            raise ValueError(f"{where}: expected a mapping.")
+        unknown = sorted(set(data) - set(_FILTER_KEYS))
+        if unknown:
+            raise ValueError(
+                f"{where}: unknown key(s) {', '.join(unknown)}; "
+                f"expected {', '.join(_FILTER_KEYS)}."
+            )
+        try:
+            return cls(
+                include_ids=parse_ids(data.get("include_ids")),
+                exclude_ids=parse_ids(data.get("exclude_ids")),
+                providers=_parse_names(data.get("providers")),
+                xpath=_normalise_xpath(data.get("xpath")),
+            )
+        except ValueError as exc:
+            raise ValueError(f"{where}: {exc}") from None
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.include_ids or self.exclude_ids or self.providers or self.xpath)
+
+    def merged(self, override: Optional["EventFilter"]) -> "EventFilter":
+        """Return a copy with every non-empty field of override taking precedence."""
+        if override is None:
+            return self
+        return EventFilter(
+            include_ids=override.include_ids or self.include_ids,
+            exclude_ids=override.exclude_ids or self.exclude_ids,
+            providers=override.providers or self.providers,
+            xpath=override.xpath or self.xpath,
+        )
+
+    def to_dict(self) -> Dict:
+        """Plain form for manifest.json (ranges as "low-high" strings)."""
+
+        def ids(ranges: List[IdRange]) -> List:
+            return [low if low == high else f"{low}-{high}" for low, high in ranges]
+
+        out: Dict = {}
+        if self.include_ids:
+            out["include_ids"] = ids(self.include_ids)
+        if self.exclude_ids:
+            out["exclude_ids"] = ids(self.exclude_ids)
+        if self.providers:
+            out["providers"] = list(self.providers)
+        if self.xpath:
+            out["xpath"] = self.xpath
+        return out
+
+    def query_xml(self, log_name: str, system_clause: str) -> str:
+        """
+        Structured query for Get-WinEvent -FilterXml.
+
+        system_clause is the XPath condition on System that the caller
+        always needs (record range for paging, start time), e.g.
+        "EventRecordID>10 and EventRecordID<=99".
+        """
+        provider = ""
+        if self.providers:
+            names = " or ".join(f"@Name='{p}'" for p in self.providers)
+            provider = f" and Provider[{names}]"
+        extra = f" and ({self.xpath})" if self.xpath else ""
+
+        id_groups = _chunks([_id_term(r) for r in self.include_ids], MAX_IDS_PER_SELECT)
+        selects = [
+            f"*[System[{system_clause}"
+            + (f" and ({' or '.join(group)})" if group else "")
+            + f"{provider}]{extra}]"
+            for group in (id_groups or [[]])
+        ]
+        suppresses = [
+            f"*[System[{' or '.join(group)}]]"
+            for group in _chunks([_id_term(r) for r in self.exclude_ids], MAX_IDS_PER_SELECT)
+        ]
+
+        # xml.sax.saxutils drags in urllib and http.client; load it only
+        # when a filtered query is actually built.
+        from xml.sax.saxutils import escape, quoteattr
+
+        path = quoteattr(log_name)
+        lines = [f"<QueryList><Query Id=\"0\" Path={path}>"]
+        lines += [f"<Select Path={path}>{escape(q)}</Select>" for q in selects]
+        lines += [f"<Suppress Path={path}>{escape(q)}</Suppress>" for q in suppresses]
+        lines.append("</Query></QueryList>")
+        return "\n".join(lines)
+
+
+def _normalise_xpath(value) -> Optional[str]:
+    if value is None:
+        return None
+    text = " ".join(str(value).split())
+    if not text:
+        return None
+    if text.startswith("*[") and text.endswith("]"):
+        text = text[2:-1].strip()
+    return text
+
+
+def parse_filters(data, where: str) -> Dict[str, EventFilter]:
+    """Parse a {sysmon: {...}, security: {...}} mapping."""
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError(f"{where}: expected a mapping of {', '.join(FILTER_LOGS)}.")
+    unknown = sorted(set(data) - set(FILTER_LOGS))
+    if unknown:
+        raise ValueError(
+            f"{where}: unknown log(s) {', '.join(map(str, unknown))}; "
+            f"expected {', '.join(FILTER_LOGS)}."
+        )
+    return {
+        log: EventFilter.from_dict(spec or {}, f"{where}.{log}")
+        for log, spec in data.items()
+    }
+
+
+def merge_filters(*layers: Optional[Dict[str, EventFilter]]) -> Dict[str, EventFilter]:
+    """Merge per-log filter mappings; later layers override earlier ones per field."""
+    merged: Dict[str, EventFilter] = {}
+    for layer in layers:
+        for log, flt in (layer or {}).items():
+            merged[log] = merged[log].merged(flt) if log in merged else flt
+    return {log: flt for log, flt in merged.items() if not flt.is_empty}
@@ -0,0 +1,102 @@
+"""
+Collector-side executable hash cache for --hash-cache.
+
+For every host we remember the SHA-256 of each executable seen in its
+process list, keyed by "path|size|LastWriteTimeUtc ticks" as reported by
+the endpoint. The next run sends the endpoint short digests of the keys
+known for that host; executables whose key matches are not hashed again,
+and the endpoint returns only the key, which is resolved here. Nothing
+on the host under investigation is written or trusted for the cache.
+
+Cached hashes are not recomputed: a binary replaced by one of the same
+size whose timestamp has been forged back keeps reporting the old hash.
+Processes whose hash came from the cache are marked "HashCached": true.
+
+The store is a small JSON file:
+
+{
+  "win10lab": {"C:\\Windows\\System32\\svchost.exe|57360|1339...": "9F86D0..."}
+}
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Union
+
+HASH_CACHE_FILE_NAME = ".soclog_hashcache.json"
+
+# Hex characters of SHA-256(key) sent per known key, and at most how many
+# keys are sent. Together they keep the encoded process script well under
+# the Windows command line limit; keys left out are simply hashed again.
+KEY_DIGEST_CHARS = 12
+MAX_SENT_KEYS = 600
+
+
+def key_digest(key: str) -> str:
+    """Short digest of a cache key, as computed by the process script."""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:KEY_DIGEST_CHARS]
+
+
+def known_digests(known: Dict[str, str]) -> str:
+    """The digests of known keys, concatenated for the process script."""
+    return "".join(key_digest(key) for key in list(known)[:MAX_SENT_KEYS])
+
+
+def resolve_hashes(processes: List[Dict], known: Dict[str, str]) -> Dict[str, str]:
+    """
+    Fill in the hashes the endpoint skipped and drop its HashKey fields.
+
+    Returns the key -> hash entries of this run, the host's new cache: it
+    never grows beyond the executables currently running.
+    """
+    seen: Dict[str, str] = {}
+    for proc in processes:
+        key = proc.pop("HashKey", None)
+        if not key:
+            continue
+        if proc.get("HashSHA256"):
+            proc["HashCached"] = False
+        else:
+            proc["HashSHA256"] = known.get(key)
+            proc["HashCached"] = proc["HashSHA256"] is not None
+        if proc["HashSHA256"]:
+            seen[key] = proc["HashSHA256"]
+    return seen
+
+
+class HashCacheStore:
+    """
+    Thread-safe JSON-backed hash cache, one entry set per host.
+
+    Every update() is written straight to disk (atomically, via a temp
+    file and rename), like the bookmark store.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path).expanduser()
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, str]] = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._data = json.load(f) or {}
+
+    def get(self, host: str) -> Dict[str, str]:
+        """A copy of the cached key -> hash entries for host."""
+        with self._lock:
+            return dict(self._data.get(host, {}))
+
+    def update(self, host: str, entries: Dict[str, str]) -> None:
+        """Replace the entries of host (those seen in its latest run)."""
+        with self._lock:
+            self._data[host] = dict(entries)
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
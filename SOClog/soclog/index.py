@@ -0,0 +1,497 @@
+"""
+Local SQLite index over collected runs.
+
+The indexer walks an output directory (e.g. ~/soclog_output), finds every
+run that has a manifest.json and loads the Sysmon, Security and process
+artefacts listed in it into one SQLite database. Each run is ingested
+once: the "runs" table records what has been indexed, so re-running the
+indexer after new collections only reads the new runs.
+
+Events are stored with the columns investigations filter on (host, time,
+event ID, channel, source IP, user, image) in indexed columns; the rest
+of the event is kept as JSON. The same event collected by overlapping
+runs (same host, channel, RecordId and TimeCreated) is stored once.
+RecordIds start again from 1 when a log is cleared, so the time is part
+of the key: events written after a clear are kept next to the older
+events that share their RecordIds.
+"""
+
+import json
+import re
+import sqlite3
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .artifacts import iter_events
+from .eventtime import parse_time
+from .verify import MANIFEST_NAME, find_collections
+
+INDEX_FILE_NAME = ".soclog_index.sqlite"
+
+# Bump when the schema changes; an index with another version is rebuilt.
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    host TEXT NOT NULL,
+    collected_at TEXT,
+    indexed_at TEXT NOT NULL,
+    events INTEGER NOT NULL DEFAULT 0,
+    processes INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    host TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    record_id INTEGER,
+    event_id INTEGER,
+    ts INTEGER,
+    level TEXT,
+    provider TEXT,
+    machine TEXT,
+    ip TEXT,
+    user TEXT,
+    image TEXT,
+    message TEXT,
+    data TEXT,
+    UNIQUE (host, channel, record_id, ts)
+);
+CREATE INDEX IF NOT EXISTS events_host_ts ON events (host, ts);
+CREATE INDEX IF NOT EXISTS events_event_ts ON events (event_id, ts);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_ip ON events (ip) WHERE ip IS NOT NULL;
+CREATE INDEX IF NOT EXISTS events_user ON events (user COLLATE NOCASE) WHERE user IS NOT NULL;
+CREATE TABLE IF NOT EXISTS processes (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    host TEXT NOT NULL,
+    collected_at TEXT,
+    pid INTEGER,
+    name TEXT,
+    path TEXT,
+    user TEXT,
+    sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS processes_sha256 ON processes (sha256);
+CREATE INDEX IF NOT EXISTS processes_name ON processes (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS processes_host ON processes (host, collected_at);
+"""
+
+# Artefact file name prefix -> channel stored in events.channel.
+CHANNELS = {"sysmon_events": "sysmon", "security_events": "security"}
+
+# EventData names (structured mode) holding the key fields, in order of
+# preference.
+_IP_FIELDS = ("IpAddress", "SourceIp", "SourceAddress", "ClientAddress", "DestinationIp")
+_USER_FIELDS = ("TargetUserName", "User", "SubjectUserName")
+_IMAGE_FIELDS = ("Image", "NewProcessName", "ProcessName", "Application")
+
+# The same fields in the rendered Message text (message mode).
+_IP_MESSAGE = re.compile(r"^\s*(?:Source Network Address|Source Address|SourceIp):\s*(\S+)", re.M)
+_USER_MESSAGE = re.compile(r"^\s*(?:Account Name|User):\s*(\S.*?)\s*$", re.M)
+_IMAGE_MESSAGE = re.compile(r"^\s*(?:New Process Name|Process Name|Image|Application Name):\s*(\S.*?)\s*$", re.M)
+
+_EMPTY_VALUES = ("", "-", "::1", "127.0.0.1")
+
+
+def _first(data: Dict, names: Sequence[str]) -> Optional[str]:
+    for name in names:
+        value = data.get(name)
+        if value is not None and str(value).strip() not in _EMPTY_VALUES:
+            return str(value)
+    return None
+
+
+def _from_message(message: str, pattern: "re.Pattern", last: bool = False) -> Optional[str]:
+    values = [v for v in pattern.findall(message) if v.strip() not in _EMPTY_VALUES]
+    if not values:
+        return None
+    # 4624/4625 list the subject account first and the target last.
+    return values[-1] if last else values[0]
+
+
+def key_fields(event: Dict) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """Extract (source IP, user, image) from an event's EventData or Message."""
+    data = event.get("EventData")
+    message = event.get("Message") or ""
+    ip = user = image = None
+    if isinstance(data, dict):
+        ip = _first(data, _IP_FIELDS)
+        user = _first(data, _USER_FIELDS)
+        image = _first(data, _IMAGE_FIELDS)
+    if message:
+        ip = ip or _from_message(message, _IP_MESSAGE)
+        user = user or _from_message(message, _USER_MESSAGE, last=True)
+        image = image or _from_message(message, _IMAGE_MESSAGE)
+    return ip, user, image
+
+
+def _int_or_none(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _channel_for(name: str) -> Optional[str]:
+    base = Path(name).name
+    for prefix, channel in CHANNELS.items():
+        if base.startswith(prefix + "."):
+            return channel
+    if base.startswith("processes."):
+        return "processes"
+    return None
+
+
+@dataclass
+class IndexStats:
+    """What one indexer pass did."""
+
+    runs_indexed: int = 0
+    runs_skipped: int = 0
+    events: int = 0
+    processes: int = 0
+    problems: List[str] = field(default_factory=list)
+
+
+class EventIndex:
+    """
+    SQLite event index.
+
+    Usable as a context manager; close() commits and closes the database.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = str(Path(db_path).expanduser())
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._ensure_schema()
+
+    def __enter__(self) -> "EventIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+    def _ensure_schema(self) -> None:
+        version = None
+        try:
+            row = self.conn.execute(
+                "SELECT value FROM meta WHERE key = 'schema_version'"
+            ).fetchone()
+            version = int(row[0]) if row else None
+        except sqlite3.OperationalError:
+            pass
+        if version is not None and version != SCHEMA_VERSION:
+            for table in ("events", "processes", "runs", "meta"):
+                self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+        self.conn.executescript(_SCHEMA)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+            (str(SCHEMA_VERSION),),
+        )
+        self.conn.commit()
+
+    def indexed_paths(self) -> set:
+        return {row[0] for row in self.conn.execute("SELECT path FROM runs")}
+
+    # ---------- ingest ----------
+
+    def update(self, roots: Iterable[str]) -> IndexStats:
+        """
+        Index every run under roots that is not in the index yet.
+
+        Runs that cannot be read (e.g. a ZIP still being written) are
+        reported in stats.problems and retried on the next update.
+        """
+        stats = IndexStats()
+        known = self.indexed_paths()
+        for collection in find_collections(roots):
+            key = str(collection.resolve())
+            if key in known:
+                stats.runs_skipped += 1
+                continue
+            try:
+                events, processes = self._ingest(collection, key)
+            except (OSError, ValueError, zipfile.BadZipFile) as exc:
+                self.conn.rollback()
+                stats.problems.append(f"{collection}: {exc}")
+                continue
+            self.conn.commit()
+            known.add(key)
+            stats.runs_indexed += 1
+            stats.events += events
+            stats.processes += processes
+        return stats
+
+    def _ingest(self, collection: Path, key: str) -> Tuple[int, int]:
+        zf = None
+        try:
+            if collection.is_dir():
+                base_dir: Optional[Path] = collection
+                zips = sorted(collection.glob("soclog_*.zip"))
+                manifest_path = collection / MANIFEST_NAME
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+                if zips:
+                    zf = zipfile.ZipFile(zips[0])
+            else:
+                base_dir = None
+                zf = zipfile.ZipFile(collection)
+                with zf.open(MANIFEST_NAME) as f:
+                    manifest = json.load(f)
+
+            host = manifest.get("host") or collection.parent.name
+            collected_at = manifest.get("generated_at_utc")
+            cur = self.conn.execute(
+                "INSERT INTO runs (path, host, collected_at, indexed_at) VALUES (?, ?, ?, ?)",
+                (key, host, collected_at, datetime.now(timezone.utc).isoformat()),
+            )
+            run_id = cur.lastrowid
+
+            events = processes = 0
+            names = [r.get("relative_path") or r.get("file_name") or "" for r in manifest.get("files", [])]
+            for name in names:
+                channel = _channel_for(name)
+                if channel is None:
+                    continue
+                if name.endswith(".columnar") and any(
+                    _channel_for(other) == channel and not other.endswith(".columnar")
+                    for other in names
+                ):
+                    # Columnar copy of an event file indexed already.
+                    continue
+                if base_dir is not None and (base_dir / name).is_file():
+                    source = open(base_dir / name, "rb")
+                elif zf is not None and name in zf.namelist():
+                    source = zf.open(name)
+                else:
+                    raise OSError(f"{name} listed in manifest but not found")
+                with source:
+                    items = iter_events(source, name)
+                    if channel == "processes":
+                        processes += self._insert_processes(run_id, host, collected_at, items)
+                    else:
+                        events += self._insert_events(run_id, host, channel, items)
+
+            self.conn.execute(
+                "UPDATE runs SET events = ?, processes = ? WHERE id = ?",
+                (events, processes, run_id),
+            )
+            return events, processes
+        finally:
+            if zf is not None:
+                zf.close()
+
+    def _insert_events(self, run_id: int, host: str, channel: str, items: Iterator) -> int:
+        def rows():
+            for event in items:
+                # Skip the {"message": "No events ..."} placeholder.
+                if not isinstance(event, dict) or "Id" not in event:
+                    continue
+                ip, user, image = key_fields(event)
+                data = event.get("EventData")
+                yield (
+                    run_id,
+                    host,
+                    channel,
+                    _int_or_none(event.get("RecordId")),
+                    _int_or_none(event.get("Id")),
+                    parse_time(event.get("TimeCreated")),
+                    event.get("LevelDisplayName"),
+                    event.get("ProviderName"),
+                    event.get("MachineName"),
+                    ip,
+                    user,
+                    image,
+                    event.get("Message"),
+                    json.dumps(data, separators=(",", ":")) if data is not None else None,
+                )
+
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO events (run_id, host, channel, record_id, event_id, ts, "
+            "level, provider, machine, ip, user, image, message, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows(),
+        )
+        return self.conn.total_changes - before
+
+    def _insert_processes(
+        self, run_id: int, host: str, collected_at: Optional[str], items: Iterator
+    ) -> int:
+        def rows():
+            for doc in items:
+                procs = doc.get("processes", []) if isinstance(doc, dict) else [doc]
+                if isinstance(procs, dict):
+                    procs = [procs]
+                for p in procs:
+                    if not isinstance(p, dict):
+                        continue
+                    yield (
+                        run_id,
+                        host,
+                        collected_at,
+                        _int_or_none(p.get("PID")),
+                        p.get("Name"),
+                        p.get("Path"),
+                        p.get("User"),
+                        (p.get("HashSHA256") or "").lower() or None,
+                    )
+
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT INTO processes (run_id, host, collected_at, pid, name, path, user, sha256) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows(),
+        )
+        return self.conn.total_changes - before
+
+    # ---------- query ----------
+
+    def query_events(
+        self,
+        hosts: Sequence[str] = (),
+        event_ids: Sequence[int] = (),
+        channels: Sequence[str] = (),
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        ip: Optional[str] = None,
+        user: Optional[str] = None,
+        image: Optional[str] = None,
+        text: Optional[str] = None,
+        limit: Optional[int] = 100,
+    ) -> List[sqlite3.Row]:
+        """
+        Return matching events, newest first.
+
+        since/until are epoch milliseconds. image and text are
+        case-insensitive substring matches; the rest are exact.
+        """
+        where, params = self._event_filters(
+            hosts, event_ids, channels, since, until, ip, user, image, text
+        )
+        sql = (
+            "SELECT host, channel, record_id, event_id, ts, level, provider, machine, "
+            "ip, user, image, message, data FROM events"
+            + where
+            + " ORDER BY ts DESC"
+        )
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self.conn.execute(sql, params).fetchall()
+
+    def count_events(self, group_by: Optional[str] = None, **filters) -> List[Tuple]:
+        """Count matching events, optionally per host, event_id, ip, user or channel."""
+        where, params = self._event_filters(**filters)
+        if group_by is None:
+            return [(None, self.conn.execute("SELECT COUNT(*) FROM events" + where, params).fetchone()[0])]
+        if group_by not in ("host", "event_id", "ip", "user", "channel", "image"):
+            raise ValueError(f"Cannot group by {group_by!r}.")
+        sql = (
+            f"SELECT {group_by}, COUNT(*) AS n FROM events{where} "
+            f"GROUP BY {group_by} ORDER BY n DESC"
+        )
+        return [tuple(row) for row in self.conn.execute(sql, params)]
+
+    @staticmethod
+    def _event_filters(
+        hosts: Sequence[str] = (),
+        event_ids: Sequence[int] = (),
+        channels: Sequence[str] = (),
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        ip: Optional[str] = None,
+        user: Optional[str] = None,
+        image: Optional[str] = None,
+        text: Optional[str] = None,
+    ) -> Tuple[str, List]:
+        clauses: List[str] = []
+        params: List = []
+
+        def any_of(column: str, values: Sequence) -> None:
+            clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+
+        if hosts:
+            any_of("host", list(hosts))
+        if event_ids:
+            any_of("event_id", list(event_ids))
+        if channels:
+            any_of("channel", list(channels))
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        if ip:
+            clauses.append("ip = ?")
+            params.append(ip)
+        if user:
+            clauses.append("user = ? COLLATE NOCASE")
+            params.append(user)
+        if image:
+            clauses.append("image LIKE ?")
+            params.append(f"%{image}%")
+        if text:
+            clauses.append("(message LIKE ? OR data LIKE ?)")
+            params.extend([f"%{text}%", f"%{text}%"])
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return where, params
+
+    def query_processes(
+        self,
+        hosts: Sequence[str] = (),
+        name: Optional[str] = None,
+        sha256: Optional[str] = None,
+        path: Optional[str] = None,
+        limit: Optional[int] = 100,
+    ) -> List[sqlite3.Row]:
+        """Return process snapshot rows, newest collection first."""
+        clauses: List[str] = []
+        params: List = []
+        if hosts:
+            clauses.append(f"host IN ({', '.join('?' for _ in hosts)})")
+            params.extend(hosts)
+        if name:
+            clauses.append("name = ? COLLATE NOCASE")
+            params.append(name)
+        if sha256:
+            clauses.append("sha256 = ?")
+            params.append(sha256.lower())
+        if path:
+            clauses.append("path LIKE ?")
+            params.append(f"%{path}%")
+        sql = "SELECT host, collected_at, pid, name, path, user, sha256 FROM processes"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY collected_at DESC, host, pid"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self.conn.execute(sql, params).fetchall()
+
+
+def default_index_path(output_dir: str) -> str:
+    return str(Path(output_dir).expanduser() / INDEX_FILE_NAME)
+
+
+def update_index(roots: Iterable[str], db_path: str) -> IndexStats:
+    """Open (or create) the index at db_path and ingest new runs under roots."""
+    with EventIndex(db_path) as index:
+        return index.update(roots)
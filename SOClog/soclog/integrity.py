@@ -1,20 +1,78 @@
 import hashlib
 import json
+import mmap
 import os
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import List, Dict, Optional
+from typing import BinaryIO, Iterable, List, Dict, Optional
 
+# Read buffer for hashing. 1 MiB keeps syscall overhead negligible
+# (the old 8 KiB reads dominated on multi-GB files).
+HASH_BUFFER_SIZE = 1024 * 1024
 
-def sha256_file(path: str) -> str:
-    """Compute SHA-256 hash of a file on disk."""
+# Files at least this large are hashed through mmap instead of read().
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+
+def default_hash_workers() -> int:
+    """Thread count for hashing several files at once."""
+    return min(8, os.cpu_count() or 1)
+
+
+def sha256_stream(f: BinaryIO) -> str:
+    """Compute SHA-256 of a binary stream, reading it to the end."""
     h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
+    buf = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buf)
+    readinto = getattr(f, "readinto", None)
+    if readinto is None:
+        for chunk in iter(lambda: f.read(HASH_BUFFER_SIZE), b""):
             h.update(chunk)
+        return h.hexdigest()
+    while True:
+        n = readinto(buf)
+        if not n:
+            break
+        h.update(view[:n])
     return h.hexdigest()
 
 
+def sha256_file(path: str) -> str:
+    """
+    Compute SHA-256 hash of a file on disk.
+
+    Large files are memory-mapped and hashed in slices; hashlib releases
+    the GIL while hashing, so several files can be hashed in parallel
+    threads (see sha256_files()).
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            return sha256_stream(f)
+        h = hashlib.sha256()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for offset in range(0, size, 16 * HASH_BUFFER_SIZE):
+                    h.update(view[offset:offset + 16 * HASH_BUFFER_SIZE])
+            finally:
+                view.release()
+        return h.hexdigest()
+
+
+def sha256_files(paths: Iterable[str], workers: Optional[int] = None) -> Dict[str, str]:
+    """Hash several files concurrently. Returns {path: sha256 hex}."""
+    paths = list(paths)
+    workers = workers or default_hash_workers()
+    if workers <= 1 or len(paths) <= 1:
+        return {path: sha256_file(path) for path in paths}
+    with ThreadPoolExecutor(
+        max_workers=min(workers, len(paths)), thread_name_prefix="soclog-hash"
+    ) as pool:
+        return dict(zip(paths, pool.map(sha256_file, paths)))
+
+
 def build_manifest(
     files: List[str],
     host: str,
@@ -29,6 +87,7 @@ def build_manifest(
     if collection_time is None:
         collection_time = datetime.now(timezone.utc)
 
+    hashes = sha256_files(files)
     records = []
     for path in files:
         stat = os.stat(path)
@@ -37,13 +96,28 @@ def build_manifest(
                 "file_name": os.path.basename(path),
                 "relative_path": os.path.basename(path),
                 "size_bytes": stat.st_size,
-                "sha256": sha256_file(path),
+                "sha256": hashes[path],
                 "mtime_utc": datetime.fromtimestamp(
                     stat.st_mtime, tz=timezone.utc
                 ).isoformat(),
             }
         )
 
+    return build_manifest_from_records(records, host, collection_time)
+
+
+def build_manifest_from_records(
+    records: List[Dict],
+    host: str,
+    collection_time: Optional[datetime] = None,
+) -> Dict:
+    """
+    Build a manifest from file records that were computed while the
+    files were written (see archive.ArtifactSink), without re-reading them.
+    """
+    if collection_time is None:
+        collection_time = datetime.now(timezone.utc)
+
     manifest = {
         "host": host,
         "generated_at_utc": collection_time.isoformat(),
@@ -0,0 +1,244 @@
+"""
+Sweep-level signing: one GPG signature over a Merkle root.
+
+Instead of running gpg once per host, a sweep builds a Merkle tree over
+the SHA-256 of every host's manifest.json and signs only the root, so
+signing costs one gpg call (and one key unlock) however large the fleet.
+
+Output of a sweep, under --output-dir:
+
+  soclog_sweep_<ts>.json       every leaf (host, manifest path, hash)
+                               and the root, for auditing the sweep
+  soclog_sweep_<ts>.root.json  the root statement that is signed
+  soclog_sweep_<ts>.root.sig   detached, ASCII-armoured signature
+
+and next to each host's manifest.json a manifest.proof.json holding the
+inclusion proof (sibling hashes from leaf to root) together with a copy
+of the root statement and its signature. The proof is also appended to
+the host's ZIP, so a single host's run directory or ZIP can be checked
+on its own with 'soclog verify', without the other hosts' files.
+
+Hashing follows RFC 6962: leaves are sha256(0x00 || manifest sha256),
+inner nodes sha256(0x01 || left || right), and a node without a sibling
+is promoted to the next level unchanged (never paired with itself).
+Leaves are ordered by host name so the tree is reproducible.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .integrity import sha256_file, sign_manifest_with_gpg
+
+PROOF_NAME = "manifest.proof.json"
+SWEEP_PREFIX = "soclog_sweep_"
+ROOT_FORMAT = "soclog-merkle-root/1"
+
+
+def leaf_hash(manifest_sha256: str) -> bytes:
+    return hashlib.sha256(b"\x00" + bytes.fromhex(manifest_sha256)).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def build_levels(leaves: List[bytes]) -> List[List[bytes]]:
+    """All tree levels, leaves first and the root level (one node) last."""
+    if not leaves:
+        raise ValueError("A Merkle tree needs at least one leaf.")
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        below = levels[-1]
+        level = [node_hash(below[i], below[i + 1]) for i in range(0, len(below) - 1, 2)]
+        if len(below) % 2:
+            level.append(below[-1])
+        levels.append(level)
+    return levels
+
+
+def inclusion_proof(levels: List[List[bytes]], index: int) -> List[Tuple[str, str]]:
+    """
+    Sibling hashes from leaf `index` up to the root, as (side, hex)
+    pairs; side says whether the sibling is on the "left" or "right".
+    """
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            side = "left" if sibling < index else "right"
+            proof.append((side, level[sibling].hex()))
+        index //= 2
+    return proof
+
+
+def root_from_proof(leaf: bytes, proof: List[Tuple[str, str]]) -> bytes:
+    node = leaf
+    for side, sibling_hex in proof:
+        sibling = bytes.fromhex(sibling_hex)
+        if side == "left":
+            node = node_hash(sibling, node)
+        elif side == "right":
+            node = node_hash(node, sibling)
+        else:
+            raise ValueError(f"invalid proof step side {side!r}")
+    return node
+
+
+@dataclass
+class SweepSignature:
+    """Files written by sign_sweep()."""
+
+    sweep_path: Path
+    root: str
+    leaves: int
+    signature_path: Optional[Path] = None
+    # Host name -> manifest.proof.json written for it.
+    proofs: Dict[str, Path] = field(default_factory=dict)
+
+
+def _write_json(path: Path, data: Dict) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    tmp.replace(path)
+
+
+def sign_sweep(
+    results: List,
+    output_dir: str,
+    gpg_key: Optional[str] = None,
+    sign: bool = True,
+) -> Optional[SweepSignature]:
+    """
+    Build the Merkle tree over the manifests of a sweep, sign the root
+    once and write every host's inclusion proof, next to its manifest
+    and into its ZIP.
+
+    results are pipeline.HostResult objects; hosts without a
+    manifest.json (failed or skipped) are left out. Returns None when no
+    host produced a manifest. With sign=False the root is written but not
+    signed. gpg failures propagate (subprocess.CalledProcessError,
+    FileNotFoundError) after the unsigned sweep file has been written.
+    """
+    manifests = sorted(
+        (r.name, r.out_dir / "manifest.json")
+        for r in results
+        if r.out_dir is not None and (r.out_dir / "manifest.json").is_file()
+    )
+    if not manifests:
+        return None
+    zips = {r.name: r.zip_path for r in results if r.zip_path is not None}
+
+    base = Path(output_dir).expanduser().resolve()
+    generated = datetime.now(timezone.utc)
+    stem = f"{SWEEP_PREFIX}{generated.strftime('%Y%m%d_%H%M%S')}"
+    digests = [sha256_file(str(path)) for _, path in manifests]
+    levels = build_levels([leaf_hash(d) for d in digests])
+    root = levels[-1][0].hex()
+
+    statement = {
+        "format": ROOT_FORMAT,
+        "root": root,
+        "leaves": len(manifests),
+        "generated_at_utc": generated.isoformat(),
+    }
+    statement_text = json.dumps(statement, sort_keys=True) + "\n"
+    statement_path = base / f"{stem}.root.json"
+    sweep = SweepSignature(sweep_path=base / f"{stem}.json", root=root, leaves=len(manifests))
+
+    base.mkdir(parents=True, exist_ok=True)
+    # Bytes, not text mode: gpg signs exactly what the proofs carry.
+    statement_path.write_bytes(statement_text.encode("utf-8"))
+    _write_json(
+        sweep.sweep_path,
+        {
+            **statement,
+            "leaf_hashing": "sha256(0x00 || manifest sha256)",
+            "hosts": [
+                {
+                    "name": name,
+                    "manifest": os.path.relpath(path, base),
+                    "manifest_sha256": digest,
+                }
+                for (name, path), digest in zip(manifests, digests)
+            ],
+        },
+    )
+
+    signature_text = None
+    if sign:
+        sig_path = base / f"{stem}.root.sig"
+        sign_manifest_with_gpg(str(statement_path), str(sig_path), gpg_key=gpg_key)
+        sweep.signature_path = sig_path
+        signature_text = sig_path.read_text(encoding="utf-8")
+
+    for index, ((name, path), digest) in enumerate(zip(manifests, digests)):
+        proof_path = path.parent / PROOF_NAME
+        _write_json(
+            proof_path,
+            {
+                "format": ROOT_FORMAT,
+                "host": name,
+                "sweep": sweep.sweep_path.name,
+                "manifest_sha256": digest,
+                "index": index,
+                "path": [{"side": side, "hash": h} for side, h in inclusion_proof(levels, index)],
+                "root": root,
+                "root_statement": statement_text,
+                "root_signature": signature_text,
+            },
+        )
+        if name in zips and zips[name].is_file():
+            # Appended after the ZIP was closed; manifest.json does not
+            # list it, so the manifest hash the proof is built on holds.
+            with zipfile.ZipFile(zips[name], "a") as zf:
+                zf.write(proof_path, PROOF_NAME)
+        sweep.proofs[name] = proof_path
+    return sweep
+
+
+def check_proof(proof: Dict, manifest_sha256: str) -> Optional[str]:
+    """
+    Check an inclusion proof against the hash of the manifest it sits
+    next to. Returns a problem description, or None if the proof holds.
+    The root statement's signature is not checked here (see
+    verify_statement_signature()).
+    """
+    try:
+        if str(proof.get("manifest_sha256", "")).lower() != manifest_sha256:
+            return "manifest.json does not match its Merkle proof (changed after the sweep)"
+        statement = json.loads(proof["root_statement"])
+        if statement.get("format") != ROOT_FORMAT or statement.get("root") != proof["root"]:
+            return "Merkle proof root differs from its root statement"
+        steps = [(step["side"], step["hash"]) for step in proof["path"]]
+        if root_from_proof(leaf_hash(manifest_sha256), steps).hex() != proof["root"]:
+            return "Merkle proof does not lead to the signed root"
+    except (KeyError, TypeError, ValueError) as exc:
+        return f"unreadable Merkle proof ({exc})"
+    return None
+
+
+def verify_statement_signature(proof: Dict, check) -> Optional[str]:
+    """
+    Verify the root statement copied into a proof against its signature.
+
+    check is a callable (statement path, signature path) -> status, such
+    as verify._check_signature. Returns None if the proof carries no
+    signature.
+    """
+    signature = proof.get("root_signature")
+    if not signature:
+        return None
+    with tempfile.TemporaryDirectory(prefix="soclog-proof-") as tmp:
+        statement_path = Path(tmp) / "root.json"
+        signature_path = Path(tmp) / "root.sig"
+        statement_path.write_bytes(proof["root_statement"].encode("utf-8"))
+        signature_path.write_text(signature, encoding="utf-8")
+        return check(statement_path, signature_path)
@@ -0,0 +1,221 @@
+"""
+Per-host, per-stage performance metrics.
+
+HostMetrics collects, for every stage of a host's collection, the wall
+time and where it went:
+
+  winrm_s / winrm_commands / winrm_bytes   remote round trips and bytes received
+  parse_s                                  decoding collector output (JSON)
+  write_s                                  writing artefacts (hashing, disk, ZIP)
+  events / bytes_written                   what the stage produced
+
+Code deep in the pipeline (the WinRM client, the collectors, the
+artefact sink) reports through the module-level record() function,
+which adds to whichever stage is active on the calling thread, so none
+of it needs a metrics object passed in. With no active stage, record()
+does nothing.
+
+Metrics are written to metrics.json in each run directory, and for a
+whole sweep optionally to a Prometheus textfile for node_exporter's
+textfile collector.
+"""
+
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+METRICS_FILE_NAME = "metrics.json"
+
+# Counters kept per stage, in output order.
+COUNTERS = (
+    "winrm_s",
+    "winrm_commands",
+    "winrm_bytes",
+    "parse_s",
+    "write_s",
+    "events",
+    "bytes_written",
+)
+
+_active = threading.local()
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def record(**counters: float) -> None:
+    """Add to the counters of the stage active on this thread, if any."""
+    metrics = getattr(_active, "metrics", None)
+    if metrics is not None:
+        metrics.add(_active.stage, **counters)
+
+
+def active_stage() -> Tuple[Optional["HostMetrics"], Optional[str]]:
+    """The (metrics, stage) record() reports to on this thread."""
+    return getattr(_active, "metrics", None), getattr(_active, "stage", None)
+
+
+@contextmanager
+def reporting_to(state: Tuple[Optional["HostMetrics"], Optional[str]]) -> Iterator[None]:
+    """
+    Attribute record() calls on this thread to state (from
+    active_stage() on another thread), without timing a stage: for
+    helper threads doing part of a stage's work.
+    """
+    previous = active_stage()
+    _active.metrics, _active.stage = state
+    try:
+        yield
+    finally:
+        _active.metrics, _active.stage = previous
+
+
+class HostMetrics:
+    """Thread-safe metrics for one host's collection."""
+
+    def __init__(self, host: str, address: str = "") -> None:
+        self.host = host
+        self.address = address
+        self.started_utc = datetime.now(timezone.utc).isoformat()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _stage(self, name: str) -> Dict[str, float]:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {"wall_s": 0.0, **{c: 0 for c in COUNTERS}}
+        return stage
+
+    def add(self, stage: str, **counters: float) -> None:
+        with self._lock:
+            values = self._stage(stage)
+            for key, value in counters.items():
+                values[key] = values.get(key, 0) + value
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Time a stage on the current thread; record() calls made inside
+        are attributed to it. Stages may run on several threads at once.
+        """
+        previous = (getattr(_active, "metrics", None), getattr(_active, "stage", None))
+        _active.metrics, _active.stage = self, name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            _active.metrics, _active.stage = previous
+            with self._lock:
+                values = self._stage(name)
+                values["wall_s"] += elapsed
+                values["peak_rss_bytes"] = peak_rss_bytes()
+
+    def totals(self) -> Dict[str, float]:
+        with self._lock:
+            totals = {c: sum(s.get(c, 0) for s in self.stages.values()) for c in COUNTERS}
+            totals["peak_rss_bytes"] = max(
+                (s.get("peak_rss_bytes", 0) for s in self.stages.values()), default=0
+            )
+        return totals
+
+    def to_dict(self, status: str = "", elapsed: float = 0.0) -> Dict:
+        with self._lock:
+            stages = {
+                name: {k: round(v, 4) if isinstance(v, float) else v for k, v in values.items()}
+                for name, values in self.stages.items()
+            }
+        totals = self.totals()
+        return {
+            "host": self.host,
+            "address": self.address,
+            "status": status,
+            "started_utc": self.started_utc,
+            "elapsed_s": round(elapsed, 4),
+            # Stages 2-4 run concurrently, so their wall times can add up
+            # to more than elapsed_s. Peak RSS is for the whole process.
+            "stages": stages,
+            "totals": {k: round(v, 4) if isinstance(v, float) else v for k, v in totals.items()},
+        }
+
+
+def write_metrics_json(metrics: HostMetrics, out_dir: Path, status: str, elapsed: float) -> Path:
+    path = Path(out_dir) / METRICS_FILE_NAME
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(metrics.to_dict(status, elapsed), f, indent=2)
+    return path
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# (metric name, per-stage counter, help text)
+_STAGE_SERIES = (
+    ("soclog_stage_duration_seconds", "wall_s", "Wall time of a collection stage."),
+    ("soclog_stage_winrm_seconds", "winrm_s", "Time spent waiting on WinRM commands."),
+    ("soclog_stage_winrm_commands", "winrm_commands", "WinRM commands run."),
+    ("soclog_stage_winrm_received_bytes", "winrm_bytes", "Bytes received over WinRM."),
+    ("soclog_stage_parse_seconds", "parse_s", "Time spent decoding collector output."),
+    ("soclog_stage_write_seconds", "write_s", "Time spent writing, hashing and zipping artefacts."),
+    ("soclog_stage_events", "events", "Events (or processes) collected."),
+    ("soclog_stage_written_bytes", "bytes_written", "Artefact bytes written."),
+)
+
+
+def write_prometheus_textfile(results: List, path: str) -> None:
+    """
+    Write the metrics of a whole sweep in the Prometheus text format.
+
+    results are pipeline.HostResult objects. The file is written to a
+    temporary name and renamed, as node_exporter's textfile collector
+    expects.
+    """
+    lines: List[str] = []
+    with_metrics = [r for r in results if getattr(r, "metrics", None) is not None]
+
+    for metric, key, help_text in _STAGE_SERIES:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for r in with_metrics:
+            for stage, values in sorted(r.metrics.stages.items()):
+                value = round(values.get(key, 0), 6)
+                lines.append(
+                    f'{metric}{{host="{_label(r.name)}",stage="{_label(stage)}"}} {value}'
+                )
+
+    lines.append("# HELP soclog_host_duration_seconds Wall time of a host's collection.")
+    lines.append("# TYPE soclog_host_duration_seconds gauge")
+    for r in results:
+        lines.append(f'soclog_host_duration_seconds{{host="{_label(r.name)}"}} {round(r.elapsed, 4)}')
+
+    lines.append("# HELP soclog_host_status Outcome of the last collection (1 = this status).")
+    lines.append("# TYPE soclog_host_status gauge")
+    for r in results:
+        for status in ("ok", "partial", "failed", "skipped"):
+            value = 1 if r.status == status else 0
+            lines.append(f'soclog_host_status{{host="{_label(r.name)}",status="{status}"}} {value}')
+
+    lines.append("# HELP soclog_peak_rss_bytes Peak resident memory of the collector process.")
+    lines.append("# TYPE soclog_peak_rss_bytes gauge")
+    lines.append(f"soclog_peak_rss_bytes {peak_rss_bytes()}")
+    lines.append("# HELP soclog_last_run_timestamp_seconds When the sweep finished.")
+    lines.append("# TYPE soclog_last_run_timestamp_seconds gauge")
+    lines.append(f"soclog_last_run_timestamp_seconds {int(time.time())}")
+
+    target = Path(path).expanduser()
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, target)
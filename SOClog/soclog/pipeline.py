@@ -0,0 +1,507 @@
+"""
+Per-host collection pipeline and the multi-host worker pool.
+
+collect_host() runs the full connect / Sysmon / Security / processes /
+manifest / ZIP sequence for one host (the three collectors run
+concurrently over a ShellPool) and never raises: every failure is
+recorded on the returned HostResult. run_collection() fans a list of
+hosts out over a thread pool; each host writes only into its own
+output directory, so workers never share files.
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from .archive import ArtifactSink
+from .artifacts import artifact_file_name, open_event_writer
+from .bookmarks import Bookmark, BookmarkStore, latest_record
+from .collectors import (
+    DEFAULT_PAGE_SIZE,
+    SECURITY_LOG,
+    SYSMON_LOG,
+    collect_processes,
+    open_event_pages,
+    status_message,
+)
+from .config import HostConfig
+from .filters import EventFilter, merge_filters
+from .hashcache import HashCacheStore
+from .integrity import (
+    build_manifest_from_records,
+    write_manifest,
+    sign_manifest_with_gpg,
+)
+from .defaults import DEFAULT_SLICE_HOURS
+from .metrics import HostMetrics, record, write_metrics_json
+from .progress import BOLD, MAGENTA, RESET, ProgressReporter
+from .scheduler import DEFAULT_MAX_SHELLS, ShellPool, run_concurrently
+from .windows_remote import DEFAULT_RETRIES, WindowsRemote, WindowsRemoteError
+
+
+@dataclass
+class CollectOptions:
+    """Run-wide settings shared by every host in a sweep."""
+
+    output_dir: str
+    hours: Optional[int] = None
+    days: Optional[int] = None
+    sign_manifest: bool = False
+    gpg_key: Optional[str] = None
+    # With sign_manifest: leave signing to merkle.sign_sweep() after the
+    # sweep (one signature for all hosts) instead of one gpg run per host.
+    sweep_signing: bool = False
+    max_shells: int = DEFAULT_MAX_SHELLS
+    # Set for --since-last: collect only events after the stored bookmarks.
+    bookmarks: Optional[BookmarkStore] = None
+    page_size: int = DEFAULT_PAGE_SIZE
+    # Split longer windows into slices of this many hours, read over up
+    # to slice_shells shells at once (None = off / max_shells).
+    slice_hours: Optional[float] = DEFAULT_SLICE_HOURS
+    slice_shells: Optional[int] = None
+    # Event artefact format ("json", "ndjson" or "columnar"), on-the-fly
+    # gzip, and whether to write a columnar copy next to json/ndjson.
+    output_format: str = "json"
+    compress: bool = False
+    columnar_copy: bool = False
+    # "message", "structured" or "both" (see collectors.EVENT_DATA_MODES).
+    event_data: str = "message"
+    # Set for --hash-cache: executable hashes cached on the collector,
+    # per host, so unchanged binaries are not re-hashed.
+    hash_cache: Optional[HashCacheStore] = None
+    # ZIP method/level and whether to keep uncompressed loose copies.
+    zip_compression: str = "deflated"
+    zip_level: Optional[int] = None
+    keep_loose: bool = True
+    # Compress script output on the endpoint before it crosses WinRM.
+    gzip_wire: bool = False
+    # Seconds each host may spend on remote work (None = no limit), and
+    # retries per command after transient WinRM transport errors.
+    host_budget: Optional[float] = None
+    retries: int = DEFAULT_RETRIES
+    # Server-side filters from the CLI, per log; they override the
+    # host's profile/filters field by field.
+    filters: Dict[str, EventFilter] = field(default_factory=dict)
+
+
+@dataclass
+class HostResult:
+    """Outcome of collecting a single host."""
+
+    name: str
+    host: str
+    status: str = "ok"  # "ok", "partial", "failed" or "skipped"
+    out_dir: Optional[Path] = None
+    zip_path: Optional[Path] = None
+    artefacts: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+    metrics: Optional[HostMetrics] = None
+
+    @property
+    def artefact_count(self) -> int:
+        return len(self.artefacts)
+
+
+def prepare_output_dir(base_output: str, host_name: str) -> Path:
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = Path(base_output).expanduser().resolve() / host_name / ts
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _report_bookmark_notes(
+    reporter: ProgressReporter, name: str, channel: str, notes: List[str]
+) -> None:
+    if "gap" in notes:
+        reporter.warn(
+            name,
+            f"{channel} log wrapped since the last run; "
+            "events between the bookmark and the oldest remaining record are lost.",
+        )
+    if "reset" in notes:
+        reporter.warn(
+            name,
+            f"{channel} bookmark no longer matches (log cleared?); "
+            "fell back to the --hours/--days window.",
+        )
+
+
+def _write_event_pages(
+    target: BinaryIO,
+    pages: Iterator[List[Dict]],
+    empty_data: Dict,
+    fmt: str = "json",
+    compress: bool = False,
+    columnar_target: Optional[BinaryIO] = None,
+) -> Tuple[int, Optional[Bookmark]]:
+    """
+    Stream event pages into an artefact stream as they arrive.
+
+    For the JSON format, empty_data (a {"message": ...} document) is
+    written if no event arrives, as the collectors always did. If
+    columnar_target is given, every page is also written to it in the
+    columnar format. Returns the number of events written and the newest
+    record seen (for bookmarks).
+    """
+    newest: Optional[Bookmark] = None
+    with ExitStack() as stack:
+        writers = [stack.enter_context(open_event_writer(target, fmt, compress))]
+        if columnar_target is not None:
+            writers.append(stack.enter_context(open_event_writer(columnar_target, "columnar")))
+        for page in pages:
+            for writer in writers:
+                writer.write_many(page)
+            page_newest = latest_record(page)
+            if page_newest is not None and (
+                newest is None or page_newest.record_id > newest.record_id
+            ):
+                newest = page_newest
+        for writer in writers:
+            writer.finish(empty_data)
+    return writers[0].count, newest
+
+
+def connect_host(cfg: HostConfig, password: str, options: CollectOptions) -> ShellPool:
+    """
+    Create the WinRM client for a host, wrapped in the ShellPool its
+    collectors share. Raises WindowsRemoteError.
+    """
+    client = WindowsRemote(
+        host=cfg.host,
+        username=cfg.username,
+        password=password,
+        use_https=False,  # HTTP for lab; switch later for HTTPS if desired
+        ask_password_if_missing=False,
+        gzip_wire=options.gzip_wire,
+        retries=options.retries,
+    )
+    return ShellPool(client, max_shells=cfg.max_shells or options.max_shells)
+
+
+def _collect_host(
+    cfg: HostConfig,
+    password: str,
+    options: CollectOptions,
+    reporter: ProgressReporter,
+    result: HostResult,
+    pool: Optional[ShellPool] = None,
+) -> None:
+    name = cfg.name
+    # A pool passed in (kept warm by the daemon) stays open afterwards.
+    warm = pool is not None
+
+    # ========== CONNECT ==========
+    reporter.stage(name, "Connecting via WinRM (NTLM)...", 1)
+    if pool is None:
+        try:
+            with result.metrics.stage("connect"):
+                pool = connect_host(cfg, password, options)
+        except WindowsRemoteError as exc:
+            reporter.error(name, f"Failed to connect to {name}: {exc}")
+            result.status = "failed"
+            result.errors.append(f"connect: {exc}")
+            return
+
+    # Shared by every shell in the pool (and clones made later); once it
+    # has passed, remaining commands fail fast with a timeout.
+    deadline = None
+    if options.host_budget is not None:
+        deadline = time.monotonic() + options.host_budget
+    for client in pool.clients:
+        client.deadline = deadline
+
+    out_dir = prepare_output_dir(options.output_dir, name)
+    result.out_dir = out_dir
+    reporter.detail(name, f"{BOLD}Output directory:{RESET} {MAGENTA}{out_dir}{RESET}")
+
+    # Every artefact is written once through the sink, which hashes it
+    # and streams it into the ZIP (and a loose copy) at the same time.
+    zip_path = out_dir / f"soclog_{name}_{out_dir.name}.zip"
+    sink = ArtifactSink(
+        out_dir,
+        zip_path,
+        compression=options.zip_compression,
+        level=options.zip_level,
+        keep_loose=options.keep_loose,
+    )
+    try:
+        _collect_artefacts(cfg, pool, options, reporter, result, sink, warm)
+    finally:
+        try:
+            with result.metrics.stage("zip"):
+                result.zip_path = sink.close()
+        except OSError as exc:
+            _report_write_error(reporter, name, "Failed to finish ZIP", exc, out_dir)
+            result.errors.append(f"zip: {exc}")
+
+    if result.zip_path is not None:
+        reporter.ok(name, f"ZIP created: {BOLD}{result.zip_path}{RESET}")
+    if result.errors and result.status == "ok":
+        result.status = "partial"
+
+
+def _describe(event_filter: EventFilter) -> str:
+    parts = []
+    for key, value in event_filter.to_dict().items():
+        if isinstance(value, list):
+            shown = ", ".join(str(v) for v in value[:6]) + (", ..." if len(value) > 6 else "")
+            parts.append(f"{key}: {shown}")
+        else:
+            parts.append(f"{key}: {value}")
+    return "; ".join(parts)
+
+
+def _report_write_error(
+    reporter: ProgressReporter, name: str, message: str, exc: OSError, out_dir: Path
+) -> None:
+    if exc.errno == 28:
+        reporter.warn(
+            name,
+            f"{message}: no space left on device. "
+            f"Whatever was written so far is in {out_dir}. "
+            "--preflight checks the space needed before collecting.",
+        )
+    else:
+        reporter.error(name, f"{message}: {exc}")
+
+
+def _collect_artefacts(
+    cfg: HostConfig,
+    pool: ShellPool,
+    options: CollectOptions,
+    reporter: ProgressReporter,
+    result: HostResult,
+    sink: ArtifactSink,
+    warm: bool = False,
+) -> None:
+    name = cfg.name
+    out_dir = sink.out_dir
+
+    # ========== SYSMON / SECURITY / PROCESSES ==========
+    # The three collectors are independent and bound by remote time, so
+    # they run side by side over separate WinRM shells (up to max_shells).
+    filters = merge_filters(cfg.filters, options.filters)
+
+    def event_log_task(
+        shell: WindowsRemote, log_name: str, label: str, stem: str, log_key: str
+    ) -> List[str]:
+        notes: List[str] = []
+        status, pages = open_event_pages(
+            shell,
+            log_name,
+            hours=options.hours,
+            days=options.days,
+            bookmark=options.bookmarks.get(name, log_name) if options.bookmarks else None,
+            notes=notes,
+            page_size=options.page_size,
+            event_data=options.event_data,
+            event_filter=filters.get(log_key),
+            pool=pool,
+            slice_hours=options.slice_hours,
+            slice_shells=options.slice_shells,
+        )
+        _report_bookmark_notes(reporter, name, label, notes)
+        if log_key in filters:
+            reporter.detail(name, f"{label}: filtering on the endpoint ({_describe(filters[log_key])})")
+
+        file_names = [artifact_file_name(stem, options.output_format, options.compress)]
+        with ExitStack() as stack:
+            raw = stack.enter_context(sink.open(file_names[0]))
+            columnar_raw = None
+            if options.columnar_copy and options.output_format != "columnar":
+                file_names.append(artifact_file_name(stem, "columnar"))
+                columnar_raw = stack.enter_context(sink.open(file_names[1]))
+            count, newest = _write_event_pages(
+                raw,
+                pages,
+                status_message(label, status),
+                fmt=options.output_format,
+                compress=options.compress,
+                columnar_target=columnar_raw,
+            )
+        record(events=count)
+        if count and options.bookmarks is not None and newest is not None:
+            options.bookmarks.update(name, log_name, newest.record_id, newest.time_created)
+
+        if status == "missing":
+            reporter.warn(name, f"{label} not installed on this host.")
+        elif not count:
+            reporter.note(name, f"No {label} events for requested time range.")
+        else:
+            reporter.ok(name, f"{label} events collected ({count} events).")
+        return file_names
+
+    def sysmon_task(shell: WindowsRemote) -> List[str]:
+        reporter.stage(name, "Starting Sysmon collection (this may take a bit)...", 2)
+        with result.metrics.stage("sysmon"):
+            return event_log_task(shell, SYSMON_LOG, "Sysmon", "sysmon_events", "sysmon")
+
+    def security_task(shell: WindowsRemote) -> List[str]:
+        reporter.stage(name, "Starting Security log collection...", 3)
+        with result.metrics.stage("security"):
+            return event_log_task(shell, SECURITY_LOG, "Security", "security_events", "security")
+
+    def processes_task(shell: WindowsRemote) -> List[str]:
+        reporter.stage(name, "Collecting running processes and hashes...", 4)
+        with result.metrics.stage("processes"):
+            hashes = options.hash_cache.get(name) if options.hash_cache is not None else None
+            proc_data = collect_processes(shell, hash_cache=hashes)
+            if hashes is not None:
+                options.hash_cache.update(name, hashes)
+            record(events=len(proc_data.get("processes") or []))
+            with sink.open_text("processes.json") as f:
+                json.dump(proc_data, f, indent=2)
+        reporter.ok(name, "Process list collected.")
+        return ["processes.json"]
+
+    stages = [
+        ("sysmon", "Failed to collect Sysmon logs", sysmon_task),
+        ("security", "Failed to collect Security logs", security_task),
+        ("processes", "Failed to collect process list", processes_task),
+    ]
+    try:
+        outcomes = run_concurrently([task for _, _, task in stages], pool)
+    finally:
+        # Later stages are local; release the remote shells now.
+        if not warm:
+            pool.close()
+
+    completed: List[str] = []
+    for (label, message, _), outcome in zip(stages, outcomes):
+        if isinstance(outcome, WindowsRemoteError):
+            reporter.error(name, f"{message}: {outcome}")
+            result.errors.append(f"{label}: {outcome}")
+        elif isinstance(outcome, OSError):
+            _report_write_error(reporter, name, message, outcome, out_dir)
+            result.errors.append(f"{label}: {outcome}")
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            completed.extend(outcome)
+
+    # Manifest lists artefacts in stage order; anything a failed collector
+    # wrote before failing follows, flagged "partial".
+    by_name = {r["relative_path"]: r for r in sink.records}
+    records = [by_name[n] for n in completed if n in by_name]
+    records += [r for r in sink.records if r["relative_path"] not in completed]
+    result.artefacts.extend(str(out_dir / r["relative_path"]) for r in records)
+
+    if not completed:
+        if records:
+            # The sink keeps partial evidence; the ZIP holding it is still
+            # finished by _collect_host, just without a manifest.
+            where = "the ZIP and the run directory" if options.keep_loose else "the ZIP"
+            reporter.warn(
+                name,
+                f"No artefacts collected completely; skipping the manifest. "
+                f"{len(records)} partial artefact(s) are kept, unlisted, in {where}.",
+            )
+        else:
+            reporter.warn(name, "No artefacts collected; skipping manifest and ZIP.")
+        result.status = "failed"
+        return
+
+    # ========== MANIFEST & INTEGRITY ==========
+    # Hashes and sizes were computed while the artefacts were written,
+    # so nothing has to be read back from disk here.
+    reporter.stage(name, "Building integrity manifest...", 5)
+    manifest_path = out_dir / "manifest.json"
+    with result.metrics.stage("manifest"):
+        manifest = build_manifest_from_records(records, host=name)
+        if filters:
+            # Record what was deliberately not collected.
+            manifest["filters"] = {log: flt.to_dict() for log, flt in filters.items()}
+        write_manifest(manifest, str(manifest_path))
+    result.artefacts.append(str(manifest_path))
+    reporter.ok(name, "manifest.json generated.")
+
+    files_for_zip = [manifest_path]
+    if options.sign_manifest and not options.sweep_signing:
+        sig_path = out_dir / "manifest.sig"
+        try:
+            with result.metrics.stage("sign"):
+                sign_manifest_with_gpg(
+                    str(manifest_path),
+                    str(sig_path),
+                    gpg_key=options.gpg_key,
+                )
+            result.artefacts.append(str(sig_path))
+            files_for_zip.append(sig_path)
+            reporter.ok(name, "manifest.sig created (GPG signature).")
+        except Exception as exc:
+            reporter.warn(name, f"Failed to sign manifest with GPG: {exc}")
+            result.errors.append(f"sign: {exc}")
+
+    # ========== ZIP ==========
+    # Artefacts are already in the ZIP; only the manifest (and signature)
+    # are added before the caller finishes it.
+    reporter.stage(name, "Packaging artefacts into ZIP...", 6)
+    with result.metrics.stage("zip"):
+        for path in files_for_zip:
+            sink.add_file(path)
+
+
+def collect_host(
+    cfg: HostConfig,
+    password: str,
+    options: CollectOptions,
+    reporter: ProgressReporter,
+    pool: Optional[ShellPool] = None,
+) -> HostResult:
+    """
+    Run the whole collection pipeline for one host.
+
+    pool, if given (see connect_host()), is used instead of connecting
+    and is left open for the next run.
+
+    Never raises: unexpected exceptions are reported and recorded on the
+    returned HostResult so that one broken host cannot abort a sweep.
+    """
+    result = HostResult(name=cfg.name, host=cfg.host, metrics=HostMetrics(cfg.name, cfg.host))
+    started = time.monotonic()
+    reporter.host_start(cfg.name, cfg.host)
+    try:
+        _collect_host(cfg, password, options, reporter, result, pool)
+    except Exception as exc:  # keep the worker pool alive
+        reporter.error(cfg.name, f"Unexpected error: {exc!r}")
+        result.status = "failed"
+        result.errors.append(f"unexpected: {exc!r}")
+    result.elapsed = time.monotonic() - started
+    if result.out_dir is not None:
+        # Written last and kept out of the manifest and ZIP: it describes
+        # the collection run, not the evidence.
+        try:
+            write_metrics_json(result.metrics, result.out_dir, result.status, result.elapsed)
+        except OSError as exc:
+            reporter.warn(cfg.name, f"Failed to write metrics.json: {exc}")
+    return result
+
+
+def run_collection(
+    jobs: List[Tuple[HostConfig, str]],
+    options: CollectOptions,
+    reporter: ProgressReporter,
+    parallel: int = 1,
+) -> List[HostResult]:
+    """
+    Collect every (host config, password) pair in jobs.
+
+    With parallel > 1 up to that many hosts are collected at the same
+    time. Results are returned in the same order as jobs.
+    """
+    if parallel <= 1 or len(jobs) <= 1:
+        return [collect_host(cfg, pw, options, reporter) for cfg, pw in jobs]
+
+    with ThreadPoolExecutor(
+        max_workers=min(parallel, len(jobs)), thread_name_prefix="soclog-host"
+    ) as pool:
+        futures = [
+            pool.submit(collect_host, cfg, pw, options, reporter) for cfg, pw in jobs
+        ]
+        return [f.result() for f in futures]
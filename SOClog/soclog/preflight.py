@@ -0,0 +1,372 @@
+"""
+Pre-flight sizing: estimate a sweep before collecting it.
+
+probe_hosts() asks every host, in one WinRM call per host, for the size
+of its Sysmon and Security logs (Get-WinEvent -ListLog: FileSize,
+RecordCount) and the time of their oldest and newest record, and
+fetches a small sample of the newest events in the run's event data
+mode. From that:
+
+  events   RecordCount scaled by the share of the log's time span that
+           falls into the requested window (assumes a steady event
+           rate), or the records after the --since-last bookmark;
+  bytes    the sample written through the real artefact writer
+           (format, --gzip, columnar copy) and compressed like the ZIP,
+           so per-event sizes are measured, not guessed; likewise the
+           WinRM output, plain and gzip.
+
+plan_collection() checks the totals against the free space of the
+output directory's file system and an optional transfer budget and
+settles the settings the user left open: the page size (so one WinRM
+response stays near PAGE_TARGET_BYTES), gzip for artefacts if the disk
+is too small without it, and gzip on the wire if the budget needs it.
+If the sweep still does not fit, the plan lists why and the CLI stops
+before anything is collected.
+
+Server-side filters are not applied to the estimate, so with filters it
+is an upper bound.
+"""
+
+import bz2
+import gzip
+import io
+import json
+import lzma
+import re
+import shutil
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .artifacts import open_event_writer
+from .collectors import SECURITY_LOG, SYSMON_LOG, _fetch_page, _window_start, iter_json_lines
+from .config import HostConfig
+from .pipeline import CollectOptions, connect_host
+from .windows_remote import WindowsRemote, WindowsRemoteError
+
+# Newest events fetched per log to measure event sizes.
+SAMPLE_EVENTS = 200
+
+# Aim for WinRM responses of about this size when choosing the page size.
+PAGE_TARGET_BYTES = 4 * 1024 * 1024
+MIN_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 10000
+
+# Free space to leave on the output file system, on top of a 10% margin
+# on the estimate, and allowance per host for processes.json and the
+# manifest.
+DISK_RESERVE_BYTES = 1024 ** 3
+DISK_MARGIN = 1.1
+HOST_OVERHEAD_BYTES = 512 * 1024
+
+_SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+
+_LIST_LOG_SCRIPT = """
+$ErrorActionPreference = "SilentlyContinue"
+foreach ($logName in @({names})) {{
+    $log = Get-WinEvent -ListLog $logName
+    $row = [ordered]@{{ LogName = $logName; Missing = (-not $log) }}
+    if ($log) {{
+        $oldest = Get-WinEvent -LogName $logName -MaxEvents 1 -Oldest
+        $newest = Get-WinEvent -LogName $logName -MaxEvents 1
+        $row.FileSize = $log.FileSize
+        $row.RecordCount = $log.RecordCount
+        if ($oldest) {{ $row.OldestTime = $oldest.TimeCreated.ToUniversalTime().ToString('o') }}
+        if ($newest) {{
+            $row.NewestTime = $newest.TimeCreated.ToUniversalTime().ToString('o')
+            $row.NewestRecordId = $newest.RecordId
+        }}
+    }}
+    ConvertTo-Json -InputObject ([PSCustomObject]$row) -Compress
+}}
+"""
+
+
+def parse_size(text: str) -> int:
+    """Bytes from '750M', '20G', '1.5TB', '4096' (binary units)."""
+    match = _SIZE.match(str(text))
+    if not match:
+        raise ValueError(f"Invalid size {text!r}; expected e.g. 500M, 20G or 1.5T.")
+    return int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+
+
+def format_size(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    # .NET round-trip format has 7 fractional digits.
+    value = re.sub(r"(\.\d{6})\d+", r"\1", value.replace("Z", "+00:00"))
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+@dataclass
+class LogEstimate:
+    """Size of one log on one host and what the run would take of it."""
+
+    log_name: str
+    status: str = "ok"  # "ok", "missing" or "empty"
+    file_size: int = 0
+    record_count: int = 0
+    events: int = 0
+    # Measured on the sample: bytes per event for each variant, keyed
+    # "loose", "loose_gz", "zip", "zip_gz", "wire", "wire_gz".
+    bytes_per_event: Dict[str, float] = field(default_factory=dict)
+
+    def bytes(self, kind: str) -> int:
+        return int(self.events * self.bytes_per_event.get(kind, 0.0))
+
+
+@dataclass
+class HostEstimate:
+    name: str
+    logs: List[LogEstimate] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def events(self) -> int:
+        return sum(log.events for log in self.logs)
+
+    def bytes(self, kind: str) -> int:
+        return sum(log.bytes(kind) for log in self.logs)
+
+    def largest_event(self) -> float:
+        return max((log.bytes_per_event.get("wire", 0.0) for log in self.logs), default=0.0)
+
+
+def _events_in_window(row: Dict, start: datetime) -> int:
+    count = int(row.get("RecordCount") or 0)
+    oldest, newest = _parse_time(row.get("OldestTime")), _parse_time(row.get("NewestTime"))
+    if not count or oldest is None or newest is None or newest < start:
+        return 0
+    if oldest >= start or newest <= oldest:
+        return count
+    return int(count * (newest - start).total_seconds() / (newest - oldest).total_seconds())
+
+
+def _zip_size(data: bytes, method: str, level: Optional[int]) -> int:
+    if method == "stored":
+        return len(data)
+    if method == "bzip2":
+        return len(bz2.compress(data, level or 9))
+    if method == "lzma":
+        return len(lzma.compress(data))
+    return len(zlib.compress(data, -1 if level is None else level))
+
+
+def _written_size(events: List[Dict], fmt: str, compress: bool) -> bytes:
+    buffer = io.BytesIO()
+    with open_event_writer(buffer, fmt, compress) as writer:
+        writer.write_many(events)
+        writer.finish({})
+    return buffer.getvalue()
+
+
+def measure_sample(events: List[Dict], options: CollectOptions) -> Dict[str, float]:
+    """Bytes per event of a sample, for every variant the planner weighs."""
+    if not events:
+        return {}
+    n = len(events)
+    wire = "\n".join(json.dumps(e, separators=(",", ":")) for e in events).encode("utf-8")
+    sizes = {"wire": len(wire), "wire_gz": len(gzip.compress(wire))}
+    for suffix, compress in (("", False), ("_gz", True)):
+        fmt = options.output_format
+        written = [_written_size(events, fmt, compress and fmt != "columnar")]
+        if options.columnar_copy and fmt != "columnar":
+            written.append(_written_size(events, "columnar", False))
+        sizes["loose" + suffix] = sum(len(w) for w in written)
+        sizes["zip" + suffix] = sum(
+            _zip_size(w, options.zip_compression, options.zip_level) for w in written
+        )
+    return {kind: size / n for kind, size in sizes.items()}
+
+
+def probe_host(cfg: HostConfig, password: str, options: CollectOptions) -> HostEstimate:
+    """Size the logs of one host. Never raises: failures go to .error."""
+    estimate = HostEstimate(name=cfg.name)
+    logs = (SYSMON_LOG, SECURITY_LOG)
+    try:
+        pool = connect_host(cfg, password, options)
+        try:
+            with pool.acquire() as client:
+                names = ", ".join(f'"{name}"' for name in logs)
+                status_code, stdout, stderr = client.run_powershell(
+                    _LIST_LOG_SCRIPT.format(names=names)
+                )
+                rows = {row.get("LogName"): row for row in iter_json_lines(stdout)}
+                start = _window_start(options.hours, options.days)
+                for log_name in logs:
+                    row = rows.get(log_name)
+                    if row is None:
+                        raise WindowsRemoteError(
+                            f"no size for {log_name}. Exit code {status_code}, stderr: {stderr}"
+                        )
+                    estimate.logs.append(_estimate_log(client, cfg, row, start, options))
+        finally:
+            pool.close()
+    except (WindowsRemoteError, ValueError) as exc:
+        estimate.error = str(exc)
+    return estimate
+
+
+def _estimate_log(
+    client: WindowsRemote,
+    cfg: HostConfig,
+    row: Dict,
+    start: datetime,
+    options: CollectOptions,
+) -> LogEstimate:
+    log = LogEstimate(log_name=row["LogName"])
+    if row.get("Missing"):
+        log.status = "missing"
+        return log
+    log.file_size = int(row.get("FileSize") or 0)
+    log.record_count = int(row.get("RecordCount") or 0)
+    newest_id = int(row.get("NewestRecordId") or 0)
+    bookmark = options.bookmarks.get(cfg.name, log.log_name) if options.bookmarks else None
+    if bookmark is not None and 0 < bookmark.record_id <= newest_id:
+        log.events = min(newest_id - bookmark.record_id, log.record_count)
+    else:
+        log.events = _events_in_window(row, start)
+    if not log.events:
+        log.status = "empty"
+        return log
+    sample = _fetch_page(
+        client,
+        log.log_name,
+        max(newest_id - SAMPLE_EVENTS, 0),
+        newest_id,
+        None,
+        SAMPLE_EVENTS,
+        options.event_data,
+    )
+    log.bytes_per_event = measure_sample(sample, options)
+    return log
+
+
+def probe_hosts(
+    jobs: List[Tuple[HostConfig, str]], options: CollectOptions, parallel: int = 1
+) -> List[HostEstimate]:
+    """probe_host() for every (host config, password) pair, in job order."""
+    if parallel <= 1 or len(jobs) <= 1:
+        return [probe_host(cfg, pw, options) for cfg, pw in jobs]
+    with ThreadPoolExecutor(
+        max_workers=min(parallel, len(jobs)), thread_name_prefix="soclog-preflight"
+    ) as pool:
+        return list(pool.map(lambda job: probe_host(job[0], job[1], options), jobs))
+
+
+@dataclass
+class Plan:
+    """Outcome of plan_collection(): settings to use and whether the sweep fits."""
+
+    hosts: List[HostEstimate]
+    page_size: int
+    compress: bool
+    gzip_wire: bool
+    disk_needed: int = 0
+    disk_free: int = 0
+    transfer: int = 0
+    transfer_budget: Optional[int] = None
+    # What was changed from the given settings, and why the sweep cannot run.
+    changes: List[str] = field(default_factory=list)
+    problems: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    @property
+    def events(self) -> int:
+        return sum(h.events for h in self.hosts)
+
+    def apply(self, options: CollectOptions) -> None:
+        options.page_size = self.page_size
+        options.compress = self.compress
+        options.gzip_wire = self.gzip_wire
+
+
+def _disk_needed(hosts: List[HostEstimate], compress: bool, keep_loose: bool) -> int:
+    suffix = "_gz" if compress else ""
+    total = sum(h.bytes("zip" + suffix) + HOST_OVERHEAD_BYTES for h in hosts)
+    if keep_loose:
+        total += sum(h.bytes("loose" + suffix) for h in hosts)
+    return int(total * DISK_MARGIN) + DISK_RESERVE_BYTES
+
+
+def _free_space(output_dir: str) -> int:
+    path = Path(output_dir).expanduser().resolve()
+    while not path.exists():
+        path = path.parent
+    return shutil.disk_usage(path).free
+
+
+def plan_collection(
+    hosts: List[HostEstimate],
+    options: CollectOptions,
+    transfer_budget: Optional[int] = None,
+    page_size: Optional[int] = None,
+    wire: Optional[str] = None,
+) -> Plan:
+    """
+    Settle page size and compression for the estimated sweep.
+
+    page_size / wire are what the user asked for (None = choose). gzip
+    for artefacts and on the wire is only ever switched on, never off.
+    """
+    plan = Plan(
+        hosts=hosts,
+        page_size=page_size or options.page_size,
+        compress=options.compress,
+        gzip_wire=options.gzip_wire,
+        transfer_budget=transfer_budget,
+    )
+
+    largest = max((h.largest_event() for h in hosts), default=0.0)
+    if page_size is None and largest:
+        chosen = int(PAGE_TARGET_BYTES / largest) // 100 * 100
+        plan.page_size = max(MIN_PAGE_SIZE, min(MAX_PAGE_SIZE, chosen))
+        if plan.page_size != options.page_size:
+            plan.changes.append(
+                f"page size {plan.page_size} (about {format_size(largest)} per event)"
+            )
+
+    plan.disk_free = _free_space(options.output_dir)
+    plan.disk_needed = _disk_needed(hosts, plan.compress, options.keep_loose)
+    if plan.disk_needed > plan.disk_free and not plan.compress and options.output_format != "columnar":
+        with_gzip = _disk_needed(hosts, True, options.keep_loose)
+        if with_gzip < plan.disk_needed:
+            plan.compress = True
+            plan.disk_needed = with_gzip
+            plan.changes.append("gzip for event files (--gzip), to fit the free disk space")
+    if plan.disk_needed > plan.disk_free:
+        hint = "; --no-loose keeps only the ZIP" if options.keep_loose else ""
+        plan.problems.append(
+            f"needs about {format_size(plan.disk_needed)} on disk (with "
+            f"{format_size(DISK_RESERVE_BYTES)} reserve) but {options.output_dir} has "
+            f"{format_size(plan.disk_free)} free{hint}"
+        )
+
+    plan.transfer = sum(h.bytes("wire_gz" if plan.gzip_wire else "wire") for h in hosts)
+    if transfer_budget is not None and plan.transfer > transfer_budget:
+        if not plan.gzip_wire and wire is None:
+            plan.gzip_wire = True
+            plan.transfer = sum(h.bytes("wire_gz") for h in hosts)
+            plan.changes.append("gzip on the wire (--wire gzip), to stay within the transfer budget")
+        if plan.transfer > transfer_budget:
+            plan.problems.append(
+                f"would transfer about {format_size(plan.transfer)}, over the "
+                f"{format_size(transfer_budget)} budget"
+            )
+    return plan
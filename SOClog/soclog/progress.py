@@ -0,0 +1,152 @@
+"""
+Console output helpers for SOClog.
+
+Holds the ANSI colour constants, the per-stage progress reporter used by
+the collection pipeline and the end-of-run summary table. Everything that
+prints while hosts are being collected goes through ProgressReporter so
+that several worker threads can report at once without interleaving
+half-written lines.
+"""
+
+import sys
+import threading
+from typing import List, Optional, TextIO
+
+# =========================
+#  Simple ANSI colours
+# =========================
+RESET = "\033[0m"
+BOLD = "\033[1m"
+DIM = "\033[2m"
+
+RED = "\033[31m"
+GREEN = "\033[32m"
+YELLOW = "\033[33m"
+BLUE = "\033[34m"
+MAGENTA = "\033[35m"
+CYAN = "\033[36m"
+
+
+class ProgressReporter:
+    """
+    Thread-safe, stage-based progress printer.
+
+    This is not per-event or per-byte; it's per major stage:
+      1) Connect
+      2) Sysmon
+      3) Security
+      4) Processes
+      5) Manifest (+sign)
+      6) ZIP
+
+    With a single worker the output looks like the classic SOClog progress
+    bar. With several workers (prefix_host=True) every line is prefixed
+    with the host name and the bar is replaced by a compact "(n/total)"
+    counter, which stays readable when lines from many hosts are mixed.
+    """
+
+    def __init__(
+        self,
+        total_steps: int = 6,
+        prefix_host: bool = False,
+        stream: Optional[TextIO] = None,
+    ) -> None:
+        self.total_steps = total_steps
+        self.prefix_host = prefix_host
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def _emit(self, host: str, lines: List[str]) -> None:
+        stream = self.stream or sys.stdout
+        prefix = f"{DIM}[{host}]{RESET} " if self.prefix_host else ""
+        with self._lock:
+            for line in lines:
+                stream.write(f"{prefix}{line}\n")
+            stream.flush()
+
+    def host_start(self, host: str, address: str) -> None:
+        self._emit(
+            host,
+            [
+                f"{BOLD}{CYAN}[*]{RESET} {BOLD}Collecting from host:{RESET} "
+                f"{YELLOW}{host}{RESET} {DIM}({address}){RESET}"
+            ],
+        )
+
+    def stage(self, host: str, stage: str, current_step: int) -> None:
+        if self.prefix_host:
+            self._emit(
+                host,
+                [
+                    f"{BLUE}[>]{RESET} {stage} "
+                    f"{DIM}({current_step}/{self.total_steps}){RESET}"
+                ],
+            )
+            return
+
+        percent = int(current_step * 100 / self.total_steps)
+        bar_width = 30
+        filled = int(bar_width * percent / 100)
+        bar = "█" * filled + "-" * (bar_width - filled)
+        self._emit(
+            host,
+            [
+                f"{BLUE}[>]{RESET} {stage}",
+                f"    {BOLD}{GREEN}{bar}{RESET} {BOLD}{percent:3d}%{RESET}",
+            ],
+        )
+
+    def detail(self, host: str, message: str) -> None:
+        self._emit(host, [f"    {message}"])
+
+    def ok(self, host: str, message: str) -> None:
+        self._emit(host, [f"    {GREEN}[+]{RESET} {message}"])
+
+    def note(self, host: str, message: str) -> None:
+        self._emit(host, [f"    {YELLOW}[*]{RESET} {message}"])
+
+    def warn(self, host: str, message: str) -> None:
+        self._emit(host, [f"    {YELLOW}[!]{RESET} {message}"])
+
+    def error(self, host: str, message: str) -> None:
+        self._emit(host, [f"    {RED}[!]{RESET} {message}"])
+
+
+def print_summary(results: List, stream: Optional[TextIO] = None) -> None:
+    """
+    Print a one-line-per-host summary table for a finished sweep.
+
+    results: list of pipeline.HostResult objects.
+    """
+    stream = stream or sys.stdout
+    colours = {"ok": GREEN, "partial": YELLOW, "failed": RED, "skipped": DIM}
+
+    name_w = max([len("HOST")] + [len(r.name) for r in results])
+    lines = [
+        "",
+        f"{BOLD}Summary{RESET}",
+        f"  {'HOST'.ljust(name_w)}  {'STATUS':8}  {'FILES':>5}  {'TIME':>8}  DETAILS",
+    ]
+    for r in results:
+        colour = colours.get(r.status, "")
+        if r.zip_path:
+            details = str(r.zip_path)
+        elif r.out_dir:
+            details = str(r.out_dir)
+        else:
+            details = ""
+        if r.errors:
+            details = f"{details}  ({r.errors[0]})" if details else r.errors[0]
+        lines.append(
+            f"  {r.name.ljust(name_w)}  {colour}{r.status:8}{RESET}  "
+            f"{r.artefact_count:>5}  {r.elapsed:>7.1f}s  {details}"
+        )
+
+    counts = {}
+    for r in results:
+        counts[r.status] = counts.get(r.status, 0) + 1
+    totals = ", ".join(f"{k}: {v}" for k, v in sorted(counts.items()))
+    lines.append(f"  {DIM}{len(results)} host(s) - {totals}{RESET}")
+
+    stream.write("\n".join(lines) + "\n")
+    stream.flush()
@@ -0,0 +1,177 @@
+"""
+Per-node run summaries and the fleet report that merges them.
+
+A sharded collection run (--shard i/N) writes a summary of its results
+to soclog_summary_<i>of<N>.json in the output directory, replacing the
+previous one, so each node always has exactly one current summary.
+'soclog report' reads the summaries of all nodes (copied or synced to
+one place) and merges them: one row per host, totals per status, and
+coverage checks - shards without a summary, hosts collected by more
+than one node (nodes disagreeing on N), and, given the inventory,
+hosts no node collected.
+"""
+
+import json
+import socket
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+SUMMARY_PREFIX = "soclog_summary_"
+
+
+def summary_file_name(index: int, count: int) -> str:
+    return f"{SUMMARY_PREFIX}{index}of{count}.json"
+
+
+def write_node_summary(
+    results: List,
+    output_dir: str,
+    index: int,
+    count: int,
+    inventory_hosts: int,
+    started_utc: str,
+) -> Path:
+    """
+    Write this node's summary for shard index/count.
+
+    results are pipeline.HostResult objects; inventory_hosts is the
+    number of hosts in the whole (unsharded) inventory.
+    """
+    hosts = []
+    for r in results:
+        entry = {
+            "name": r.name,
+            "host": r.host,
+            "status": r.status,
+            "elapsed_s": round(r.elapsed, 3),
+            "artefacts": r.artefact_count,
+            "zip_path": str(r.zip_path) if r.zip_path else None,
+            "errors": list(r.errors),
+        }
+        if getattr(r, "metrics", None) is not None:
+            totals = r.metrics.totals()
+            entry["events"] = totals["events"]
+            entry["bytes_written"] = totals["bytes_written"]
+        hosts.append(entry)
+
+    summary = {
+        "node": socket.gethostname(),
+        "shard": {"index": index, "count": count},
+        "inventory_hosts": inventory_hosts,
+        "started_utc": started_utc,
+        "finished_utc": datetime.now(timezone.utc).isoformat(),
+        "hosts": hosts,
+    }
+    path = Path(output_dir).expanduser() / summary_file_name(index, count)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    tmp.replace(path)
+    return path
+
+
+def find_summaries(paths: Iterable[str]) -> List[Path]:
+    """Summary files among paths; directories are searched recursively."""
+    found: List[Path] = []
+    for p in paths:
+        path = Path(p).expanduser()
+        if path.is_dir():
+            found.extend(sorted(path.rglob(f"{SUMMARY_PREFIX}*.json")))
+        elif path.is_file():
+            found.append(path)
+    return found
+
+
+@dataclass
+class FleetReport:
+    """Merged view of several node summaries."""
+
+    # One row per host and collecting node (dicts from the summaries,
+    # with "node" and "shard" added).
+    hosts: List[Dict] = field(default_factory=list)
+    nodes: List[Dict] = field(default_factory=list)
+    shard_counts: List[int] = field(default_factory=list)
+    missing_shards: List[int] = field(default_factory=list)
+    duplicate_hosts: List[str] = field(default_factory=list)
+    # Inventory hosts no summary mentions (only with an inventory).
+    uncovered_hosts: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def status_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for h in self.hosts:
+            counts[h["status"]] = counts.get(h["status"], 0) + 1
+        return counts
+
+    @property
+    def ok(self) -> bool:
+        return not (
+            self.errors
+            or self.missing_shards
+            or self.duplicate_hosts
+            or self.uncovered_hosts
+            or len(self.shard_counts) > 1
+            or any(h["status"] == "failed" for h in self.hosts)
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "ok": self.ok,
+            "status_counts": self.status_counts,
+            "nodes": self.nodes,
+            "shard_counts": self.shard_counts,
+            "missing_shards": self.missing_shards,
+            "duplicate_hosts": self.duplicate_hosts,
+            "uncovered_hosts": self.uncovered_hosts,
+            "errors": self.errors,
+            "hosts": self.hosts,
+        }
+
+
+def build_report(summary_paths: List[Path], inventory: Optional[List[str]] = None) -> FleetReport:
+    """Merge node summaries; inventory is the list of all host names, if known."""
+    report = FleetReport()
+    seen_shards: Dict[int, set] = {}
+    collected_by: Dict[str, List[str]] = {}
+
+    for path in summary_paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                summary = json.load(f)
+            shard = summary["shard"]
+            index, count = int(shard["index"]), int(shard["count"])
+            hosts = summary["hosts"]
+            names = [str(h["name"]) for h in hosts]
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            report.errors.append(f"{path}: not a node summary ({exc})")
+            continue
+
+        label = f"{index}/{count}"
+        node = summary.get("node") or "?"
+        report.nodes.append(
+            {
+                "node": node,
+                "shard": label,
+                "hosts": len(hosts),
+                "finished_utc": summary.get("finished_utc"),
+                "path": str(path),
+            }
+        )
+        seen_shards.setdefault(count, set()).add(index)
+        for name, h in zip(names, hosts):
+            report.hosts.append({**h, "name": name, "node": node, "shard": label})
+            collected_by.setdefault(name, []).append(label)
+
+    report.shard_counts = sorted(seen_shards)
+    if len(report.shard_counts) == 1:
+        count = report.shard_counts[0]
+        report.missing_shards = [i for i in range(1, count + 1) if i not in seen_shards[count]]
+    report.duplicate_hosts = sorted(n for n, shards in collected_by.items() if len(shards) > 1)
+    if inventory is not None:
+        report.uncovered_hosts = [n for n in inventory if n not in collected_by]
+    report.hosts.sort(key=lambda h: (h["name"], h["shard"]))
+    return report
@@ -0,0 +1,112 @@
+"""
+Intra-host scheduling helpers.
+
+A ShellPool hands out WindowsRemote clients for one host, creating extra
+connections (and therefore extra remote shells) on demand up to a
+per-host cap. run_concurrently() runs a list of independent tasks over
+such a pool, so remote-bound work like Get-WinEvent / Get-FileHash on the
+same endpoint can overlap instead of running back to back.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Sequence
+
+from .defaults import DEFAULT_MAX_SHELLS
+from .windows_remote import WindowsRemote
+
+
+class ShellPool:
+    """
+    Bounded pool of WindowsRemote clients for a single host.
+
+    The pool starts with the already-connected client and clones it the
+    first time more than one task needs a shell at once.
+    """
+
+    def __init__(self, client: WindowsRemote, max_shells: int = DEFAULT_MAX_SHELLS):
+        if max_shells < 1:
+            raise ValueError("max_shells must be at least 1.")
+        self.max_shells = max_shells
+        self._idle: "queue.LifoQueue[WindowsRemote]" = queue.LifoQueue()
+        self._idle.put(client)
+        self._clients: List[WindowsRemote] = [client]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, block: bool = True) -> Iterator[Optional[WindowsRemote]]:
+        """
+        Borrow a client for the duration of a with-block.
+
+        With block=False, yields None instead of waiting when every
+        shell is in use; a task that already holds a shell must borrow
+        more this way, or two such tasks could wait on each other.
+        """
+        client = None
+        try:
+            client = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if len(self._clients) < self.max_shells:
+                    client = self._clients[0].clone()
+                    self._clients.append(client)
+            if client is None:
+                if not block:
+                    yield None
+                    return
+                client = self._idle.get()
+        try:
+            yield client
+        finally:
+            self._idle.put(client)
+
+    @property
+    def clients(self) -> List[WindowsRemote]:
+        """Every client the pool has created so far (including the first)."""
+        with self._lock:
+            return list(self._clients)
+
+    def close(self) -> None:
+        """Close the remote shell of every client in the pool."""
+        for client in self.clients:
+            client.close()
+
+
+def run_concurrently(
+    tasks: Sequence[Callable[[WindowsRemote], object]],
+    pool: ShellPool,
+) -> List[object]:
+    """
+    Run each task with a client borrowed from pool.
+
+    Each task is called as task(client). At most pool.max_shells tasks run
+    at once. Results (or raised exceptions) are returned in task order;
+    an exception from a task is returned as its result rather than raised,
+    so one failing collector does not hide the output of the others.
+    """
+
+    def _run(task: Callable[[WindowsRemote], object]) -> object:
+        with pool.acquire() as client:
+            return task(client)
+
+    if pool.max_shells == 1 or len(tasks) <= 1:
+        results: List[object] = []
+        for task in tasks:
+            try:
+                results.append(_run(task))
+            except Exception as exc:
+                results.append(exc)
+        return results
+
+    with ThreadPoolExecutor(
+        max_workers=min(pool.max_shells, len(tasks)),
+        thread_name_prefix="soclog-shell",
+    ) as executor:
+        futures = [executor.submit(_run, task) for task in tasks]
+        results = []
+        for future in futures:
+            exc = future.exception()
+            results.append(exc if exc is not None else future.result())
+        return results
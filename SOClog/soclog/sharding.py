@@ -0,0 +1,49 @@
+"""
+Split a shared host inventory across several collector nodes.
+
+With --shard i/N, node i of N collects only the hosts assigned to it.
+Assignment uses rendezvous (highest random weight) hashing on the host
+name: every host scores each shard with a hash of (shard, name) and
+goes to the highest-scoring one. Every node computes the same
+assignment from the same YAML without talking to the others, and the
+assignment is stable:
+
+  - adding node N+1 moves only the ~1/(N+1) of hosts that now score
+    highest on it; nothing moves between the existing nodes
+  - removing the last node moves only its own hosts
+  - adding or removing hosts in the YAML does not move other hosts
+"""
+
+import hashlib
+from typing import List, Sequence, Tuple
+
+from .config import HostConfig
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse "i/N" (1 <= i <= N) into (i, N)."""
+    index_text, sep, count_text = str(value).partition("/")
+    try:
+        if not sep:
+            raise ValueError
+        index, count = int(index_text), int(count_text)
+    except ValueError:
+        raise ValueError(f"Invalid shard {value!r}; expected i/N, e.g. 2/3.") from None
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {value!r}; i must be between 1 and N.")
+    return index, count
+
+
+def _score(shard: int, name: str) -> int:
+    digest = hashlib.blake2b(f"{shard}\0{str(name).lower()}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def shard_for(name: str, count: int) -> int:
+    """The shard (1..count) that collects host `name`."""
+    return max(range(1, count + 1), key=lambda shard: _score(shard, name))
+
+
+def select_shard(hosts: Sequence[HostConfig], index: int, count: int) -> List[HostConfig]:
+    """The hosts of shard index/count, in inventory order."""
+    return [cfg for cfg in hosts if shard_for(cfg.name, count) == index]
@@ -0,0 +1,403 @@
+"""
+Re-check stored SOClog collections against their manifest.json.
+
+A collection is either a run directory (loose artefacts, or only the
+ZIP when collected with --no-loose) or a ZIP on its own. Every file
+listed in the manifest is re-hashed and compared by size and SHA-256,
+both the loose copy and the ZIP member where a run has both, and any
+file or ZIP member the manifest does not list is reported.
+manifest.sig, if present, is checked with gpg --verify. A
+manifest.proof.json from sweep signing (see merkle.py) is checked too:
+the manifest must hash to the proof's leaf, the proof must lead to its
+root, and the signature over the root statement must verify. A
+collection with neither a manifest.sig nor a signed proof is reported
+as "unsigned"; a proof without a root signature does not count. With a
+gpg key, the signature must also be made by that key, and unsigned or
+unchecked collections fail.
+
+Collections are verified in parallel threads; within a single
+collection the files are hashed in parallel as well.
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .integrity import default_hash_workers, sha256_file, sha256_stream
+from .merkle import PROOF_NAME, check_proof, verify_statement_signature
+from .metrics import METRICS_FILE_NAME
+
+MANIFEST_NAME = "manifest.json"
+SIGNATURE_NAME = "manifest.sig"
+
+_EMAIL = re.compile(r"<([^<>]+)>")
+
+# Files a ZIP or run directory holds besides those manifest.json lists.
+_ZIP_EXTRAS = {MANIFEST_NAME, SIGNATURE_NAME, PROOF_NAME}
+_RUN_DIR_EXTRAS = _ZIP_EXTRAS | {
+    METRICS_FILE_NAME,
+    "alerts.ndjson",  # soclog detect (detect.ALERTS_FILE_NAME)
+    "ioc_hits.json",  # soclog ioc (ioc.IOC_HITS_FILE_NAME)
+}
+
+
+@dataclass
+class VerifyResult:
+    """Outcome of verifying one collection."""
+
+    path: Path
+    ok: bool = True
+    checked: int = 0
+    problems: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+    # "good", "bad", "wrong key" (valid, but not by the required key),
+    # "unavailable" (gpg missing) or None (no manifest.sig and no signed
+    # sweep proof, or signatures not checked)
+    signature: Optional[str] = None
+    # "good" or "bad" for a manifest.proof.json, None if there is none
+    proof: Optional[str] = None
+
+    def fail(self, message: str) -> None:
+        self.ok = False
+        self.problems.append(message)
+
+
+def find_collections(paths: Iterable[str]) -> List[Path]:
+    """
+    Expand the given paths into collections to verify.
+
+    A ZIP file or a directory holding manifest.json is a collection by
+    itself. Any other directory is searched recursively; ZIPs that sit
+    next to a manifest.json belong to that run directory and are not
+    listed separately.
+    """
+    found: List[Path] = []
+    for raw in paths:
+        path = Path(raw).expanduser()
+        if path.is_file():
+            found.append(path)
+            continue
+        if (path / MANIFEST_NAME).is_file():
+            found.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            if MANIFEST_NAME in files:
+                found.append(Path(root))
+                continue
+            found.extend(Path(root) / f for f in sorted(files) if f.endswith(".zip"))
+    return found
+
+
+def _zip_in_dir(directory: Path) -> Optional[Path]:
+    zips = sorted(directory.glob("soclog_*.zip")) or sorted(directory.glob("*.zip"))
+    return zips[0] if zips else None
+
+
+def read_manifest(collection: Path) -> Dict:
+    """manifest.json of a run directory or ZIP."""
+    if collection.is_dir():
+        with open(collection / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            return json.load(f)
+    with zipfile.ZipFile(collection) as zf, zf.open(MANIFEST_NAME) as f:
+        return json.load(f)
+
+
+@contextmanager
+def open_member(collection: Path, name: str) -> Iterator[IO[bytes]]:
+    """
+    Open an artefact of a collection for reading: the loose file in a run
+    directory, else the member of its ZIP (or of the ZIP itself).
+    """
+    if collection.is_dir() and (collection / name).is_file():
+        with open(collection / name, "rb") as f:
+            yield f
+        return
+    zip_path = _zip_in_dir(collection) if collection.is_dir() else collection
+    if zip_path is None:
+        raise OSError(f"{name} listed in manifest but not found")
+    with zipfile.ZipFile(zip_path) as zf:
+        try:
+            member = zf.open(name)
+        except KeyError:
+            raise OSError(f"{name} listed in manifest but not found") from None
+        with member:
+            yield member
+
+
+def _hash_zip_member(zip_path: Path, name: str) -> Tuple[int, str]:
+    # One ZipFile per call so members can be hashed from several threads.
+    with zipfile.ZipFile(zip_path) as zf:
+        info = zf.getinfo(name)
+        with zf.open(info) as f:
+            return info.file_size, sha256_stream(f)
+
+
+def _signed_by(status: str, gpg_key: str) -> bool:
+    """
+    True if gpg --status-fd output shows a valid signature by gpg_key: a
+    key ID or fingerprint (of the signing key or its primary key), or
+    the exact user ID or e-mail address.
+    """
+    want = gpg_key.strip().replace(" ", "").upper()
+    if want.startswith("0X"):
+        want = want[2:]
+    hex_id = len(want) >= 8 and all(c in "0123456789ABCDEF" for c in want)
+    for line in status.splitlines():
+        parts = line.split()
+        if parts[:2] == ["[GNUPG:]", "VALIDSIG"] and hex_id:
+            # VALIDSIG <fpr> ... <primary key fpr>
+            if any(fpr.upper().endswith(want) for fpr in parts[2:3] + parts[11:12]):
+                return True
+        elif parts[:2] == ["[GNUPG:]", "GOODSIG"] and len(parts) > 3:
+            uid = " ".join(parts[3:])
+            if gpg_key.strip().lower() in (uid.lower(), *_EMAIL.findall(uid.lower())):
+                return True
+    return False
+
+
+def _check_signature(manifest: Path, signature: Path, gpg_key: Optional[str] = None) -> str:
+    gpg = shutil.which("gpg")
+    if gpg is None:
+        return "unavailable"
+    proc = subprocess.run(
+        [gpg, "--batch", "--status-fd", "1", "--verify", str(signature), str(manifest)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return "bad"
+    if gpg_key and not _signed_by(proc.stdout, gpg_key):
+        return "wrong key"
+    return "good"
+
+
+def _check_proof(
+    result: VerifyResult,
+    proof_path: Path,
+    manifest_path: Path,
+    check_signature: bool,
+    gpg_key: Optional[str] = None,
+) -> bool:
+    """Check a sweep proof; return True if it carries a root signature."""
+    with open(proof_path, "r", encoding="utf-8") as f:
+        proof = json.load(f)
+    problem = check_proof(proof, sha256_file(str(manifest_path)))
+    result.proof = "bad" if problem else "good"
+    if problem:
+        result.fail(problem)
+        return False
+    if not proof.get("root_signature"):
+        return False
+    if check_signature and result.signature is None:
+        result.signature = verify_statement_signature(
+            proof, lambda statement, sig: _check_signature(statement, sig, gpg_key)
+        )
+        if result.signature == "bad":
+            result.fail("sweep root signature does not verify")
+    return True
+
+
+def verify_collection(
+    path: Path,
+    check_signature: bool = True,
+    workers: int = 1,
+    gpg_key: Optional[str] = None,
+) -> VerifyResult:
+    """
+    Verify one run directory or ZIP. Never raises for bad evidence.
+
+    With gpg_key, the collection fails unless its manifest.sig or sweep
+    root signature verifies and was made by that key.
+    """
+    path = Path(path)
+    result = VerifyResult(path=path)
+    tmp_dir = None
+    try:
+        if path.is_dir():
+            base_dir: Optional[Path] = path
+            zip_path = _zip_in_dir(path)
+            manifest_path = path / MANIFEST_NAME
+            signature_path: Optional[Path] = path / SIGNATURE_NAME
+            proof_path: Optional[Path] = path / PROOF_NAME
+        else:
+            base_dir = None
+            zip_path = path
+            # Pull manifest (signature, proof) out so gpg can read them.
+            tmp_dir = tempfile.mkdtemp(prefix="soclog-verify-")
+            with zipfile.ZipFile(zip_path) as zf:
+                names = set(zf.namelist())
+                if MANIFEST_NAME not in names:
+                    result.fail("manifest.json not found in ZIP")
+                    return result
+                zf.extract(MANIFEST_NAME, tmp_dir)
+                signature_path = None
+                if SIGNATURE_NAME in names:
+                    zf.extract(SIGNATURE_NAME, tmp_dir)
+                    signature_path = Path(tmp_dir) / SIGNATURE_NAME
+                # Sweeps before the proof went into the ZIP left it beside it.
+                proof_path = zip_path.parent / PROOF_NAME
+                if PROOF_NAME in names:
+                    zf.extract(PROOF_NAME, tmp_dir)
+                    proof_path = Path(tmp_dir) / PROOF_NAME
+            manifest_path = Path(tmp_dir) / MANIFEST_NAME
+
+        if not manifest_path.is_file():
+            result.fail("manifest.json not found")
+            return result
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        zip_names = set()
+        if zip_path is not None:
+            try:
+                with zipfile.ZipFile(zip_path) as zf:
+                    zip_names = set(zf.namelist())
+            except zipfile.BadZipFile as exc:
+                result.fail(f"unreadable ZIP {zip_path.name}: {exc}")
+                return result
+
+        def check(record: Dict) -> List[str]:
+            # Every copy is checked: the loose file and the ZIP member.
+            rel = record.get("relative_path") or record.get("file_name")
+            copies = []
+            problems = []
+            if base_dir is not None and (base_dir / rel).is_file():
+                loose = base_dir / rel
+                copies.append(("", lambda: (loose.stat().st_size, sha256_file(str(loose)))))
+            if zip_path is not None and rel in zip_names:
+                copies.append((" in ZIP", lambda: _hash_zip_member(zip_path, rel)))
+            elif zip_path is not None:
+                problems.append(f"{rel}: missing from ZIP")
+            if not copies and not problems:
+                problems.append(f"{rel}: missing")
+            for where, measure in copies:
+                try:
+                    size, digest = measure()
+                except (OSError, zipfile.BadZipFile) as exc:
+                    problems.append(f"{rel}{where}: unreadable ({exc})")
+                    continue
+                if size != record.get("size_bytes"):
+                    problems.append(f"{rel}{where}: size {size} != {record.get('size_bytes')}")
+                elif digest != str(record.get("sha256", "")).lower():
+                    problems.append(f"{rel}{where}: SHA-256 mismatch")
+            return problems
+
+        records = manifest.get("files", [])
+        if workers > 1 and len(records) > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(records))) as pool:
+                outcomes = list(pool.map(check, records))
+        else:
+            outcomes = [check(r) for r in records]
+
+        for record, problems in zip(records, outcomes):
+            result.checked += 1
+            for problem in problems:
+                result.fail(problem)
+            if not problems and record.get("partial"):
+                result.warnings.append(
+                    f"{record.get('relative_path')}: collected partially (matches manifest)"
+                )
+
+        listed = {r.get("relative_path") or r.get("file_name") for r in records}
+        for problem in _unlisted_files(base_dir, zip_path, zip_names, listed):
+            result.fail(problem)
+
+        signed = signature_path is not None and signature_path.is_file()
+        if check_signature and signed:
+            result.signature = _check_signature(manifest_path, signature_path, gpg_key)
+            if result.signature == "bad":
+                result.fail("manifest.sig does not verify")
+
+        if proof_path.is_file():
+            # An unsigned proof only shows the manifest matches the
+            # proof, which anyone able to edit the run can rewrite.
+            signed = _check_proof(result, proof_path, manifest_path, check_signature, gpg_key) or signed
+        _judge_signature(result, signed, check_signature, gpg_key)
+    except (OSError, ValueError, zipfile.BadZipFile) as exc:
+        result.fail(f"cannot verify: {exc}")
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return result
+
+
+def _unlisted_files(
+    base_dir: Optional[Path], zip_path: Optional[Path], zip_names: set, listed: set
+) -> List[str]:
+    """
+    Problems for files of the collection that manifest.json does not
+    list, and for manifest, signature or proof copies in the run
+    directory and its ZIP that differ from each other.
+    """
+    problems = []
+    for name in sorted(zip_names - listed - _ZIP_EXTRAS):
+        if not name.endswith("/"):
+            problems.append(f"{name}: in ZIP but not listed in manifest.json")
+    if base_dir is None:
+        return problems
+    for path in sorted(p for p in base_dir.rglob("*") if p.is_file()):
+        rel = path.relative_to(base_dir).as_posix()
+        if rel in listed or rel in _RUN_DIR_EXTRAS or path == zip_path:
+            continue
+        problems.append(f"{rel}: not listed in manifest.json")
+    for name in sorted(_ZIP_EXTRAS & zip_names):
+        loose = base_dir / name
+        if loose.is_file() and sha256_file(str(loose)) != _hash_zip_member(zip_path, name)[1]:
+            problems.append(f"{name} in ZIP differs from the copy in the run directory")
+    return problems
+
+
+def _judge_signature(
+    result: VerifyResult, signed: bool, check_signature: bool, gpg_key: Optional[str]
+) -> None:
+    """Warn (or, with a required key, fail) unless a signature checked out."""
+    if not signed:
+        problem = "unsigned: no manifest.sig and no signed manifest.proof.json"
+    elif not check_signature or result.signature in ("good", "bad"):
+        return
+    elif result.signature == "wrong key":
+        result.fail(f"signature is valid but not made by {gpg_key}")
+        return
+    else:
+        problem = "signature not checked: gpg not found"
+    if gpg_key:
+        result.fail(problem)
+    else:
+        result.warnings.append(problem)
+
+
+def verify_many(
+    paths: Iterable[str],
+    check_signature: bool = True,
+    workers: Optional[int] = None,
+    gpg_key: Optional[str] = None,
+) -> List[VerifyResult]:
+    """
+    Verify every collection found under paths, in parallel.
+
+    Results are returned in discovery order.
+    """
+    collections = find_collections(paths)
+    workers = workers or default_hash_workers()
+    if len(collections) == 1:
+        return [verify_collection(collections[0], check_signature, workers, gpg_key)]
+    if workers <= 1:
+        return [verify_collection(c, check_signature, gpg_key=gpg_key) for c in collections]
+    with ThreadPoolExecutor(
+        max_workers=min(workers, len(collections)) or 1,
+        thread_name_prefix="soclog-verify",
+    ) as pool:
+        return list(
+            pool.map(lambda c: verify_collection(c, check_signature, gpg_key=gpg_key), collections)
+        )
@@ -1,13 +1,141 @@
+import base64
 import getpass
-from typing import Optional
+import gzip
+import inspect
+import random
+import threading
+import time
+import warnings
+from typing import Dict, Optional
 
-import winrm
+from .defaults import DEFAULT_RETRIES
+from .metrics import record
+
+# Prefix of the single output line produced by a gzip-wrapped script.
+GZIP_WIRE_MARKER = "SOCLOG-GZ:"
+
+# Runs the original script in a child scope, joins its output lines and
+# returns them gzip-compressed and base64-encoded on one line. Scripts
+# must use "return" rather than "exit" so the wrapper gets to run.
+_GZIP_WRAPPER = """
+$__soclogLines = & {{
+{script}
+}}
+$__soclogText = (@($__soclogLines) | ForEach-Object {{ "$_" }}) -join "`n"
+$__soclogBytes = [System.Text.Encoding]::UTF8.GetBytes($__soclogText)
+$__soclogBuffer = New-Object System.IO.MemoryStream
+$__soclogGzip = New-Object System.IO.Compression.GZipStream($__soclogBuffer, [System.IO.Compression.CompressionMode]::Compress)
+$__soclogGzip.Write($__soclogBytes, 0, $__soclogBytes.Length)
+$__soclogGzip.Close()
+Write-Output ("{marker}" + [Convert]::ToBase64String($__soclogBuffer.ToArray()))
+"""
+
+
+def decode_wire_output(stdout: str) -> str:
+    """
+    Expand gzip-wrapped output lines back into plain text.
+
+    Lines without the marker are passed through unchanged, so this is
+    safe to call on output from scripts that were not wrapped.
+    """
+    if GZIP_WIRE_MARKER not in stdout:
+        return stdout
+    parts = []
+    for line in stdout.splitlines():
+        line = line.strip()
+        if line.startswith(GZIP_WIRE_MARKER):
+            raw = base64.b64decode(line[len(GZIP_WIRE_MARKER):])
+            parts.append(gzip.decompress(raw).decode("utf-8", errors="replace"))
+        elif line:
+            parts.append(line)
+    return "\n".join(parts)
 
 
 class WindowsRemoteError(Exception):
     """Custom exception for Windows remote errors."""
 
 
+class WindowsRemoteTimeout(WindowsRemoteError):
+    """A command ran past its timeout or the client's deadline."""
+
+
+# Seconds a persistent shell may sit unused before it is replaced by a
+# fresh one on the next command. WinRM's own shell IdleTimeout defaults
+# to two hours; staying well below it avoids reusing a shell the server
+# is about to reap.
+DEFAULT_IDLE_TIMEOUT = 300
+
+# Retries after a transient transport error (DEFAULT_RETRIES), and the
+# backoff between them: a random delay of up to BACKOFF_BASE * 2**attempt
+# seconds ("full jitter"), capped at BACKOFF_MAX, so hosts that failed
+# together do not all retry at the same moment.
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 15.0
+
+
+def _import_winrm():
+    """
+    Import pywinrm on first use.
+
+    pywinrm pulls in requests, spnego and cryptography, which take a
+    while to load; commands that never connect (--help, --version,
+    verify, query, report) should not pay for them.
+    """
+    # Hide spnego's ARC4 deprecation noise.
+    try:
+        from cryptography.utils import CryptographyDeprecationWarning
+
+        warnings.filterwarnings("ignore", category=CryptographyDeprecationWarning)
+    except Exception:
+        # If cryptography layout changes, just ignore
+        pass
+    import winrm
+
+    return winrm
+
+
+# Per pywinrm Protocol class: does close_shell() take close_session?
+_CLOSE_SESSION_PARAM: Dict[type, bool] = {}
+
+
+def _keep_session_kwargs(protocol) -> Dict[str, bool]:
+    """
+    Keyword arguments that make Protocol.close_shell() leave the HTTP(S)
+    session open. pywinrm 0.4.2+ closes it by default (close_session=True);
+    older releases never close it and do not take the argument.
+    """
+    cls = type(protocol)
+    if cls not in _CLOSE_SESSION_PARAM:
+        try:
+            params = inspect.signature(protocol.close_shell).parameters
+        except (TypeError, ValueError):
+            params = {}
+        _CLOSE_SESSION_PARAM[cls] = "close_session" in params
+    return {"close_session": False} if _CLOSE_SESSION_PARAM[cls] else {}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    True for errors worth retrying in a fresh shell: dropped or refused
+    connections, HTTP read timeouts, 5xx responses and shells the server
+    no longer knows about. Authentication failures, bad requests and
+    command timeouts are not retried.
+    """
+    import requests
+    from winrm.exceptions import WinRMError, WinRMTransportError
+
+    if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(exc, WinRMTransportError):
+        code = getattr(exc, "code", None)
+        return code is None or code >= 500
+    if isinstance(exc, WinRMError):
+        # e.g. "The request for the Windows Remote Shell with ShellId ...
+        # failed because the shell was not found on the server."
+        return "shell" in str(exc).lower() and "not found" in str(exc).lower()
+    return False
+
+
 class WindowsRemote:
     """
     Small wrapper around pywinrm to run PowerShell on a remote Windows host.
@@ -15,6 +143,22 @@ class WindowsRemote:
     For our use case:
       - We use HTTP WinRM (port 5985) in a lab environment.
       - Authentication: basic (username + password).
+
+    With gzip_wire=True every script's output is gzip-compressed and
+    base64-encoded on the endpoint and expanded again by run_powershell(),
+    which cuts WinRM traffic several-fold for JSON-heavy output.
+
+    The client keeps one remote shell open and runs every script in it,
+    over the same keep-alive HTTP(S) connection, instead of creating and
+    deleting a shell per command. A shell idle for longer than
+    idle_timeout seconds is replaced, and a command that fails at the
+    transport level is retried in a new shell (up to `retries` times,
+    with jittered exponential backoff). Use the client as a context
+    manager, or call close(), to delete the shell when done.
+
+    Every command has a timeout, and `deadline` (a time.monotonic()
+    value, or None) caps all commands of the client and its clones: once
+    it has passed, run_powershell() raises WindowsRemoteTimeout.
     """
 
     def __init__(
@@ -26,6 +170,10 @@ class WindowsRemote:
         port: Optional[int] = None,
         verify_ssl: bool = False,
         ask_password_if_missing: bool = False,
+        gzip_wire: bool = False,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        deadline: Optional[float] = None,
     ) -> None:
         self.host = host
         self.username = username
@@ -47,37 +195,219 @@ class WindowsRemote:
         self.url = f"{scheme}://{host}:{port}/wsman"
         self.username = username
         self.password = password
+        self.use_https = use_https
+        self.port = port
         self.verify_ssl = verify_ssl
+        self.gzip_wire = gzip_wire
+        self.idle_timeout = idle_timeout
+        self.retries = retries
+        self.deadline = deadline
+
+        # Persistent shell state. One command runs at a time per client;
+        # ShellPool clones the client for concurrent work.
+        self._shell_id: Optional[str] = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
 
         # auth: basic is simplest for lab (over HTTP, inside isolated network)
-        self.session = winrm.Session(
+        self.session = _import_winrm().Session(
             self.url,
             auth=(self.username, self.password),
             server_cert_validation="validate" if verify_ssl else "ignore",
         )
 
-        def run_powershell(self, script: str, timeout: int = 120):
+    def clone(self) -> "WindowsRemote":
+        """
+        Return a new client for the same host and credentials.
+
+        The clone has its own pywinrm session, so it can run commands in a
+        separate remote shell at the same time as the original.
+        """
+        return WindowsRemote(
+            host=self.host,
+            username=self.username,
+            password=self.password,
+            use_https=self.use_https,
+            port=self.port,
+            verify_ssl=self.verify_ssl,
+            gzip_wire=self.gzip_wire,
+            idle_timeout=self.idle_timeout,
+            retries=self.retries,
+            deadline=self.deadline,
+        )
+
+    def __enter__(self) -> "WindowsRemote":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Delete the remote shell and drop the HTTP(S) connection.
+
+        Safe to call more than once; the client reconnects if it is used
+        again afterwards.
+        """
+        with self._lock:
+            self._close_shell()
+            transport_session = getattr(self.session.protocol.transport, "session", None)
+            if transport_session is not None:
+                transport_session.close()
+                self.session.protocol.transport.session = None
+
+    def release_shell(self) -> None:
+        """
+        Delete the remote shell but keep the HTTP(S) connection, e.g.
+        between runs far enough apart that the shell would go idle.
+        """
+        with self._lock:
+            self._close_shell()
+
+    def _close_shell(self) -> None:
+        shell_id, self._shell_id = self._shell_id, None
+        if shell_id is None:
+            return
+        protocol = self.session.protocol
+        try:
+            # Only close() drops the connection; replacing, retrying or
+            # releasing a shell keeps it for the next one.
+            protocol.close_shell(shell_id, **_keep_session_kwargs(protocol))
+        except Exception:
+            # Shell already gone (idle-reaped, host rebooted, network
+            # down); the server cleans it up on its own.
+            pass
+
+    def _shell(self) -> str:
+        if self._shell_id is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self._close_shell()
+        if self._shell_id is None:
+            self._shell_id = self.session.protocol.open_shell()
+        return self._shell_id
+
+    def _run_in_shell(self, script: str, deadline: float):
+        """Run script via powershell -EncodedCommand in the persistent shell."""
+        encoded = base64.b64encode(script.encode("utf_16_le")).decode("ascii")
+        protocol = self.session.protocol
+        shell_id = self._shell()
+        command_id = protocol.run_command(shell_id, f"powershell -encodedcommand {encoded}")
+        try:
+            return self._command_output(shell_id, command_id, deadline)
+        finally:
+            self._last_used = time.monotonic()
+            try:
+                protocol.cleanup_command(shell_id, command_id)
+            except Exception:
+                pass
+
+    def _command_output(self, shell_id: str, command_id: str, deadline: float):
+        """
+        Poll for a command's output until it finishes or deadline passes.
+
+        Same as Protocol.get_command_output(), which polls forever, but
+        checks the deadline after every receive. Each receive returns
+        after at most the pywinrm operation timeout (20s by default), so
+        that is how far a timeout can overshoot.
+        """
+        from winrm.exceptions import WinRMOperationTimeoutError
+
+        protocol = self.session.protocol
+        receive = getattr(protocol, "get_command_output_raw", None) or getattr(
+            protocol, "_raw_get_command_output"
+        )
+        stdout, stderr = [], []
+        while True:
+            try:
+                out, err, status_code, done = receive(shell_id, command_id)
+                stdout.append(out)
+                stderr.append(err)
+                if done:
+                    return b"".join(stdout), b"".join(stderr), status_code
+            except WinRMOperationTimeoutError:
+                # No output yet; the command is still running.
+                pass
+            if time.monotonic() >= deadline:
+                raise WindowsRemoteTimeout("command timed out")
+
+    def _backoff(self, attempt: int, deadline: float) -> None:
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            raise WindowsRemoteTimeout("no time left to retry")
+        time.sleep(delay)
+
+    def run_powershell(self, script: str, timeout: int = 120):
         """
         Execute a PowerShell script remotely and return (status_code, stdout, stderr).
 
-        NOTE: The current python3-winrm package on Kali does not accept a
-        'timeout' argument for run_ps(), so we ignore the timeout parameter
-        here and rely on the library defaults.
+        The script runs in the client's persistent shell (see the class
+        docstring). It is given `timeout` seconds, or less if the client's
+        deadline comes first; when time runs out the remote shell (and the
+        command in it) is deleted and WindowsRemoteTimeout is raised.
+        Transient transport errors are retried with backoff within the
+        same time limit.
 
-        stdout and stderr are returned as decoded text (UTF-8).
+        stdout and stderr are returned as decoded text (UTF-8). In gzip_wire
+        mode the script is wrapped so its output travels compressed; the
+        returned stdout is already expanded.
         """
+        if self.gzip_wire:
+            script = _GZIP_WRAPPER.format(script=script, marker=GZIP_WIRE_MARKER)
+        deadline = time.monotonic() + timeout
+        budget_limited = self.deadline is not None and self.deadline < deadline
+        if budget_limited:
+            deadline = self.deadline
+        started = time.perf_counter()
         try:
-            # Do NOT pass timeout here – older python3-winrm doesn't support it
-            result = self.session.run_ps(script)
-        except Exception as exc:  # broad but fine for outer boundary
-            raise WindowsRemoteError(f"Failed to run PowerShell: {exc}") from exc
-
-        stdout = result.std_out.decode("utf-8", errors="replace") if isinstance(
-            result.std_out, (bytes, bytearray)
-        ) else result.std_out
-        stderr = result.std_err.decode("utf-8", errors="replace") if isinstance(
-            result.std_err, (bytes, bytearray)
-        ) else result.std_err
-
-        return result.status_code, stdout, stderr
+            with self._lock:
+                attempt = 0
+                try:
+                    if time.monotonic() >= deadline:
+                        raise WindowsRemoteTimeout("no time left")
+                    while True:
+                        try:
+                            std_out, std_err, status_code = self._run_in_shell(script, deadline)
+                            break
+                        except WindowsRemoteTimeout:
+                            raise
+                        except Exception as exc:
+                            # Stale shell or dropped connection: the next try
+                            # starts over with a fresh shell.
+                            self._close_shell()
+                            if attempt >= self.retries or not is_retryable(exc):
+                                raise
+                            self._backoff(attempt, deadline)
+                            attempt += 1
+                except WindowsRemoteTimeout as exc:
+                    self._close_shell()
+                    limit = "host time budget exhausted" if budget_limited else f"timed out after {timeout}s"
+                    raise WindowsRemoteTimeout(f"PowerShell {limit} ({exc})") from exc
+                except Exception as exc:  # broad but fine for outer boundary
+                    self._close_shell()
+                    tries = f" after {attempt + 1} attempts" if attempt else ""
+                    raise WindowsRemoteError(f"Failed to run PowerShell{tries}: {exc}") from exc
+        finally:
+            # Failed and timed-out commands count too: that time was spent.
+            record(winrm_s=time.perf_counter() - started, winrm_commands=1)
+
+        record(winrm_bytes=len(std_out or b"") + len(std_err or b""))
+
+        # PowerShell reports errors on stderr as CLIXML; run_ps() used to
+        # turn that into plain text for us.
+        if std_err and hasattr(self.session, "_clean_error_msg"):
+            std_err = self.session._clean_error_msg(std_err)
+
+        stdout = std_out.decode("utf-8", errors="replace") if isinstance(
+            std_out, (bytes, bytearray)
+        ) else std_out
+        stderr = std_err.decode("utf-8", errors="replace") if isinstance(
+            std_err, (bytes, bytearray)
+        ) else std_err
+
+        if self.gzip_wire:
+            try:
+                stdout = decode_wire_output(stdout)
+            except (ValueError, OSError, EOFError) as exc:
+                raise WindowsRemoteError(f"Corrupt compressed output: {exc}") from exc
+
+        return status_code, stdout, stderr
 
@@ -0,0 +1,38 @@
+import json
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from soclog.integrity import sha256_file
+
+
+def write_run(run_dir: Path, host: str, artefacts: Dict[str, List[Dict]]) -> Path:
+    """
+    Write a minimal run directory: each artefact as NDJSON plus a
+    manifest.json listing it, as a collection run would.
+    """
+    run_dir.mkdir(parents=True, exist_ok=True)
+    files = []
+    for name, items in artefacts.items():
+        path = run_dir / name
+        path.write_text("".join(json.dumps(item) + "\n" for item in items), encoding="utf-8")
+        files.append(
+            {
+                "file_name": name,
+                "relative_path": name,
+                "size_bytes": path.stat().st_size,
+                "sha256": sha256_file(str(path)),
+            }
+        )
+    manifest = {"host": host, "generated_at_utc": "2026-01-01T00:00:00+00:00", "files": files}
+    (run_dir / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+    return run_dir
+
+
+@pytest.fixture
+def make_run(tmp_path):
+    def make(name: str, host: str, artefacts: Dict[str, List[Dict]]) -> Path:
+        return write_run(tmp_path / "out" / host / name, host, artefacts)
+
+    return make
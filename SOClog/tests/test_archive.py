@@ -0,0 +1,26 @@
+import zipfile
+
+import pytest
+
+from soclog.archive import ArtifactSink
+
+
+def test_no_zip_is_left_when_nothing_was_written(tmp_path):
+    sink = ArtifactSink(tmp_path, tmp_path / "run.zip")
+    assert sink.close() is None
+    assert not (tmp_path / "run.zip").exists()
+
+
+@pytest.mark.parametrize("keep_loose", [True, False])
+def test_partial_artefact_is_kept_and_zipped(tmp_path, keep_loose):
+    sink = ArtifactSink(tmp_path, tmp_path / "run.zip", keep_loose=keep_loose)
+    with pytest.raises(RuntimeError):
+        with sink.open("security_events.ndjson") as f:
+            f.write(b'{"Id": 4624}\n')
+            raise RuntimeError("connection dropped")
+    assert sink.close() == tmp_path / "run.zip"
+    (record,) = sink.records
+    assert record["partial"] is True
+    with zipfile.ZipFile(tmp_path / "run.zip") as zf:
+        assert zf.read("security_events.ndjson") == b'{"Id": 4624}\n'
+    assert (tmp_path / "security_events.ndjson").exists() == keep_loose
@@ -0,0 +1,49 @@
+import io
+
+from soclog.artifacts import iter_events, open_event_writer
+from soclog.columnar import ColumnarReader, ColumnarWriter
+
+EVENTS = [
+    {
+        "TimeCreated": "2026-01-01T10:00:00.1234567Z",
+        "RecordId": 1,
+        "Id": 4624,
+        "LevelDisplayName": "Information",
+        "ProviderName": "Microsoft-Windows-Security-Auditing",
+        "MachineName": "win11",
+        "Message": "An account was successfully logged on.",
+        "EventData": {"LogonType": 3, "IpAddress": "10.0.0.5"},
+    },
+    # Values the typed columns cannot hold as they are.
+    {"TimeCreated": "/Date(1767261600123)/", "RecordId": "2", "Id": 4625, "Message": None},
+    {"TimeCreated": "2026-01-01T10:00:01+00:00", "RecordId": 3.0, "Id": True, "MachineName": 7},
+    {"TimeCreated": "not a time", "RecordId": "x", "Id": None, "Task": 12544},
+    {"message": "No Security events found in the selected time window."},
+]
+
+
+def _read_back(fmt, tmp_path):
+    path = tmp_path / f"events.{fmt}"
+    with open_event_writer(path, fmt) as writer:
+        writer.write_many(EVENTS)
+        writer.finish({})
+    return list(iter_events(path))
+
+
+def test_columnar_round_trips_like_ndjson(tmp_path):
+    ndjson = _read_back("ndjson", tmp_path)
+    assert ndjson == EVENTS
+    assert _read_back("columnar", tmp_path) == ndjson
+
+
+def test_time_keeps_all_seven_fractional_digits():
+    buf = io.BytesIO()
+    writer = ColumnarWriter(buf)
+    writer.write(EVENTS[0])
+    writer.finish()
+    reader = ColumnarReader(buf)
+    # Exact in the typed column, so nothing is duplicated into _extra.
+    assert reader.read_columns(["_extra"]) == {"_extra": [None]}
+    assert next(reader.iter_rows(["TimeCreated"])) == {"TimeCreated": EVENTS[0]["TimeCreated"]}
+    # read_columns() still gives microseconds.
+    assert reader.read_columns(["TimeCreated"])["TimeCreated"] == [1767261600123456]
@@ -0,0 +1,116 @@
+import pytest
+
+from soclog.detect import RuleError, RuleSet, _EventView, compile_rule, message_fields
+
+
+def rule(detection, **extra):
+    return compile_rule({"title": "test", "logsource": {"service": "sysmon"}, "detection": detection, **extra})
+
+
+def sysmon(event_id=1, **data):
+    return {"Id": event_id, "Message": "Process Create:", "EventData": data}
+
+
+def _view(event):
+    return _EventView(event)
+
+
+def test_and_or_not_and_parentheses():
+    r = rule(
+        {
+            "sel": {"EventID": 1, "Image|endswith": "\\powershell.exe"},
+            "enc": {"CommandLine|contains": " -enc "},
+            "legit": {"ParentImage|endswith": "\\sccm.exe"},
+            "condition": "sel and (enc or not legit)",
+        }
+    )
+    encoded = sysmon(
+        Image="C:\\Windows\\powershell.exe", ParentImage="C:\\sccm.exe", CommandLine="powershell -enc AAA"
+    )
+    assert r.matcher(_view(encoded))
+    assert r.matcher(_view(sysmon(Image="C:\\Windows\\powershell.exe", ParentImage="C:\\explorer.exe")))
+    assert not r.matcher(_view(sysmon(Image="C:\\Windows\\powershell.exe", ParentImage="C:\\sccm.exe")))
+    assert not r.matcher(_view(sysmon(event_id=3, Image="C:\\Windows\\powershell.exe")))
+
+
+def test_one_of_and_all_of_patterns():
+    detection = {
+        "selection_img": {"Image|endswith": "\\rundll32.exe"},
+        "selection_cmd": {"CommandLine|contains": "javascript:"},
+        "_helper": {"User": "SYSTEM"},
+    }
+    any_rule = rule({**detection, "condition": "1 of selection_*"})
+    all_rule = rule({**detection, "condition": "all of selection_*"})
+    them = rule({**detection, "condition": "all of them"})
+    both = sysmon(Image="C:\\rundll32.exe", CommandLine="rundll32 javascript:alert")
+    one = sysmon(Image="C:\\rundll32.exe", CommandLine="rundll32 shell32.dll")
+    assert any_rule.matcher(_view(one)) and any_rule.matcher(_view(both))
+    assert all_rule.matcher(_view(both)) and not all_rule.matcher(_view(one))
+    # "them" leaves out selections whose names start with "_".
+    assert them.matcher(_view(both))
+
+
+@pytest.mark.parametrize(
+    "spec, value, expected",
+    [
+        ({"Image|contains": "MIMI"}, "C:\\tools\\mimikatz.exe", True),
+        ({"Image|startswith": "c:\\windows\\"}, "C:\\Windows\\x.exe", True),
+        ({"Image|startswith": "c:\\windows\\"}, "D:\\Windows\\x.exe", False),
+        ({"Image|endswith": [".ps1", ".vbs"]}, "C:\\a.VBS", True),
+        ({"Image": "*\\temp\\*.exe"}, "C:\\Users\\x\\Temp\\a.exe", True),
+        ({"Image": "C:\\a?.exe"}, "c:\\ab.exe", True),
+        ({"Image|re": "^C:\\\\[a-z]+\\.exe$"}, "C:\\abc.exe", True),
+        # |re is case-sensitive.
+        ({"Image|re": "^c:"}, "C:\\abc.exe", False),
+        ({"CommandLine|contains|all": ["-nop", "-w hidden"]}, "ps -NoP -w normal", False),
+        ({"CommandLine|contains|all": ["-nop", "-w hidden"]}, "ps -NoP -W Hidden", True),
+        ({"Image": None}, None, True),
+    ],
+)
+def test_modifiers(spec, value, expected):
+    r = rule({"sel": spec, "condition": "sel"})
+    data = {} if value is None else {"Image": value, "CommandLine": value}
+    assert bool(r.matcher(_view(sysmon(**data)))) is expected
+
+
+def test_keywords_and_message_fields():
+    r = rule({"keywords": ["sekurlsa::", "lsadump::"], "condition": "keywords"})
+    assert r.matcher(_view({"Id": 1, "Message": "cmd: mimikatz SEKURLSA::logonpasswords"}))
+    assert not r.matcher(_view({"Id": 1, "Message": "cmd: whoami"}))
+
+    fields = rule({"sel": {"Image|endswith": "\\cmd.exe"}, "condition": "sel"})
+    message = "Process Create:\r\nRuleName: -\r\nImage: C:\\Windows\\System32\\cmd.exe\r\n"
+    assert message_fields(message)["Image"] == "C:\\Windows\\System32\\cmd.exe"
+    assert fields.matcher(_view({"Id": 1, "Message": message}))
+
+
+def test_event_id_bucketing():
+    narrow = rule({"sel": {"EventID": [1, 3]}, "condition": "sel"})
+    negated = rule({"sel": {"EventID": 1}, "condition": "not sel"})
+    either = rule({"a": {"EventID": 1}, "b": {"Image": "x"}, "condition": "a or b"})
+    category = compile_rule(
+        {
+            "title": "c",
+            "logsource": {"category": "dns_query"},
+            "detection": {"sel": {"QueryName|endswith": ".onion"}, "condition": "sel"},
+        }
+    )
+    assert narrow.event_ids == {1, 3}
+    assert negated.event_ids is None
+    assert either.event_ids is None
+    assert category.service == "sysmon" and category.event_ids == {22}
+
+    ruleset = RuleSet([narrow, negated, category])
+    assert ruleset.candidates("sysmon", 3) == [narrow, negated]
+    assert ruleset.candidates("sysmon", 22) == [category, negated]
+    assert ruleset.candidates("security", 4624) == []
+    assert ruleset.match("sysmon", {"Id": 22, "EventData": {"QueryName": "abc.onion"}}) == [category, negated]
+
+
+@pytest.mark.parametrize(
+    "condition",
+    ["sel and", "sel or missing", "(sel", "1 of nothing_*", "sel sel"],
+)
+def test_bad_conditions_are_rejected(condition):
+    with pytest.raises(RuleError):
+        rule({"sel": {"EventID": 1}, "condition": condition})
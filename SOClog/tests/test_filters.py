@@ -0,0 +1,126 @@
+import re
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from soclog.collectors import _fetch_page
+from soclog.filters import MAX_IDS_PER_SELECT, EventFilter, merge_filters, parse_filters, parse_ids
+
+CLAUSE = "EventRecordID>10 and EventRecordID<=99"
+
+
+def queries(flt, log_name="Security"):
+    root = ET.fromstring(flt.query_xml(log_name, CLAUSE))
+    query = root.find("Query")
+    assert query.get("Path") == log_name
+    for node in query:
+        assert node.get("Path") == log_name
+    return [n.text for n in query.findall("Select")], [n.text for n in query.findall("Suppress")]
+
+
+def test_parse_ids():
+    assert parse_ids(4625) == [(4625, 4625)]
+    assert parse_ids("4624, 4720-4738") == [(4624, 4624), (4720, 4738)]
+    assert parse_ids([1, "3-5"]) == [(1, 1), (3, 5)]
+    assert parse_ids(None) == []
+
+
+@pytest.mark.parametrize("value", ["abc", "10-5", "70000", "-1"])
+def test_parse_ids_rejects_bad_values(value):
+    with pytest.raises(ValueError):
+        parse_ids(value)
+
+
+def test_empty_filter_selects_everything_in_the_record_range():
+    selects, suppresses = queries(EventFilter())
+    assert selects == [f"*[System[{CLAUSE}]]"]
+    assert suppresses == []
+
+
+def test_include_ranges_providers_and_xpath():
+    flt = EventFilter.from_dict(
+        {
+            "include_ids": "4624,4720-4738",
+            "providers": ["Microsoft-Windows-Security-Auditing"],
+            "xpath": "*[EventData[Data[@Name='LogonType']='3']]",
+        }
+    )
+    selects, _ = queries(flt)
+    assert selects == [
+        f"*[System[{CLAUSE} and (EventID=4624 or (EventID>=4720 and EventID<=4738))"
+        " and Provider[@Name='Microsoft-Windows-Security-Auditing']]"
+        " and (EventData[Data[@Name='LogonType']='3'])]"
+    ]
+
+
+def test_long_allowlists_and_denylists_are_split():
+    ids = list(range(1, 2 * MAX_IDS_PER_SELECT + 6))
+    flt = EventFilter(
+        include_ids=[(i, i) for i in ids],
+        exclude_ids=[(i, i) for i in range(5000, 5000 + MAX_IDS_PER_SELECT + 1)],
+        xpath="EventData[Data='x']",
+    )
+    selects, suppresses = queries(flt)
+    assert len(selects) == 3 and len(suppresses) == 2
+    assert all(q.count("EventID=") <= MAX_IDS_PER_SELECT for q in selects + suppresses)
+    # Every Select keeps the record range and the predicate.
+    for q in selects:
+        assert q.startswith(f"*[System[{CLAUSE} and (") and q.endswith(" and (EventData[Data='x'])]")
+    selected = sorted(int(i) for q in selects for i in re.findall(r"EventID=(\d+)", q))
+    assert selected == ids
+    assert suppresses[0].startswith("*[System[EventID=5000 or ")
+
+
+def test_query_xml_escapes_markup():
+    flt = EventFilter(xpath="EventData[Data[@Name='Size']>5 and Data<'a&b']")
+    text = flt.query_xml('Microsoft-Windows-Sysmon/Operational"', CLAUSE)
+    assert "&gt;5" in text and "&lt;'a&amp;b'" in text
+    selects, _ = queries(flt, 'Microsoft-Windows-Sysmon/Operational"')
+    assert selects[0].endswith(" and (EventData[Data[@Name='Size']>5 and Data<'a&b'])]")
+
+
+def test_from_dict_errors_name_the_location():
+    with pytest.raises(ValueError, match="hosts.dc01.security: unknown key"):
+        EventFilter.from_dict({"ids": [1]}, "hosts.dc01.security")
+    with pytest.raises(ValueError, match="may not contain a quote"):
+        EventFilter.from_dict({"providers": "O'Brien"})
+    with pytest.raises(ValueError, match="unknown log"):
+        parse_filters({"system": {}}, "profile")
+
+
+def test_merge_filters_overrides_per_field():
+    profile = parse_filters({"security": {"include_ids": "4624-4625", "providers": "A"}}, "profile")
+    host = parse_filters({"security": {"include_ids": 4688}, "sysmon": {}}, "host")
+    merged = merge_filters(profile, host, None)
+    assert list(merged) == ["security"]
+    assert merged["security"].include_ids == [(4688, 4688)]
+    assert merged["security"].providers == ["A"]
+    assert merged["security"].to_dict() == {"include_ids": [4688], "providers": ["A"]}
+
+
+class ScriptRecorder:
+    def __init__(self):
+        self.scripts = []
+
+    def run_powershell(self, script):
+        self.scripts.append(script)
+        return 0, "", ""
+
+
+def test_fetch_page_time_clause():
+    client = ScriptRecorder()
+    _fetch_page(client, "Security", 10, 99, "2024-05-01T00:00:00", 500, end_time="2024-05-01T06:00:00")
+    assert (
+        '-FilterXPath "*[System[EventRecordID>10 and EventRecordID<=99 and '
+        "TimeCreated[@SystemTime>='2024-05-01T00:00:00.000Z' and @SystemTime<'2024-05-01T06:00:00.000Z']]]\""
+    ) in client.scripts[0]
+    assert "-MaxEvents 500 -Oldest" in client.scripts[0]
+
+
+def test_fetch_page_uses_structured_query_when_filtered():
+    client = ScriptRecorder()
+    flt = EventFilter(exclude_ids=[(4634, 4634)])
+    _fetch_page(client, "Security", 0, 5, None, 100, event_filter=flt)
+    script = client.scripts[0]
+    assert "-FilterXml ([xml]$query)" in script and "-FilterXPath" not in script
+    assert flt.query_xml("Security", "EventRecordID>0 and EventRecordID<=5") in script
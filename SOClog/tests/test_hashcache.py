@@ -0,0 +1,34 @@
+from soclog.hashcache import HashCacheStore, key_digest, known_digests, resolve_hashes
+
+KEY = "C:\\Windows\\System32\\svchost.exe|57360|133800000000000000"
+
+
+def test_known_digests_are_fixed_width():
+    digests = known_digests({KEY: "AA", KEY + "x": "BB"})
+    assert len(digests) == 2 * len(key_digest(KEY))
+    assert digests.startswith(key_digest(KEY))
+
+
+def test_resolve_fills_cached_hashes_and_marks_them():
+    procs = [
+        {"PID": 1, "Path": "a", "HashSHA256": None, "HashKey": KEY},
+        {"PID": 2, "Path": "b", "HashSHA256": "CC", "HashKey": "b|1|2"},
+        {"PID": 3, "Path": None, "HashSHA256": None},
+    ]
+    seen = resolve_hashes(procs, {KEY: "AA", "stale|1|1": "DD"})
+    assert procs[0] == {"PID": 1, "Path": "a", "HashSHA256": "AA", "HashCached": True}
+    assert procs[1]["HashCached"] is False and "HashKey" not in procs[1]
+    assert "HashCached" not in procs[2]
+    # Only this run's executables are kept.
+    assert seen == {KEY: "AA", "b|1|2": "CC"}
+
+
+def test_store_keeps_one_entry_set_per_host(tmp_path):
+    path = tmp_path / "cache.json"
+    store = HashCacheStore(path)
+    store.update("win10", {KEY: "AA"})
+    store.update("win11", {"b|1|2": "CC"})
+    reloaded = HashCacheStore(path)
+    assert reloaded.get("win10") == {KEY: "AA"}
+    assert reloaded.get("win11") == {"b|1|2": "CC"}
+    assert reloaded.get("other") == {}
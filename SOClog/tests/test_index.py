@@ -0,0 +1,38 @@
+from soclog.index import EventIndex
+
+
+def _events(first_time: str, count: int, event_id: int = 4624):
+    return [
+        {
+            "TimeCreated": f"{first_time}:{i:02d}.0000000Z",
+            "RecordId": i + 1,
+            "Id": event_id,
+            "Message": f"event {i}",
+        }
+        for i in range(count)
+    ]
+
+
+def test_overlapping_runs_store_each_event_once(make_run, tmp_path):
+    events = _events("2026-01-01T10:00", 10)
+    make_run("run1", "win11", {"security_events.ndjson": events[:6]})
+    make_run("run2", "win11", {"security_events.ndjson": events[3:]})
+
+    with EventIndex(str(tmp_path / "index.sqlite")) as index:
+        stats = index.update([str(tmp_path / "out")])
+        assert stats.runs_indexed == 2
+        assert index.count_events() == [(None, 10)]
+
+
+def test_events_after_a_log_clear_are_kept(make_run, tmp_path):
+    # The log was cleared between the runs: RecordIds restart at 1.
+    before = _events("2026-01-01T10:00", 5)
+    after = _events("2026-01-02T08:00", 5, event_id=4688)
+    make_run("run1", "win11", {"security_events.ndjson": before})
+    make_run("run2", "win11", {"security_events.ndjson": after})
+
+    with EventIndex(str(tmp_path / "index.sqlite")) as index:
+        stats = index.update([str(tmp_path / "out")])
+        assert stats.events == 10
+        assert index.count_events() == [(None, 10)]
+        assert index.count_events(event_ids=[4688]) == [(None, 5)]
@@ -0,0 +1,164 @@
+import ipaddress
+import json
+
+import pytest
+
+from soclog.ioc import IndicatorSet, _RangeSet, load_indicators, match_collections, parse_indicator
+
+SHA256 = "9F86D081884C7D659A2FEAA0C55AD015A3BF4F1B2B0B822CD15D6C15B0F00A08"
+MD5 = "d41d8cd98f00b204e9800998ecf8427e"
+
+
+def indicators(*tokens):
+    ioc = IndicatorSet()
+    for token in tokens:
+        assert ioc.add(token) is not None, token
+    return ioc.build()
+
+
+@pytest.mark.parametrize(
+    "token, expected",
+    [
+        (SHA256, ("hash", bytes.fromhex(SHA256))),
+        (SHA256.lower(), ("hash", bytes.fromhex(SHA256))),
+        (f"`{MD5}`", ("hash", bytes.fromhex(MD5))),
+        ("185.220.101.4", ("ip4", int(ipaddress.ip_address("185.220.101.4")))),
+        ("185[.]220[.]101[.]4", ("ip4", int(ipaddress.ip_address("185.220.101.4")))),
+        ("::ffff:10.1.2.3", ("ip4", int(ipaddress.ip_address("10.1.2.3")))),
+        ("2001:db8::1", ("ip6", ipaddress.ip_address("2001:db8::1").packed)),
+        ("10.0.0.0/8", ("cidr", ipaddress.ip_network("10.0.0.0/8"))),
+        ("10.1.2.3/8", ("cidr", ipaddress.ip_network("10.0.0.0/8"))),
+        ("Evil-Domain.COM.", ("domain", "evil-domain.com")),
+        ("evil[.]example", ("domain", "evil.example")),
+        ("hxxps://user@bad.example:8443/path?q=1", ("domain", "bad.example")),
+        ("hXXp://198.51.100.7/payload", ("ip4", int(ipaddress.ip_address("198.51.100.7")))),
+        ("http://[2001:db8::2]:443/", ("ip6", ipaddress.ip_address("2001:db8::2").packed)),
+    ],
+)
+def test_parse_indicator(token, expected):
+    assert parse_indicator(token) == expected
+
+
+@pytest.mark.parametrize("token", ["", "Invoice_87421.docx", "not an indicator", "10.0.0.0/33", "localhost"])
+def test_parse_indicator_rejects(token):
+    assert parse_indicator(token) is None
+
+
+def test_feed_with_comments_csv_and_markdown_table(tmp_path):
+    feed = tmp_path / "iocs.md"
+    feed.write_text(
+        "# Campaign IOCs\n"
+        "\n"
+        f"{SHA256}  # dropper\n"
+        "evil[.]example,domain,first seen 2026-01-02\n"
+        "\n"
+        "| Indicator | Type | Notes |\n"
+        "|-----------|:----:|-------|\n"
+        "| `203.0.113.0/24` | CIDR | C2 range |\n"
+        "| Invoice_87421.docx | file | lure |\n"
+        "| hxxp://cdn.bad[.]example/a | URL | # not a comment in a table |\n"
+        "just some prose\n",
+        encoding="utf-8",
+    )
+    ioc = load_indicators([str(feed)])
+    (stats,) = ioc.feeds
+    assert (stats.hashes, stats.ips, stats.cidrs, stats.domains) == (1, 0, 1, 2)
+    # The header row, the file name row and the prose line.
+    assert stats.skipped == 3
+    assert ioc.match_hash(SHA256.lower()) == "sha256"
+    assert ioc.match_domain("www.cdn.bad.example") == "cdn.bad.example"
+    assert ioc.match_ip("203.0.113.99") == "203.0.113.0/24"
+
+
+def test_hash_lookup_ignores_case_and_length():
+    ioc = indicators(SHA256.lower(), MD5.upper())
+    assert ioc.match_hash(SHA256) == "sha256"
+    assert ioc.match_hash(MD5) == "md5"
+    assert ioc.match_hash(SHA256[:-1] + "0") is None
+    assert ioc.match_hash(SHA256[:40]) is None
+    assert ioc.match_hash("z" * 64) is None
+
+
+def test_domain_matches_subdomains_only():
+    ioc = indicators("bad.example")
+    assert ioc.match_domain("BAD.example.") == "bad.example"
+    assert ioc.match_domain("a.b.bad.example") == "bad.example"
+    assert ioc.match_domain("notbad.example") is None
+    assert ioc.match_domain("example") is None
+
+
+def test_most_specific_cidr_wins():
+    ioc = indicators("10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24", "10.200.0.0/16", "10.1.2.3")
+    assert ioc.match_ip("10.1.2.3") == "10.1.2.3"
+    assert ioc.match_ip("10.1.2.4") == "10.1.2.0/24"
+    assert ioc.match_ip("10.1.3.1") == "10.1.0.0/16"
+    # Past a nested range, the enclosing one is found again.
+    assert ioc.match_ip("10.150.0.1") == "10.0.0.0/8"
+    assert ioc.match_ip("10.200.9.9") == "10.200.0.0/16"
+    assert ioc.match_ip("11.0.0.1") is None
+    assert ioc.match_ip("::ffff:10.1.2.4") == "10.1.2.0/24"
+
+
+def test_ipv6_addresses_and_ranges():
+    ioc = indicators("2001:db8::/32", "2001:db8:1::/48", "2001:db8:1::5")
+    assert ioc.match_ip("2001:db8:1::5") == "2001:db8:1::5"
+    assert ioc.match_ip("2001:DB8:1::6%eth0") == "2001:db8:1::/48"
+    assert ioc.match_ip("2001:db8:2::1") == "2001:db8::/32"
+    assert ioc.match_ip("2001:db9::1") is None
+    assert ioc.match_ip("not an address") is None
+
+
+def test_range_set_find():
+    ranges = _RangeSet(
+        ipaddress.ip_network(n)
+        for n in ("192.0.2.0/24", "192.0.2.128/25", "192.0.2.192/26", "198.51.100.0/24", "192.0.2.0/24")
+    )
+    assert len(ranges) == 4
+    find = ranges.find
+    assert find(int(ipaddress.ip_address("192.0.2.200"))) == "192.0.2.192/26"
+    assert find(int(ipaddress.ip_address("192.0.2.130"))) == "192.0.2.128/25"
+    assert find(int(ipaddress.ip_address("192.0.2.1"))) == "192.0.2.0/24"
+    assert find(int(ipaddress.ip_address("198.51.100.255"))) == "198.51.100.0/24"
+    assert find(int(ipaddress.ip_address("192.0.3.0"))) is None
+    assert find(0) is None
+
+
+def test_build_is_incremental():
+    ioc = indicators("10.0.0.0/8", SHA256)
+    ioc.add("10.1.0.0/16")
+    ioc.add(MD5)
+    ioc.build()
+    assert len(ioc) == 4
+    assert ioc.match_ip("10.1.0.1") == "10.1.0.0/16"
+    assert ioc.match_hash(SHA256) == "sha256" and ioc.match_hash(MD5) == "md5"
+
+
+def test_match_collections_writes_hits(make_run):
+    run = make_run(
+        "run1",
+        "ws01",
+        {
+            "processes.ndjson": [{"processes": [{"PID": 4, "Name": "a.exe", "HashSHA256": SHA256}]}],
+            "sysmon_events.ndjson": [
+                {
+                    "Id": 3,
+                    "RecordId": 7,
+                    "TimeCreated": "2026-01-01T00:00:00Z",
+                    "EventData": {"DestinationIp": "::ffff:203.0.113.9", "DestinationHostname": "x.bad.example"},
+                },
+                {"Id": 1, "RecordId": 8, "EventData": {"Hashes": f"SHA1=00,MD5={MD5.upper()}"}},
+            ],
+        },
+    )
+    ioc = indicators(SHA256, "203.0.113.0/24", "bad.example", MD5)
+    (result,) = match_collections([str(run)], ioc)
+    assert (result.host, result.processes, result.events, result.problems) == ("ws01", 1, 2, [])
+    found = sorted((hit["type"], hit["indicator"], hit["source"]) for hit in result.hits)
+    assert found == [
+        ("domain", "bad.example", "sysmon"),
+        ("ip", "203.0.113.0/24", "sysmon"),
+        ("md5", MD5, "sysmon"),
+        ("sha256", SHA256.lower(), "processes"),
+    ]
+    written = json.loads(result.hits_path.read_text(encoding="utf-8"))
+    assert len(written["hits"]) == 4
@@ -0,0 +1,103 @@
+import hashlib
+import json
+
+import pytest
+
+from soclog.merkle import (
+    ROOT_FORMAT,
+    build_levels,
+    check_proof,
+    inclusion_proof,
+    leaf_hash,
+    node_hash,
+    root_from_proof,
+)
+
+
+def digests(count):
+    return [hashlib.sha256(f"manifest {i}".encode()).hexdigest() for i in range(count)]
+
+
+def make_proof(manifests, index):
+    levels = build_levels([leaf_hash(d) for d in manifests])
+    root = levels[-1][0].hex()
+    return {
+        "format": ROOT_FORMAT,
+        "manifest_sha256": manifests[index],
+        "index": index,
+        "path": [{"side": side, "hash": h} for side, h in inclusion_proof(levels, index)],
+        "root": root,
+        "root_statement": json.dumps({"format": ROOT_FORMAT, "root": root, "leaves": len(manifests)}),
+    }
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 4, 5, 7, 8, 13])
+def test_every_leaf_proves_into_the_root(count):
+    manifests = digests(count)
+    for index, digest in enumerate(manifests):
+        assert check_proof(make_proof(manifests, index), digest) is None
+
+
+def test_tree_shape_follows_rfc6962():
+    a, b, c = (leaf_hash(d) for d in digests(3))
+    # The odd node is promoted, not paired with itself.
+    assert build_levels([a, b, c])[-1] == [node_hash(node_hash(a, b), c)]
+    assert build_levels([a])[-1] == [a]
+    with pytest.raises(ValueError):
+        build_levels([])
+
+
+def test_changed_manifest_is_detected():
+    manifests = digests(5)
+    proof = make_proof(manifests, 2)
+    problem = check_proof(proof, hashlib.sha256(b"edited").hexdigest())
+    assert "changed after the sweep" in problem
+
+
+def test_forged_leaf_hash_in_proof_is_detected():
+    manifests = digests(5)
+    forged = hashlib.sha256(b"edited").hexdigest()
+    proof = dict(make_proof(manifests, 2), manifest_sha256=forged)
+    assert "does not lead to the signed root" in check_proof(proof, forged)
+
+
+@pytest.mark.parametrize(
+    "tamper",
+    [
+        lambda p: p["path"][0].update(hash="00" * 32),
+        lambda p: p["path"][0].update(side="left" if p["path"][0]["side"] == "right" else "right"),
+        lambda p: p["path"].pop(),
+        lambda p: p["path"].append({"side": "right", "hash": "11" * 32}),
+    ],
+)
+def test_tampered_path_is_detected(tamper):
+    manifests = digests(6)
+    proof = make_proof(manifests, 3)
+    tamper(proof)
+    assert "does not lead to the signed root" in check_proof(proof, manifests[3])
+
+
+def test_root_must_match_the_statement():
+    manifests = digests(4)
+    other = make_proof(digests(5), 0)
+    proof = dict(make_proof(manifests, 1), root=other["root"])
+    assert "differs from its root statement" in check_proof(proof, manifests[1])
+    # Swapping the statement too still fails, as the path leads elsewhere.
+    proof["root_statement"] = other["root_statement"]
+    assert "does not lead to the signed root" in check_proof(proof, manifests[1])
+
+
+def test_unreadable_proof_is_reported():
+    manifests = digests(2)
+    proof = make_proof(manifests, 0)
+    proof["path"][0]["side"] = "up"
+    assert "unreadable Merkle proof" in check_proof(proof, manifests[0])
+    del proof["root_statement"]
+    assert "unreadable Merkle proof" in check_proof(proof, manifests[0])
+
+
+def test_root_from_proof_matches_the_tree_root():
+    leaves = [leaf_hash(d) for d in digests(9)]
+    levels = build_levels(leaves)
+    for index, leaf in enumerate(leaves):
+        assert root_from_proof(leaf, inclusion_proof(levels, index)) == levels[-1][0]
@@ -0,0 +1,51 @@
+import pytest
+
+from soclog.config import HostConfig
+from soclog.sharding import parse_shard, select_shard, shard_for
+
+NAMES = [f"ws{i:04d}" for i in range(2000)]
+
+
+def assignment(count):
+    return {name: shard_for(name, count) for name in NAMES}
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 7])
+def test_adding_a_node_only_moves_hosts_to_it(count):
+    before, after = assignment(count), assignment(count + 1)
+    moved = [name for name in NAMES if before[name] != after[name]]
+    assert all(after[name] == count + 1 for name in moved)
+    # Roughly 1/(N+1) of the hosts move, not a reshuffle.
+    assert abs(len(moved) - len(NAMES) / (count + 1)) < len(NAMES) * 0.05
+
+
+@pytest.mark.parametrize("count", [2, 3, 8])
+def test_removing_the_last_node_only_moves_its_hosts(count):
+    before, after = assignment(count), assignment(count - 1)
+    for name in NAMES:
+        if before[name] != count:
+            assert after[name] == before[name]
+
+
+def test_assignment_is_deterministic_and_ignores_case():
+    assert shard_for("DC01", 5) == shard_for("dc01", 5)
+    assert assignment(4) == assignment(4)
+
+
+def test_select_shard_partitions_the_inventory_in_order():
+    hosts = [HostConfig(name=name, host=f"{name}.lab", username="u") for name in NAMES[:50]]
+    shards = [select_shard(hosts, index, 3) for index in (1, 2, 3)]
+    assert sorted(cfg.name for shard in shards for cfg in shard) == NAMES[:50]
+    for shard in shards:
+        assert shard == [cfg for cfg in hosts if cfg in shard]
+
+
+def test_parse_shard():
+    assert parse_shard("2/3") == (2, 3)
+    assert parse_shard("1/1") == (1, 1)
+
+
+@pytest.mark.parametrize("value", ["3", "0/3", "4/3", "1/0", "a/b", "1/2/3", ""])
+def test_parse_shard_rejects_bad_values(value):
+    with pytest.raises(ValueError):
+        parse_shard(value)
@@ -0,0 +1,124 @@
+import json
+import shutil
+import subprocess
+import tempfile
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from soclog.merkle import PROOF_NAME, sign_sweep
+from soclog.verify import verify_collection
+
+EVENTS = {"security_events.ndjson": [{"TimeCreated": "2026-01-01T00:00:00Z", "RecordId": 1, "Id": 4624}]}
+
+
+def _result(name, run_dir):
+    return SimpleNamespace(name=name, out_dir=run_dir, zip_path=None)
+
+
+@pytest.fixture
+def gnupg(monkeypatch):
+    """A throwaway keyring with two signing keys; skipped without gpg."""
+    if shutil.which("gpg") is None:
+        pytest.skip("gpg not installed")
+    # Short path: gpg-agent's socket path is length-limited.
+    home = tempfile.mkdtemp(prefix="gpg")
+    monkeypatch.setenv("GNUPGHOME", home)
+    for uid in ("Evidence <evidence@example.org>", "Other <other@example.org>"):
+        subprocess.run(
+            ["gpg", "--batch", "--passphrase", "", "--quick-gen-key", uid, "ed25519", "sign", "never"],
+            check=True,
+            capture_output=True,
+        )
+    yield home
+    subprocess.run(["gpgconf", "--kill", "gpg-agent"], capture_output=True)
+    shutil.rmtree(home, ignore_errors=True)
+
+
+def test_unsigned_collection_warns(make_run):
+    run = make_run("run1", "win11", EVENTS)
+    result = verify_collection(run, check_signature=True)
+    assert result.ok
+    assert any(w.startswith("unsigned") for w in result.warnings)
+    assert not verify_collection(run, gpg_key="evidence@example.org").ok
+
+
+def test_forged_unsigned_proof_does_not_count_as_signed(make_run, tmp_path):
+    run = make_run("run1", "win11", EVENTS)
+    # Rewrite manifest.json, then build a fresh single-leaf proof for it.
+    manifest = json.loads((run / "manifest.json").read_text())
+    manifest["host"] = "someone-else"
+    (run / "manifest.json").write_text(json.dumps(manifest))
+    sign_sweep([_result("win11", run)], str(tmp_path / "out"), sign=False)
+    assert (run / PROOF_NAME).is_file()
+
+    result = verify_collection(run)
+    assert result.ok and result.proof == "good"
+    assert result.signature is None
+    assert any(w.startswith("unsigned") for w in result.warnings)
+
+    required = verify_collection(run, gpg_key="evidence@example.org")
+    assert not required.ok
+    assert any("unsigned" in p for p in required.problems)
+
+
+def test_signed_sweep_checks_the_signing_key(make_run, tmp_path, gnupg):
+    run = make_run("run1", "win11", EVENTS)
+    sign_sweep([_result("win11", run)], str(tmp_path / "out"), gpg_key="evidence@example.org")
+
+    result = verify_collection(run, gpg_key="evidence@example.org")
+    assert result.ok, result.problems
+    assert result.signature == "good" and not result.warnings
+
+    other = verify_collection(run, gpg_key="other@example.org")
+    assert not other.ok and other.signature == "wrong key"
+
+
+def _zip_run(run, members=None):
+    """Add the run's ZIP, holding its files (or the given members)."""
+    zip_path = run / f"soclog_win11_{run.name}.zip"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        for path in sorted(run.iterdir()):
+            if path != zip_path:
+                zf.write(path, path.name)
+        for name, data in (members or {}).items():
+            zf.writestr(name, data)
+    return zip_path
+
+
+def test_tampered_zip_fails_even_with_intact_loose_copies(make_run):
+    run = make_run("run1", "win11", EVENTS)
+    zip_path = run / "soclog_win11_run1.zip"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.write(run / "manifest.json", "manifest.json")
+        zf.writestr("security_events.ndjson", "{}\n")
+
+    result = verify_collection(run, check_signature=False)
+    assert not result.ok
+    assert [p for p in result.problems if p.startswith("security_events.ndjson")] == [
+        "security_events.ndjson in ZIP: size 3 != {}".format((run / "security_events.ndjson").stat().st_size)
+    ]
+
+
+def test_files_not_in_the_manifest_are_reported(make_run):
+    run = make_run("run1", "win11", EVENTS)
+    zip_path = _zip_run(run, {"extra.ps1": "Write-Host hi"})
+    (run / "notes.txt").write_text("added later")
+    (run / "metrics.json").write_text("{}")
+
+    result = verify_collection(run, check_signature=False)
+    assert not result.ok
+    assert "extra.ps1: in ZIP but not listed in manifest.json" in result.problems
+    assert "notes.txt: not listed in manifest.json" in result.problems
+    assert not any("metrics.json" in p for p in result.problems)
+
+    alone = verify_collection(zip_path, check_signature=False)
+    assert alone.problems == ["extra.ps1: in ZIP but not listed in manifest.json"]
+
+
+def test_intact_run_with_zip_verifies(make_run):
+    run = make_run("run1", "win11", EVENTS)
+    _zip_run(run)
+    result = verify_collection(run, check_signature=False)
+    assert result.ok, result.problems